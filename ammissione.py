@@ -0,0 +1,97 @@
+"""Controllo di ammissione per route: richieste in esecuzione e in coda limitate, 503 immediati oltre"""
+import functools
+import threading
+
+from flask import current_app, jsonify
+
+
+class LimiteConcorrenza:
+    """Al massimo 'massimo' richieste in esecuzione; fino a 'coda' aspettano un posto per 'attesa' secondi.
+
+    Le altre vengono rifiutate subito: sotto carico la latenza delle
+    richieste servite resta quella di 'massimo' calcoli in parallelo invece
+    di crescere con la coda, e i thread del worker non restano tutti
+    bloccati sulla stessa route.
+    """
+
+    def __init__(self, massimo, coda, attesa):
+        self.massimo = massimo
+        self.coda = coda
+        self.attesa = attesa
+        self._posti = threading.BoundedSemaphore(massimo)
+        self._lock = threading.Lock()
+        self.in_esecuzione = 0
+        self.in_coda = 0
+        self.ammesse = 0
+        self.rifiutate = 0
+
+    def entra(self):
+        """True se la richiesta può partire (e poi deve chiamare esci()), False se va rifiutata"""
+        ammessa = self._posti.acquire(blocking=False)
+        if not ammessa:
+            with self._lock:
+                if self.in_coda >= self.coda:
+                    self.rifiutate += 1
+                    return False
+                self.in_coda += 1
+            try:
+                ammessa = self._posti.acquire(timeout=self.attesa)
+            finally:
+                with self._lock:
+                    self.in_coda -= 1
+        with self._lock:
+            if ammessa:
+                self.ammesse += 1
+                self.in_esecuzione += 1
+            else:
+                self.rifiutate += 1
+        return ammessa
+
+    def esci(self):
+        with self._lock:
+            self.in_esecuzione -= 1
+        self._posti.release()
+
+
+class ControlloAmmissione:
+    """Un LimiteConcorrenza per ogni route decorata con limita(), nello stesso processo.
+
+    Le richieste rifiutate ricevono 503 con Retry-After di 'riprova_dopo'
+    secondi. Con 'massimo' <= 0 le route non vengono limitate.
+    """
+
+    def __init__(self, massimo=8, coda=16, attesa=2.0, riprova_dopo=1):
+        self.massimo = massimo
+        self.coda = coda
+        self.attesa = attesa
+        self.riprova_dopo = riprova_dopo
+        self.limiti = {}
+
+    def limita(self, massimo=None):
+        """Decoratore di una route; 'massimo' sostituisce il limite predefinito (es. route pesanti)"""
+        def decoratore(vista):
+            posti = min(massimo, self.massimo) if massimo is not None else self.massimo
+            if posti <= 0:
+                return vista
+            limite = self.limiti[vista.__name__] = LimiteConcorrenza(posti, self.coda, self.attesa)
+
+            @functools.wraps(vista)
+            def wrapper(*args, **kwargs):
+                if not limite.entra():
+                    risposta = jsonify({"error": "Server sovraccarico: riprova tra poco"})
+                    risposta.status_code = 503
+                    risposta.headers["Retry-After"] = str(self.riprova_dopo)
+                    return risposta
+                try:
+                    risposta = current_app.make_response(vista(*args, **kwargs))
+                except BaseException:
+                    limite.esci()
+                    raise
+                if risposta.is_streamed:
+                    # Il posto resta occupato finché lo stream non è stato inviato tutto
+                    risposta.call_on_close(limite.esci)
+                else:
+                    limite.esci()
+                return risposta
+            return wrapper
+        return decoratore
@@ -1,149 +1,107 @@
-import re
-from flask import Flask, jsonify, render_template, request
+import base64
+import csv
+import io
+import json
+import math
+import os
+import time
+from concurrent.futures import TimeoutError as TimeoutAttesa
+
+from flask import Blueprint, Flask, Response, current_app, g, jsonify, render_template, request
 from flask_cors import CORS
 from oauth2client.service_account import ServiceAccountCredentials
 import gspread
 
-app = Flask(__name__)
-CORS(app)
-
-# Accesso a Google Sheets
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-creds = ServiceAccountCredentials.from_json_keyfile_name("credential.json", scope)
-client = gspread.authorize(creds)
-
-def estrai_numero_canali(valore):
-    """Estrae il numero di canali da una stringa tipo '1CH', 'RGBW - 4CH', ecc."""
-    if not valore:
-        return None
-    match = re.search(r'(\d+)\s*CH', str(valore).upper())
-    if match:
-        return int(match.group(1))
-    return None
-
-def estrai_temperatura_colore(item):
-    """Estrae la temperatura colore da una strip LED"""
-    if not item:
-        return None
-    
-    # Cerca nel campo "Colore Luce" o "Descrizione"
-    testo = str(item.get('Colore Luce', '') + ' ' + item.get('Descrizione', '') + ' ' + item.get('Codice', '')).upper()
-    
-    # Pattern per trovare temperature in Kelvin
-    kelvin_patterns = [
-        r'(\d{4})K',  # 3000K, 4000K, etc.
-        r'(\d{4})\s*KELVIN',
-        r'(\d{4})\s*°K'
-    ]
-    
-    temperature_trovate = []
-    for pattern in kelvin_patterns:
-        matches = re.findall(pattern, testo)
-        for match in matches:
-            temp = int(match)
-            if 1000 <= temp <= 10000:  # Range ragionevole per temperature colore
-                temperature_trovate.append(temp)
-    
-    if temperature_trovate:
-        return min(temperature_trovate)
-    
-    # Fallback: cerca parole chiave comuni
-    if any(keyword in testo for keyword in ['2700', '2800', '2900']):
-        return 2700  # Bianco caldo tipico
-    elif any(keyword in testo for keyword in ['4000']):
-        return 4000  # Bianco naturale
-    elif any(keyword in testo for keyword in ['6000', '6500']):
-        return 6000  # Bianco freddo
-    
-    return None
-
-def determina_categoria_canali_strip(item):
-    """Determina se una strip appartiene alla categoria 1-2CH o 3-5CH based sulla temperatura colore"""
-    if not item:
-        return None
-    
-    temp_colore = estrai_temperatura_colore(item)
-    
-    if temp_colore is None:
-        # Se non riusciamo a determinare la temperatura, usiamo il vecchio sistema basato sui canali
-        num_canali = estrai_numero_canali(item.get("Canali", ""))
-        if num_canali:
-            return "1-2CH" if num_canali <= 2 else "3-5CH"
-        return None
-    
-    # Logica principale: <= 3000K = 1-2CH, > 3000K = 3-5CH
-    return "1-2CH" if temp_colore <= 3000 else "3-5CH"
-
-def determina_categoria_canali_dimmer(item):
-    """Determina la categoria di canali del dimmer"""
-    if not item:
-        return None
-    
-    num_canali = estrai_numero_canali(item.get("Canali Dimmer", ""))
-    if num_canali is None:
-        return None
-    
-    return "1-2CH" if num_canali <= 2 else "3-5CH"
+from ammissione import ControlloAmmissione
+from archivio import leggi_snapshot, salva_snapshot
+from cache_risposte import CacheRisposte, in_cache
+from estrattori import categoria_canali_dimmer, categoria_canali_strip, estrai_numero_canali, statistiche_memoria
+from catalogo import AggiornatoreCatalogo, CaricatoreCondiviso, Catalogo
+from compatibilita import ElencoStripAlimentabili
+from esportazione import CODIFICHE
+from filtri import posizioni_da_bitmap
+from fogli import FOGLI_CATALOGO, scarica_fogli
+from metriche import Metriche, ProfilerCampionamento
+from modelli import ElencoProdotti, materializza, normalizza_codice
+from pianificazione import OBIETTIVI
 
-def estrai_potenza_strip(potenza_str):
-    """Estrae la potenza per metro da una stringa tipo '4,8W/m'"""
-    if not potenza_str:
-        return None
-    
-    # Pattern per trovare potenza per metro
-    match = re.search(r'(\d+(?:[.,]\d+)?)\s*W/m', str(potenza_str).upper())
-    if match:
-        return float(match.group(1).replace(',', '.'))
-    
-    return None
+# Le route stanno in un blueprint: l'applicazione la crea crea_app()
+bp = Blueprint("finder", __name__)
 
-def estrai_voltaggio_strip(voltaggio_str):
-    """Estrae il voltaggio da una stringa tipo '24VDC'"""
-    if not voltaggio_str:
-        return None
-    
-    # Pulisce e estrae il numero
-    cleaned = str(voltaggio_str).upper().replace('VDC', '').replace('VAC', '').replace('V', '').strip()
-    match = re.search(r'(\d+(?:[.,]\d+)?)', cleaned)
-    if match:
-        return float(match.group(1).replace(',', '.'))
-    
-    return None
-
-# Aggiungi queste funzioni corrette al tuo app.py
+# Accesso a Google Sheets
+SCOPE_SHEETS = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+PERCORSO_CREDENZIALI = os.environ.get("GOOGLE_CREDENZIALI", "credential.json")
 
-def estrai_ampere_per_metro(strip):
-    """Estrae gli ampere per metro dalla colonna specifica"""
-    if not strip:
-        return None
-    
-    # Cerca nella colonna "ampere per metro"
-    ampere_str = strip.get('ampere per metro', '')
-    if not ampere_str:
-        return None
-    
-    # Pattern per trovare ampere per metro
-    match = re.search(r'(\d+(?:[.,]\d+)?)', str(ampere_str))
-    if match:
-        return float(match.group(1).replace(',', '.'))
-    
-    return None
+# Timeout (secondi) e tentativi per la lettura di ciascun foglio
+TIMEOUT_FOGLI = float(os.environ.get("FOGLI_TIMEOUT", "30"))
+TENTATIVI_FOGLI = int(os.environ.get("FOGLI_TENTATIVI", "4"))
 
-def estrai_corrente_alimentatore(alimentatore):
-    """Estrae la corrente dall'alimentatore dalla colonna 'Corrente A'"""
-    if not alimentatore:
-        return None
-    
-    corrente_str = alimentatore.get('Corrente A', '')
-    if not corrente_str:
-        return None
-    
-    # Pattern per trovare corrente in ampere
-    match = re.search(r'(\d+(?:[.,]\d+)?)', str(corrente_str))
-    if match:
-        return float(match.group(1).replace(',', '.'))
-    
-    return None
+# Secondi tra due aggiornamenti automatici da Google Sheets (0 = solo su richiesta)
+INTERVALLO_AGGIORNAMENTO = float(os.environ.get("CATALOGO_INTERVALLO_AGGIORNAMENTO", "600"))
+# Secondi tra due controlli dello snapshot su disco scritto da un altro worker
+INTERVALLO_CONTROLLO = float(os.environ.get("CATALOGO_INTERVALLO_CONTROLLO", "15"))
+# Token per /admin/ricarica; se non impostato l'endpoint è disabilitato
+ADMIN_TOKEN = os.environ.get("AVTECNO_ADMIN_TOKEN", "")
+# Secondi di attesa massima di /admin/ricarica?attendi=1
+TIMEOUT_ATTESA_RICARICA = float(os.environ.get("RICARICA_TIMEOUT_ATTESA", "60"))
+# Ultimo catalogo valido salvato su disco ed export JSON usato in alternativa
+PERCORSO_SNAPSHOT = os.environ.get("CATALOGO_SNAPSHOT", "catalogo.snapshot")
+PERCORSO_JSON = os.environ.get("CATALOGO_JSON", "dati_prodotti.json")
+# Numero massimo di codici accettati da /cerca_multipla
+MAX_CODICI_MULTIPLI = int(os.environ.get("CERCA_MULTIPLA_MAX_CODICI", "500"))
+# Numero massimo di lunghezze per /tabella_alimentatori
+MAX_LUNGHEZZE_TABELLA = 100
+# Risultati per pagina di /filtra (predefiniti e massimi)
+LIMITE_FILTRA = 50
+MAX_LIMITE_FILTRA = 500
+# Categorie di /filtra: nome nella richiesta -> foglio
+CATEGORIE_FILTRA = {"stripled": "stripled", "strip": "stripled", "profili": "profili", "profilo": "profili", "dimmer": "Dimmer"}
+# Righe per pagina massime degli elenchi di /cerca e /strip_alimentabili (?limite=)
+MAX_LIMITE_ELENCHI = 1000
+# Righe di un elenco in ogni riga NDJSON di /cerca?stream=1
+RIGHE_PER_BLOCCO = int(os.environ.get("STREAM_RIGHE_PER_BLOCCO", "200"))
+# Parametri di paginazione e proiezione degli elenchi, con il nome inglese accettato in alternativa
+PARAMETRI_ELENCHI = (("campi", "fields"), ("limite", "limit"), ("cursore", "cursor"))
+# Tipi degli elenchi di prodotti compatibili nei risultati, completati solo nella risposta
+ELENCHI = (ElencoProdotti, ElencoStripAlimentabili)
+# Numero massimo di suggerimenti restituiti da /suggerisci
+MAX_SUGGERIMENTI = 50
+# Limiti di /pianifica_alimentatori: tratte per richiesta, metri per tratta e metri in tutta la richiesta
+MAX_TRATTE_PIANO = int(os.environ.get("PIANO_MAX_TRATTE", "200"))
+MAX_METRI_TRATTA = float(os.environ.get("PIANO_MAX_METRI", "1000"))
+MAX_METRI_TOTALI_PIANO = float(os.environ.get("PIANO_MAX_METRI_TOTALI", "5000"))
+# Categorie canali accettate da /compatibili (le stesse estratte dai fogli)
+CATEGORIE_CANALI = ("1-2CH", "3-5CH")
+# Kit restituiti da /configura: predefiniti e massimi
+KIT_CONFIGURA = 5
+MAX_KIT_CONFIGURA = 50
+# Cache delle risposte di /cerca e /calcola_alimentatori
+cache_risposte = CacheRisposte(
+    capacita=int(os.environ.get("CACHE_RISPOSTE_DIMENSIONE", "1024")),
+    ttl=float(os.environ.get("CACHE_RISPOSTE_TTL", "300")),
+    # Secondi di attesa massima di un calcolo identico già in corso
+    attesa=float(os.environ.get("CACHE_RISPOSTE_ATTESA", "30"))
+)
+# Richieste in esecuzione e in coda per route in ogni worker: oltre si risponde subito 503 con Retry-After
+ammissione = ControlloAmmissione(
+    massimo=int(os.environ.get("AMMISSIONE_CONCORRENZA", "8")),
+    coda=int(os.environ.get("AMMISSIONE_CODA", "16")),
+    attesa=float(os.environ.get("AMMISSIONE_ATTESA", "2")),
+    riprova_dopo=int(os.environ.get("AMMISSIONE_RETRY_AFTER", "1"))
+)
+# Limite più basso per le route che calcolano molto per richiesta (tabelle, piani, kit, distinte)
+CONCORRENZA_ROUTE_PESANTI = int(os.environ.get("AMMISSIONE_CONCORRENZA_PESANTI", "2"))
+# Metriche del processo (/metrics) e profiler a campionamento (/admin/profiler)
+metriche = Metriche()
+metriche.descrivi("avtecno_richieste_total", "counter", "Richieste servite per endpoint e stato HTTP")
+metriche.descrivi("avtecno_richiesta_seconds", "histogram", "Durata delle richieste per endpoint")
+metriche.descrivi("avtecno_fase_seconds", "histogram", "Durata delle fasi di calcolo delle route")
+metriche.descrivi("avtecno_sheets_download_seconds", "histogram", "Durata del download completo da Google Sheets per esito")
+metriche.descrivi("avtecno_sheets_foglio_seconds", "histogram", "Durata della lettura di ciascun foglio")
+metriche.descrivi("avtecno_sheets_errori_total", "counter", "Fogli non letti da Google Sheets")
+profiler = ProfilerCampionamento(float(os.environ.get("PROFILER_INTERVALLO", "0.005")))
+# Ultimo download da Google Sheets di questo processo, mostrato da /test
+ultimo_download_sheets = {}
 
 def calcola_ampere_necessari_v2(strip, metri):
     """Versione corretta del calcolo ampere usando i dati reali"""
@@ -151,13 +109,12 @@ def calcola_ampere_necessari_v2(strip, metri):
         return None
     
     # Usa la colonna "ampere per metro" se disponibile
-    ampere_per_metro = estrai_ampere_per_metro(strip)
-    if ampere_per_metro is not None:
-        return ampere_per_metro * metri
+    if strip.ampere_per_metro is not None:
+        return strip.ampere_per_metro * metri
     
     # Fallback al calcolo originale se non disponibile
-    potenza_per_metro = estrai_potenza_strip(strip.get('Potenza', ''))
-    voltaggio = estrai_voltaggio_strip(strip.get('Input Volt', ''))
+    potenza_per_metro = strip.potenza_per_metro
+    voltaggio = strip.voltaggio_nominale
     
     if potenza_per_metro is None or voltaggio is None:
         return None
@@ -168,211 +125,184 @@ def calcola_ampere_necessari_v2(strip, metri):
     
     return round(ampere_necessari, 3)
 
-def trova_alimentatori_compatibili_v2(ampere_necessari, alimentatori_data, margine_sicurezza=1.2):
-    """Versione corretta per trovare alimentatori compatibili"""
-    if ampere_necessari is None:
-        return []
-    
-    alimentatori_compatibili = []
-    ampere_minimi = ampere_necessari * margine_sicurezza
-    
-    for alimentatore in alimentatori_data:
-        # Usa la colonna corretta "Corrente A"
-        corrente_alimentatore = estrai_corrente_alimentatore(alimentatore)
-        
-        if corrente_alimentatore is not None and corrente_alimentatore >= ampere_minimi:
-            # Aggiungi informazioni di compatibilità
-            alimentatore_info = alimentatore.copy()
-            alimentatore_info['corrente_A'] = corrente_alimentatore
-            alimentatore_info['margine_utilizzazione'] = round((ampere_necessari / corrente_alimentatore) * 100, 1)
-            alimentatore_info['ampere_disponibili'] = corrente_alimentatore
-            alimentatore_info['ampere_necessari'] = ampere_necessari
-            alimentatori_compatibili.append(alimentatore_info)
-    
-    # Ordina per corrente crescente (più efficiente)
-    alimentatori_compatibili.sort(key=lambda x: x.get('corrente_A', 0))
-    
-    return alimentatori_compatibili
-
-# Modifica la route /calcola_alimentatori
-@app.route("/calcola_alimentatori")
-def cerca_alimentatori_section(corrente_alimentatore):
-    """Sezione specifica per la ricerca alimentatori"""
-    strip_compatibili = []
-    MARGINE_SICUREZZA = 1.2
-    
-    for s in strip_data:
-        if not s.get('Codice'):
-            continue
-        
-        # Usa prima "ampere per metro" se disponibile
-        ampere_per_metro = estrai_ampere_per_metro(s)
-        if ampere_per_metro is not None:
-            metri_max = corrente_alimentatore / (ampere_per_metro * MARGINE_SICUREZZA)
-        else:
-            # Fallback al calcolo originale
-            potenza_per_metro = estrai_potenza_strip(s.get('Potenza', ''))
-            voltaggio_strip = estrai_voltaggio_strip(s.get('Input Volt', ''))
-            
-            if potenza_per_metro is None or voltaggio_strip is None or voltaggio_strip == 0:
-                continue
-            
-            ampere_per_metro = potenza_per_metro / voltaggio_strip
-            metri_max = corrente_alimentatore / (ampere_per_metro * MARGINE_SICUREZZA)
-        
-        if metri_max >= 0.1:  # Supporta almeno 10cm
-            strip_info = s.copy()
-            strip_info.update({
-                'metri_max_supportati': round(metri_max, 2),
-                'ampere_per_metro': round(ampere_per_metro, 3),
-                'metodo_calcolo': 'ampere_per_metro' if estrai_ampere_per_metro(s) else 'potenza_voltaggio'
-            })
-            strip_compatibili.append(strip_info)
-    
-    return strip_compatibili
+# Un client per processo: dopo il fork i worker non condividono le connessioni del master
+_client_per_processo = {}
 
-def profilo_colore_strip(item):
-    """Determina il profilo colore di una strip o dimmer basandosi sui canali o descrizione"""
-    if not item:
-        return None
-    
-    # Controlla prima i canali
-    canali_raw = item.get("Canali", "") or item.get("Canali Dimmer", "")
-    num_canali = estrai_numero_canali(canali_raw)
-    
-    if num_canali:
-        if num_canali == 1:
-            return "MONO"  # Monocromatico
-        elif num_canali == 2:
-            return "CCT"   # Color Temperature (bianco variabile)
-        elif num_canali == 3:
-            return "RGB"   # RGB
-        elif num_canali == 4:
-            return "RGBW"  # RGB + White
-        elif num_canali >= 5:
-            return "MULTI" # Multi-canale
-    
-    # Fallback: analisi del nome/descrizione
-    descrizione = str(item.get('Descrizione', '') + ' ' + item.get('Codice', '')).upper()
-    
-    if 'RGBW' in descrizione:
-        return "RGBW"
-    elif 'RGB' in descrizione:
-        return "RGB"
-    elif any(temp in descrizione for temp in ['3000K', '4000K', '6000K', 'CCT', 'TUNABLE']):
-        return "CCT"
-    else:
-        return "MONO"
+def client_sheets():
+    """Client gspread del processo corrente, creato alla prima richiesta"""
+    pid = os.getpid()
+    if pid not in _client_per_processo:
+        creds = ServiceAccountCredentials.from_json_keyfile_name(PERCORSO_CREDENZIALI, SCOPE_SHEETS)
+        client = gspread.authorize(creds)
+        if hasattr(client, "set_timeout"):
+            client.set_timeout(TIMEOUT_FOGLI)
+        _client_per_processo.clear()
+        _client_per_processo[pid] = client
+    return _client_per_processo[pid]
+
+def load_all_data(rigoroso=False):
+    """Carica tutti i dati dai fogli Google Sheets, scaricandoli in parallelo.
 
-def get_sheet_data(sheet_name):
-    """Legge i dati da un foglio specifico di Google Sheets"""
+    Con rigoroso=True gli errori vengono propagati invece di restituire liste
+    vuote: serve all'aggiornamento in background per non pubblicare un
+    catalogo vuoto quando Google Sheets non risponde.
+    """
+    durate = {}
+    inizio = time.perf_counter()
     try:
-        sheet = client.open("Specifiche prodotti avtecno").worksheet(sheet_name)
-        records = sheet.get_all_records()
-        return records
+        righe, errori = scarica_fogli(client_sheets(), FOGLI_CATALOGO, TIMEOUT_FOGLI, TENTATIVI_FOGLI, durate)
     except Exception as e:
-        print(f"Errore nel leggere il foglio {sheet_name}: {str(e)}")
-        return []
+        registra_download_sheets(inizio, durate, "errore")
+        if rigoroso:
+            raise
+        print(f"Errore nel caricare i dati: {str(e)}")
+        return {nome: [] for nome in FOGLI_CATALOGO}
+    registra_download_sheets(inizio, durate, "parziale" if errori else "ok")
+
+    for nome, errore in errori.items():
+        metriche.incrementa("avtecno_sheets_errori_total", foglio=nome)
+        if rigoroso:
+            raise RuntimeError(f"Errore nel leggere il foglio {nome}: {str(errore)}") from errore
+        print(f"Errore nel leggere il foglio {nome}: {str(errore)}")
+
+    return {nome: righe.get(nome, []) for nome in FOGLI_CATALOGO}
+
+def registra_download_sheets(inizio, durate, esito):
+    """Tempi di un download da Google Sheets: totale, per foglio e per /test"""
+    durata = time.perf_counter() - inizio
+    metriche.osserva("avtecno_sheets_download_seconds", durata, esito=esito)
+    for nome, secondi in durate.items():
+        metriche.osserva("avtecno_sheets_foglio_seconds", secondi, foglio=nome)
+    ultimo_download_sheets.update({
+        "quando": time.time(),
+        "esito": esito,
+        "durata_s": round(durata, 3),
+        "fogli_s": {nome: round(secondi, 3) for nome, secondi in durate.items()}
+    })
+
+def salva_catalogo_su_disco(righe, catalogo):
+    """Salva l'ultimo catalogo scaricato da Google Sheets per i prossimi avvii"""
+    salva_snapshot(righe, PERCORSO_SNAPSHOT, catalogo.etag)
+
+def segnala_anomalie(catalogo):
+    if catalogo.anomalie:
+        print(f"{len(catalogo.anomalie)} valori non interpretati nei fogli (dettagli su /anomalie)")
 
-def load_all_data():
-    """Carica tutti i dati dai fogli Google Sheets"""
+def al_nuovo_catalogo(righe, catalogo):
+    """Chiamata dopo ogni pubblicazione di un nuovo catalogo"""
+    cache_risposte.svuota()
+    segnala_anomalie(catalogo)
+    # Gli snapshot letti da disco sono già stati salvati dal worker che li ha scaricati
+    if catalogo.origine == "sheets":
+        salva_catalogo_su_disco(righe, catalogo)
+
+def carica_catalogo_iniziale():
+    """Catalogo di avvio: dall'ultimo snapshot locale, se c'è, altrimenti da Google Sheets"""
     try:
-        return {
-            "stripled": get_sheet_data("stripled"),
-            "profili": get_sheet_data("profili"),
-            "Dimmer": get_sheet_data("Dimmer"),
-            "alimentatori": get_sheet_data("alimentatori")
-        }
+        righe, etag, origine = leggi_snapshot(PERCORSO_SNAPSHOT, PERCORSO_JSON)
+        if righe is not None:
+            catalogo = Catalogo(righe, etag=etag, origine=origine)
+        else:
+            righe = load_all_data(rigoroso=True)
+            catalogo = Catalogo(righe)
+            salva_catalogo_su_disco(righe, catalogo)
     except Exception as e:
-        print(f"Errore nel caricare i dati: {str(e)}")
-        return {
-            "stripled": [],
-            "profili": [],
-            "Dimmer": [],
-            "alimentatori": []
-        }
+        print(f"Errore nel caricare i dati iniziali: {str(e)}")
+        catalogo = Catalogo({})
+    print(f"Dati caricati ({catalogo.origine}): {len(catalogo.strip_data)} strip, {len(catalogo.profili_data)} profili, {len(catalogo.dimmer_data)} dimmer, {len(catalogo.alimentatori_data)} alimentatori")
+    segnala_anomalie(catalogo)
+    return catalogo
 
-# Carica i dati all'avvio
-try:
-    all_data = load_all_data()
-    strip_data = all_data["stripled"]
-    profili_data = all_data["profili"]
-    dimmer_data = all_data["Dimmer"]
-    alimentatori_data = all_data["alimentatori"]
-    print(f"Dati caricati: {len(strip_data)} strip, {len(profili_data)} profili, {len(dimmer_data)} dimmer, {len(alimentatori_data)} alimentatori")
-except Exception as e:
-    print(f"Errore nel caricare i dati iniziali: {str(e)}")
-    strip_data = []
-    profili_data = []
-    dimmer_data = []
-    alimentatori_data = []
-
-# Funzioni di utilità
-def pulisci_voltaggio(valore):
-    """Pulisce una stringa voltaggio rimuovendo prefissi e suffissi comuni"""
-    if not valore:
-        return ""
-    
-    cleaned = str(valore).upper()
-    # Rimuovi prefissi/suffissi comuni
-    for term in ['DC', 'AC', 'V']:
-        cleaned = cleaned.replace(term, '')
-    
-    return cleaned.strip()
+def crea_app(avvia_aggiornamento=True, aggiornatore=None):
+    """Crea l'applicazione Flask e carica il catalogo una sola volta.
 
-def estrai_voltaggio_singolo(valore):
-    """Estrae un singolo valore di voltaggio"""
-    if not valore:
-        return None
-    
-    cleaned = pulisci_voltaggio(valore)
-    match = re.search(r'(\d+(?:[.,]\d+)?)', cleaned)
-    if match:
-        return float(match.group(1).replace(',', '.'))
-    return None
-
-def estrai_range_voltaggio_dimmer(valore):
-    """Versione migliorata per estrarre range voltaggio dimmer"""
-    if not valore:
-        return None, None
-    
-    cleaned = pulisci_voltaggio(valore)
-    
-    range_patterns = [
-        r'(\d+(?:[.,]\d+)?)\s*[~\-–]\s*(\d+(?:[.,]\d+)?)',  
-        r'(\d+(?:[.,]\d+)?)\s*TO\s*(\d+(?:[.,]\d+)?)',      
-        r'(\d+(?:[.,]\d+)?)\s+(\d+(?:[.,]\d+)?)'            
-    ]
-    
-    for pattern in range_patterns:
-        match = re.search(pattern, cleaned)
-        if match:
-            min_v = float(match.group(1).replace(',', '.'))
-            max_v = float(match.group(2).replace(',', '.'))
-            return min_v, max_v
-    
-    # Se non è un range, prova singolo valore
-    single_v = estrai_voltaggio_singolo(valore)
-    if single_v is not None:
-        return single_v, single_v
-    
-    return None, None
+    Con avvia_aggiornamento=False il thread di aggiornamento parte alla prima
+    richiesta servita: è il caso di gunicorn con preload_app (vedi wsgi.py),
+    dove il catalogo viene caricato nel master e condiviso copy-on-write dai
+    worker, che non devono ereditare thread dal master. Un 'aggiornatore' già
+    pronto sostituisce quello collegato a Google Sheets (es. benchmark.py).
+    """
+    if aggiornatore is None:
+        catalogo_iniziale = carica_catalogo_iniziale()
 
-def estrai_larghezza_strip(dimensioni):
-    if not dimensioni:
-        return None
-    match = re.search(r'\d+[xX×](\d+(?:[.,]\d+)?)[xX×]\d+', str(dimensioni))
-    if match:
-        return float(match.group(1).replace(',', '.'))
-    return None
+        # Un solo worker scarica da Google Sheets, gli altri seguono lo snapshot su disco.
+        # Se i dati iniziali sono locali vengono riconvalidati subito con Google Sheets.
+        caricatore = CaricatoreCondiviso(
+            lambda: load_all_data(rigoroso=True), PERCORSO_SNAPSHOT, INTERVALLO_AGGIORNAMENTO,
+            scarica_subito=catalogo_iniziale.origine != "sheets"
+        )
+        aggiornatore = AggiornatoreCatalogo(
+            caricatore, catalogo_iniziale, INTERVALLO_CONTROLLO, dopo_aggiornamento=al_nuovo_catalogo
+        )
 
-def estrai_larghezza_profilo(valore):
-    if not valore:
-        return None
-    match = re.search(r'(\d+(?:[.,]\d+)?)', str(valore))
-    if match:
-        return float(match.group(1).replace(',', '.'))
-    return None
+    app = Flask(__name__)
+    CORS(app)
+    app.register_blueprint(bp)
+    app.extensions["aggiornatore_catalogo"] = aggiornatore
+    if avvia_aggiornamento:
+        aggiornatore.avvia()
+    return app
+
+def aggiornatore_corrente():
+    return current_app.extensions["aggiornatore_catalogo"]
+
+@bp.before_app_request
+def avvia_aggiornatore():
+    """Avvia il thread di aggiornamento nel worker, se non è già attivo"""
+    g.inizio_richiesta = time.perf_counter()
+    aggiornatore_corrente().avvia()
+
+@bp.after_app_request
+def registra_richiesta(risposta):
+    """Conteggio e durata di ogni richiesta, per endpoint (le risposte in stream fino agli header)"""
+    endpoint = request.endpoint or "nessuno"
+    metriche.incrementa("avtecno_richieste_total", endpoint=endpoint, stato=risposta.status_code)
+    if "inizio_richiesta" in g:
+        metriche.osserva("avtecno_richiesta_seconds", time.perf_counter() - g.inizio_richiesta, endpoint=endpoint)
+    return risposta
+
+def fase(nome):
+    """Cronometro di una fase di calcolo: with fase("lookup"): ..."""
+    return metriche.cronometra("avtecno_fase_seconds", fase=nome)
+
+def catalogo_corrente():
+    """Snapshot del catalogo usato dalla richiesta in corso, letto una volta sola"""
+    if "catalogo" not in g:
+        g.catalogo = aggiornatore_corrente().catalogo
+    return g.catalogo
+
+def versione_catalogo_corrente():
+    return catalogo_corrente().versione
+
+def parametro(args, nomi):
+    """Primo valore non vuoto tra i nomi alternativi di un parametro"""
+    return next((args[nome] for nome in nomi if args.get(nome)), "")
+
+def parametri_cerca(args):
+    return (
+        args.get("codice", "").strip().upper(), args.get("stream", ""),
+        *(parametro(args, nomi) for nomi in PARAMETRI_ELENCHI)
+    )
+
+def parametri_calcola_alimentatori(args):
+    metri = args.get("metri", "").strip()
+    try:
+        numero = float(metri)
+    except ValueError:
+        numero = None
+    # nan non è uguale a se stesso: come chiave resta il testo, e la route risponde 400
+    if numero is not None and math.isfinite(numero):
+        metri = numero
+    return (args.get("codice", "").strip().upper(), metri)
+
+def parametri_filtra(args):
+    return tuple(sorted(args.items(multi=True)))
+
+def parametri_suggerisci(args):
+    return (args.get("q", "").strip(), args.get("limite", "").strip())
+
+def parametri_delta(args):
+    return parametro(args, ("da", "since"))
 
 def prepara_dettagli_profilo(profilo):
     """Prepara tutti i dettagli del profilo per la visualizzazione"""
@@ -391,35 +321,16 @@ def prepara_dettagli_profilo(profilo):
     
     return dettagli
 
-# Dizionari di supporto
-try:
-    strip_larghezze = {
-        s['Codice'].strip().upper(): estrai_larghezza_strip(s.get('Dimensioni', ''))
-        for s in strip_data if s.get('Codice')
-    }
-
-    profilo_larghezze = {
-        p['Codice'].strip().upper(): estrai_larghezza_profilo(p.get('Larghezza Max Strip', ''))
-        for p in profili_data if p.get('Codice')
-    }
-
-    dimmer_voltaggi = {
-        d['Codice'].strip().upper(): estrai_range_voltaggio_dimmer(d.get('Voltaggio Input', ''))
-        for d in dimmer_data if d.get('Codice')
-    }
-except Exception as e:
-    print(f"Errore nella creazione dei dizionari: {str(e)}")
-    strip_larghezze = {}
-    profilo_larghezze = {}
-    dimmer_voltaggi = {}
-
-@app.route("/")
+@bp.route("/")
 def index():
     return render_template("index.html")
 
-@app.route("/calcola_alimentatori")
+@bp.route("/calcola_alimentatori")
+@in_cache(cache_risposte, versione_catalogo_corrente, parametri_calcola_alimentatori)
+@ammissione.limita()
 def calcola_alimentatori():
     """Calcola alimentatori necessari per una strip e una quantità di metri"""
+    catalogo = catalogo_corrente()
     codice = request.args.get("codice", "").strip().upper()
     metri = request.args.get("metri", "")
     
@@ -428,14 +339,17 @@ def calcola_alimentatori():
     
     try:
         metri_float = float(metri)
+        if not math.isfinite(metri_float):
+            return jsonify({"error": "Metri deve essere un numero valido"}), 400
         if metri_float <= 0:
             return jsonify({"error": "I metri devono essere maggiori di 0"}), 400
     except ValueError:
         return jsonify({"error": "Metri deve essere un numero valido"}), 400
     
     # Trova la strip
-    strip = next((s for s in strip_data if s['Codice'].strip().upper() == codice), None)
-    if not strip:
+    with fase("lookup"):
+        categoria, strip = catalogo.indice_codici.get(codice, (None, None))
+    if categoria != "stripled":
         return jsonify({"error": "Strip non trovata"}), 404
     
     # Calcola ampere necessari
@@ -443,101 +357,471 @@ def calcola_alimentatori():
     if ampere_necessari is None:
         return jsonify({
             "error": "Impossibile calcolare ampere: dati di potenza o voltaggio mancanti",
-            "strip": strip
+            "strip": strip.dati
         }), 400
     
-    # Trova alimentatori compatibili
-    alimentatori_compatibili = trova_alimentatori_compatibili_v2(ampere_necessari, alimentatori_data)
+    # Trova alimentatori compatibili alla tensione della strip (searchsorted sulle correnti ordinate)
+    with fase("alimentatori"):
+        alimentatori_compatibili = catalogo.dimensionamento.alimentatori_compatibili(
+            ampere_necessari, strip.voltaggio_nominale
+        )
     
     # Informazioni di debug
-    potenza_per_metro = estrai_potenza_strip(strip.get('Potenza', ''))
-    voltaggio = estrai_voltaggio_strip(strip.get('Input Volt', ''))
+    potenza_per_metro = strip.potenza_per_metro
+    voltaggio = strip.voltaggio_nominale
     potenza_totale = potenza_per_metro * metri_float if potenza_per_metro else None
     
+    with fase("serializzazione"):
+        return jsonify({
+            "strip": strip.dati,
+            "metri": metri_float,
+            "calcoli": {
+                "potenza_per_metro": potenza_per_metro,
+                "voltaggio": voltaggio,
+                "potenza_totale": potenza_totale,
+                "ampere_necessari": ampere_necessari,
+                "margine_sicurezza": 1.2
+            },
+            "alimentatori_compatibili": alimentatori_compatibili,
+            "debug": {
+                "num_alimentatori_totali": len(catalogo.alimentatori_data),
+                "num_alimentatori_compatibili": len(alimentatori_compatibili)
+            }
+        })
+
+@bp.route("/tabella_alimentatori")
+@ammissione.limita(CONCORRENZA_ROUTE_PESANTI)
+def tabella_alimentatori():
+    """Export della tabella strip x metri con gli alimentatori compatibili.
+
+    ?metri=1,2,5,10 indica le lunghezze; ?formato=csv restituisce un CSV.
+    Gli alimentatori sono ordinati per tensione e corrente: per ogni strip e
+    lunghezza sono compatibili quelli da 'primo_alimentatore' a
+    'fine_alimentatori' escluso, cioè quelli alla tensione della strip con
+    corrente sufficiente.
+    """
+    try:
+        lunghezze = [float(m) for m in request.args.get("metri", "1,2,5,10").split(",") if m.strip()]
+    except ValueError:
+        return jsonify({"error": "Metri deve essere una lista di numeri separati da virgola"}), 400
+    if not lunghezze or len(lunghezze) > MAX_LUNGHEZZE_TABELLA or any(not math.isfinite(m) or m <= 0 for m in lunghezze):
+        return jsonify({"error": f"Indica da 1 a {MAX_LUNGHEZZE_TABELLA} lunghezze maggiori di 0"}), 400
+
+    motore = catalogo_corrente().dimensionamento
+    ampere, primo, fine = motore.tabella(lunghezze)
+    codici_alimentatori = [a.codice for a in motore.alimentatori]
+
+    if request.args.get("formato") == "csv":
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(["strip", "metri", "ampere_necessari", "alimentatore_minimo", "num_alimentatori_compatibili"])
+        for s, riga_ampere, riga_primo, f in zip(motore.strip, ampere.tolist(), primo.tolist(), fine.tolist()):
+            for metri, a, p in zip(lunghezze, riga_ampere, riga_primo):
+                writer.writerow([
+                    s.codice, metri, "" if math.isnan(a) else a,
+                    codici_alimentatori[p] if p < f else "",
+                    f - p
+                ])
+        return Response(output.getvalue(), mimetype="text/csv",
+                        headers={"Content-Disposition": "attachment; filename=tabella_alimentatori.csv"})
+
     return jsonify({
-        "strip": strip,
-        "metri": metri_float,
-        "calcoli": {
-            "potenza_per_metro": potenza_per_metro,
-            "voltaggio": voltaggio,
-            "potenza_totale": potenza_totale,
-            "ampere_necessari": ampere_necessari,
-            "margine_sicurezza": 1.2
-        },
-        "alimentatori_compatibili": alimentatori_compatibili,
+        "metri": lunghezze,
+        "margine_sicurezza": 1.2,
+        "alimentatori": codici_alimentatori,
+        "correnti": motore.correnti.tolist(),
+        "tensioni": motore.tensioni.tolist(),
+        "strip": [
+            {
+                "codice": s.codice,
+                "ampere_necessari": [None if math.isnan(a) else a for a in riga_ampere],
+                "primo_alimentatore": riga_primo,
+                "fine_alimentatori": f,
+                "num_compatibili": [f - p for p in riga_primo]
+            }
+            for s, riga_ampere, riga_primo, f in zip(motore.strip, ampere.tolist(), primo.tolist(), fine.tolist())
+        ]
+    })
+
+def pianifica_tratta(catalogo, codice, metri, obiettivo, metri_max_tratta=None):
+    """Piano di alimentazione di una tratta di strip: (dizionario, stato HTTP)"""
+    categoria, strip = catalogo.indice_codici.get(codice, (None, None))
+    if categoria != "stripled":
+        return {"error": "Strip non trovata"}, 404
+
+    # Come in calcola_ampere_necessari_v2: prima la colonna "ampere per metro"
+    ampere_per_metro = strip.ampere_per_metro_effettivi
+    tensione = strip.voltaggio_nominale
+    if not ampere_per_metro or tensione is None:
+        return {"error": "Impossibile calcolare ampere: dati di potenza o voltaggio mancanti"}, 400
+
+    with fase("alimentatori"):
+        piano = catalogo.pianificatore.pianifica(ampere_per_metro, tensione, metri, obiettivo, metri_max_tratta)
+    if piano is None:
+        return {"error": f"Nessun alimentatore a {tensione:g}V adatto a questa strip"}, 404
+    segmenti, criterio_costo = piano
+
+    return {
+        "codice": codice,
+        "metri": metri,
+        "ampere_per_metro": round(ampere_per_metro, 3),
+        "voltaggio": tensione,
+        "criterio_costo": criterio_costo,
+        "segmenti": segmenti_piano(segmenti, ampere_per_metro),
+        "num_alimentatori": len(segmenti)
+    }, 200
+
+def segmenti_piano(segmenti, ampere_per_metro):
+    """Segmenti di un piano di alimentazione nel formato delle risposte"""
+    return [
+        {
+            "codice_alimentatore": alimentatore.codice,
+            "alimentatore": alimentatore.dati,
+            "metri": metri_tratta,
+            "metri_max_supportati": metri_max,
+            "ampere_necessari": round(ampere_per_metro * metri_tratta, 3),
+            "margine_utilizzazione": round(ampere_per_metro * metri_tratta / alimentatore.corrente_nominale * 100, 1)
+        }
+        for alimentatore, metri_tratta, metri_max in segmenti
+    ]
+
+def leggi_tratte_richiesta():
+    """Tratte da pianificare: dal corpo JSON {"tratte": [...]} oppure da ?codice=&metri="""
+    if request.method == "POST":
+        corpo = request.get_json(silent=True)
+        if not isinstance(corpo, dict) or not isinstance(corpo.get("tratte"), list):
+            return None, {}
+        return corpo["tratte"], corpo
+    return [{"codice": request.args.get("codice"), "metri": request.args.get("metri")}], request.args
+
+@bp.route("/pianifica_alimentatori", methods=["GET", "POST"])
+@ammissione.limita(CONCORRENZA_ROUTE_PESANTI)
+def pianifica_alimentatori():
+    """Piano con più alimentatori per tratte troppo lunghe per uno solo.
+
+    Ogni tratta viene divisa in segmenti, ognuno col proprio alimentatore,
+    rispettando il margine di sicurezza e la tensione della strip.
+    obiettivo=numero minimizza gli alimentatori, obiettivo=costo il prezzo
+    (o i watt installati se il foglio non ha prezzi); metri_max_tratta limita
+    la lunghezza alimentata da un solo punto.
+    """
+    tratte, opzioni = leggi_tratte_richiesta()
+    if not tratte:
+        return jsonify({"error": "Fornisci codice e metri, oppure una lista di tratte"}), 400
+    if len(tratte) > MAX_TRATTE_PIANO:
+        return jsonify({"error": f"Massimo {MAX_TRATTE_PIANO} tratte per richiesta"}), 400
+
+    obiettivo = opzioni.get("obiettivo") or "numero"
+    if obiettivo not in OBIETTIVI:
+        return jsonify({"error": f"Obiettivo non valido, usa uno tra: {', '.join(OBIETTIVI)}"}), 400
+
+    metri_max_tratta = opzioni.get("metri_max_tratta")
+    try:
+        metri_max_tratta = float(metri_max_tratta) if metri_max_tratta not in (None, "") else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "metri_max_tratta deve essere un numero valido"}), 400
+    if metri_max_tratta is not None and not math.isfinite(metri_max_tratta):
+        return jsonify({"error": "metri_max_tratta deve essere un numero valido"}), 400
+    if metri_max_tratta is not None and metri_max_tratta <= 0:
+        return jsonify({"error": "metri_max_tratta deve essere maggiore di 0"}), 400
+
+    richieste = []
+    for tratta in tratte:
+        tratta = tratta if isinstance(tratta, dict) else {}
+        try:
+            metri = float(tratta.get("metri"))
+        except (TypeError, ValueError):
+            metri = None
+        richieste.append((normalizza_codice(tratta.get("codice")), metri))
+    # Ogni metro è un passo del piano da calcolare: il totale limita il lavoro di una richiesta
+    metri_totali = sum(m for _, m in richieste if m is not None and 0 < m <= MAX_METRI_TRATTA)
+    if metri_totali > MAX_METRI_TOTALI_PIANO:
+        return jsonify({"error": f"Massimo {MAX_METRI_TOTALI_PIANO:g} metri in tutte le tratte della richiesta"}), 400
+
+    catalogo = catalogo_corrente()
+    risultati = []
+    for codice, metri in richieste:
+        if not codice or metri is None:
+            risultato, stato = {"error": "Codice e metri sono obbligatori"}, 400
+        elif not 0 < metri <= MAX_METRI_TRATTA:
+            risultato, stato = {"error": f"I metri devono essere tra 0 e {MAX_METRI_TRATTA:g}"}, 400
+        else:
+            risultato, stato = pianifica_tratta(catalogo, codice, metri, obiettivo, metri_max_tratta)
+        risultati.append({"codice": codice, "stato": stato, "risultato": risultato})
+
+    if request.method == "GET":
+        return jsonify(risultati[0]["risultato"]), risultati[0]["stato"]
+
+    # Distinta complessiva degli alimentatori da ordinare
+    distinta = {}
+    for r in risultati:
+        for segmento in r["risultato"].get("segmenti", []):
+            codice_alimentatore = segmento["codice_alimentatore"]
+            distinta[codice_alimentatore] = distinta.get(codice_alimentatore, 0) + 1
+
+    return jsonify({
+        "obiettivo": obiettivo,
+        "margine_sicurezza": catalogo.pianificatore.margine_sicurezza,
+        "tratte": risultati,
+        "alimentatori": [{"codice": c, "quantita": q} for c, q in distinta.items()],
+        "num_alimentatori": sum(distinta.values()),
+        "debug": {
+            "num_tratte": len(risultati),
+            "num_pianificate": sum(1 for r in risultati if r["stato"] == 200)
+        }
+    })
+
+@bp.route("/configura")
+@in_cache(cache_risposte, versione_catalogo_corrente, parametri_filtra)
+@ammissione.limita(CONCORRENZA_ROUTE_PESANTI)
+def configura():
+    """Kit completi strip + profilo + dimmer + alimentatori per una tratta, dal migliore.
+
+    ?metri= è obbligatorio; la strip si sceglie con ?codice= oppure con le
+    faccette di /filtra sulle strip (?voltaggio=24&ip=IP65&kelvin_max=3000,
+    senza filtri vale tutto il catalogo). ?k= kit restituiti, ?obiettivo=
+    numero|costo come /pianifica_alimentatori, ?dimmer=0 per kit senza dimmer.
+    """
+    try:
+        metri = float(request.args.get("metri", ""))
+        k = int(request.args.get("k", KIT_CONFIGURA))
+    except ValueError:
+        return jsonify({"error": "Metri e k devono essere numeri validi"}), 400
+    if not 0 < metri <= MAX_METRI_TRATTA:
+        return jsonify({"error": f"I metri devono essere tra 0 e {MAX_METRI_TRATTA:g}"}), 400
+    if not 1 <= k <= MAX_KIT_CONFIGURA:
+        return jsonify({"error": f"k deve essere tra 1 e {MAX_KIT_CONFIGURA}"}), 400
+    obiettivo = request.args.get("obiettivo") or "numero"
+    if obiettivo not in OBIETTIVI:
+        return jsonify({"error": f"Obiettivo non valido, usa uno tra: {', '.join(OBIETTIVI)}"}), 400
+    con_dimmer = request.args.get("dimmer", "1").strip().lower() not in ("0", "false", "no")
+
+    catalogo = catalogo_corrente()
+    codice = normalizza_codice(request.args.get("codice"))
+    with fase("lookup"):
+        if codice:
+            categoria, strip = catalogo.indice_codici.get(codice, (None, None))
+            if categoria != "stripled":
+                return jsonify({"error": "Strip non trovata"}), 404
+            candidate = [strip]
+        else:
+            indice = catalogo.filtri["stripled"]
+            try:
+                selezioni, intervalli = leggi_faccette(indice, request.args)
+            except ValueError:
+                return jsonify({"error": "Valori numerici non validi nei filtri"}), 400
+            if selezioni or intervalli:
+                risultato, _ = indice.filtra(selezioni, intervalli)
+                candidate = [indice.prodotti[p] for p in posizioni_da_bitmap(risultato)]
+            else:
+                candidate = indice.prodotti
+
+    with fase("configurazione"):
+        kit, classi = catalogo.configuratore.configura(candidate, metri, obiettivo, con_dimmer, k)
+    if codice and not kit:
+        return jsonify({"error": "Nessun kit completo (profilo, dimmer e alimentatori) per questa strip"}), 404
+
+    with fase("serializzazione"):
+        risposta = []
+        for posizione, voce in enumerate(kit, 1):
+            strip = voce["strip"]
+            ampere_per_metro = strip.ampere_per_metro_effettivi
+            # Il piano della classifica è per passi da 10 cm: qui si ripete sui metri esatti (tabelle già pronte)
+            segmenti, criterio_costo = catalogo.pianificatore.pianifica(
+                ampere_per_metro, strip.voltaggio_nominale, metri, obiettivo
+            )
+            prezzi = [a.prezzo for a, _, _ in segmenti]
+            risposta.append({
+                "posizione": posizione,
+                "strip": strip.dati,
+                "profilo": voce["profilo"].dati,
+                "dimmer": voce["dimmer"].dati if voce["dimmer"] is not None else None,
+                "alimentatori": segmenti_piano(segmenti, ampere_per_metro),
+                "num_alimentatori": len(segmenti),
+                "potenza_installata_W": round(sum(a.potenza or 0.0 for a, _, _ in segmenti), 1),
+                "prezzo_alimentatori": round(sum(prezzi), 2) if None not in prezzi else None,
+                "criterio_costo": criterio_costo,
+                "scarto_larghezza_mm": round(voce["scarto_larghezza"], 2),
+                "dimmer_stesso_profilo_colore": voce["stesso_profilo_colore"]
+            })
+
+    return jsonify({
+        "metri": metri,
+        "obiettivo": obiettivo,
+        "kit": risposta,
         "debug": {
-            "num_alimentatori_totali": len(alimentatori_data),
-            "num_alimentatori_compatibili": len(alimentatori_compatibili)
+            "strip_candidate": len(candidate),
+            "classi_strip": classi,
+            "num_kit": len(risposta)
         }
     })
 
-@app.route("/cerca")
+@bp.route("/cerca")
+@in_cache(cache_risposte, versione_catalogo_corrente, parametri_cerca)
+@ammissione.limita()
 def cerca():
+    """Prodotto e prodotti compatibili.
+
+    Gli elenchi di prodotti compatibili si possono ridurre alle colonne
+    ?campi=Codice,Dimensioni e sfogliare con ?limite=50 e il ?cursore=
+    restituito dalla pagina precedente; con ?stream=1 la risposta è NDJSON
+    (vedi risposta_con_elenchi).
+    """
     codice = request.args.get("codice", "").strip().upper()
     if not codice:
         return jsonify({"error": "Nessun codice fornito"}), 400
+    try:
+        pagina = leggi_pagina(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    print(f"🔍 Cercando codice: {codice}")
+    # Un solo snapshot per tutta la richiesta, anche se nel frattempo arriva una ricarica
+    catalogo = catalogo_corrente()
+    if pagina["etag"] is not None and pagina["etag"] != catalogo.etag:
+        return jsonify({"error": "Il catalogo è stato aggiornato: ricomincia dalla prima pagina"}), 409
+    risultato, stato = ricerca_prodotto(catalogo, codice)
+    return risposta_con_elenchi(risultato, stato, pagina, catalogo.etag)
 
-    # --- RICERCA STRIP LED ---
-    strip = next((s for s in strip_data if s['Codice'].strip().upper() == codice), None)
-    if strip:
-        print(f"✅ Strip trovata: {strip['Codice']}")
+def codifica_cursore(etag, inizio):
+    """Cursore opaco per la pagina che parte da 'inizio' nel catalogo con questo etag.
 
-        larghezza_strip = strip_larghezze.get(codice)
-        if larghezza_strip is None:
-            return jsonify({"error": "Larghezza strip non trovata"}), 404
+    L'etag è l'hash del contenuto dei fogli, uguale in tutti i worker: un
+    cursore resta valido anche se la pagina successiva la serve un altro
+    processo, finché il catalogo non cambia.
+    """
+    return base64.urlsafe_b64encode(f"{etag}:{inizio}".encode()).decode().rstrip("=")
 
-        # Profili compatibili
-        profili_compatibili = []
-        for p in profili_data:
-            larghezza_profilo = profilo_larghezze.get(p['Codice'].strip().upper())
-            if larghezza_profilo is not None and larghezza_profilo >= larghezza_strip:
-                profilo_con_dettagli = p.copy()
-                profili_compatibili.append(profilo_con_dettagli)
+def decodifica_cursore(cursore):
+    """(etag, inizio) di un cursore; ValueError se non è valido"""
+    try:
+        testo = base64.urlsafe_b64decode(cursore + "=" * (-len(cursore) % 4)).decode()
+        etag, separatore, inizio = testo.rpartition(":")
+        inizio = int(inizio)
+    except ValueError:
+        raise ValueError("Cursore non valido") from None
+    if not separatore or not etag or inizio < 0:
+        raise ValueError("Cursore non valido")
+    return etag, inizio
 
-        # Logica dimmer basata su temperatura colore
-        input_volt_strip_float = estrai_voltaggio_singolo(strip.get('Input Volt', ''))
-        categoria_canali_strip = determina_categoria_canali_strip(strip)
-        temp_colore_strip = estrai_temperatura_colore(strip)
+def leggi_pagina(args):
+    """Proiezione, pagina e formato richiesti per gli elenchi; ValueError se non validi"""
+    campi, limite, cursore = (parametro(args, nomi) for nomi in PARAMETRI_ELENCHI)
+    pagina = {
+        "campi": [c.strip() for c in campi.split(",") if c.strip()] or None,
+        "limite": None,
+        "etag": None,
+        "inizio": 0,
+        "stream": args.get("stream") in ("1", "true")
+    }
+    if limite:
+        try:
+            pagina["limite"] = int(limite)
+        except ValueError:
+            raise ValueError("Limite deve essere un numero intero") from None
+        if not 1 <= pagina["limite"] <= MAX_LIMITE_ELENCHI:
+            raise ValueError(f"Il limite deve essere tra 1 e {MAX_LIMITE_ELENCHI}")
+    if cursore:
+        pagina["etag"], pagina["inizio"] = decodifica_cursore(cursore)
+    return pagina
 
-        print(f"🌡️ Strip - Temperatura colore: {temp_colore_strip}K, Categoria: {categoria_canali_strip}")
+def elenchi_risultato(risultato):
+    """Elenchi di prodotti compatibili contenuti in un risultato, per nome"""
+    return {nome: valore for nome, valore in risultato.items() if isinstance(valore, ELENCHI)}
 
-        dimmer_compatibili = []
+def completa_elenchi(risultato, materializzate=None, campi=None, inizio=0, fine=None):
+    """Sostituisce gli elenchi del risultato con le loro righe JSON (tutte o da 'inizio' a 'fine').
 
-        for d in dimmer_data:
-            if not d.get('Codice'):
+    Con 'materializzate' (un dizionario tenuto per la durata della richiesta)
+    ogni lista condivisa tra più prodotti viene costruita una volta sola.
+    """
+    with fase("righe"):
+        for nome, elenco in elenchi_risultato(risultato).items():
+            if materializzate is None:
+                risultato[nome] = elenco.righe(inizio, fine, campi)
                 continue
-                
-            codice_dimmer = d['Codice'].strip().upper()
-            min_v, max_v = estrai_range_voltaggio_dimmer(d.get("Voltaggio Input", ""))
-            categoria_canali_dimmer = determina_categoria_canali_dimmer(d)
-
-            # Controlli di compatibilità
-            is_volt_compatibile = (
-                input_volt_strip_float is not None and 
-                min_v is not None and max_v is not None and 
-                min_v <= input_volt_strip_float <= max_v
-            )
-            
-            is_canali_compatibile = (
-                categoria_canali_strip is not None and 
-                categoria_canali_dimmer is not None and 
-                categoria_canali_strip == categoria_canali_dimmer
-            )
+            chiave = (elenco.chiave, inizio, fine, tuple(campi or ()))
+            if chiave not in materializzate:
+                materializzate[chiave] = elenco.righe(inizio, fine, campi)
+            risultato[nome] = materializzate[chiave]
+    return risultato
 
-            if is_volt_compatibile and is_canali_compatibile:
-                dimmer_compatibili.append(d)
-                print(f"✅ {codice_dimmer} compatibile")
+def risposta_con_elenchi(risultato, stato, pagina, etag):
+    """Risposta di /cerca, /strip_alimentabili e /compatibili per la proiezione e la pagina richieste.
+
+    Senza parametri è il JSON completo. Con ?limite= o ?cursore= ogni elenco
+    contiene solo la pagina richiesta e "paginazione" riporta i totali e il
+    cursore della pagina successiva (null all'ultima). Con ?stream=1 la
+    risposta è NDJSON: una prima riga col risultato senza elenchi e coi
+    "totali", poi righe {"elenco": nome, "righe": [...]} di RIGHE_PER_BLOCCO
+    prodotti al massimo, costruite man mano, e infine {"fine": true}.
+    """
+    elenchi = elenchi_risultato(risultato)
+    inizio, limite = pagina["inizio"], pagina["limite"]
+    fine = None if limite is None else inizio + limite
+    totali = {nome: len(elenco) for nome, elenco in elenchi.items()}
+    if limite is not None or pagina["etag"] is not None:
+        altre_pagine = fine is not None and any(n > fine for n in totali.values())
+        risultato["paginazione"] = {
+            "inizio": inizio,
+            "limite": limite,
+            "totali": totali,
+            "cursore_successivo": codifica_cursore(etag, fine) if altre_pagine else None
+        }
+
+    if not pagina["stream"]:
+        completa_elenchi(risultato, campi=pagina["campi"], inizio=inizio, fine=fine)
+        with fase("serializzazione"):
+            return jsonify(risultato), stato
+
+    json_app = current_app.json
+
+    def genera():
+        intestazione = {nome: valore for nome, valore in risultato.items() if nome not in elenchi}
+        intestazione["totali"] = totali
+        yield json_app.dumps(intestazione) + "\n"
+        for nome, elenco in elenchi.items():
+            ultima = len(elenco) if fine is None else min(fine, len(elenco))
+            for da in range(inizio, ultima, RIGHE_PER_BLOCCO):
+                righe = elenco.righe(da, min(da + RIGHE_PER_BLOCCO, ultima), pagina["campi"])
+                yield json_app.dumps({"elenco": nome, "righe": righe}) + "\n"
+        yield json_app.dumps({"fine": True}) + "\n"
+    return Response(genera(), status=stato, mimetype="application/x-ndjson")
+
+def ricerca_prodotto(catalogo, codice):
+    """Risultato di /cerca per un codice già normalizzato: (dizionario, stato HTTP).
+
+    I prodotti compatibili sono elenchi (ElencoProdotti, ElencoStripAlimentabili)
+    da completare con completa_elenchi() o risposta_con_elenchi().
+    """
+    with fase("lookup"):
+        categoria, prodotto = catalogo.indice_codici.get(codice, (None, None))
+
+    # --- RICERCA STRIP LED ---
+    if categoria == "stripled":
+        strip = prodotto
+
+        larghezza_strip = catalogo.strip_larghezze.get(codice)
+        if larghezza_strip is None:
+            return {"error": "Larghezza strip non trovata"}, 404
+
+        # Profili e dimmer compatibili (precalcolati nel grafo)
+        with fase("profili"):
+            profili_compatibili = ElencoProdotti(catalogo.grafo.profili_per_strip.get(codice, ()))
+        with fase("dimmer"):
+            dimmer_compatibili = ElencoProdotti(catalogo.grafo.dimmer_per_strip.get(codice, ()))
+
+        input_volt_strip_float = strip.voltaggio
+        categoria_canali_strip = strip.categoria_canali
+        temp_colore_strip = strip.temperatura_colore
 
         # Informazioni per calcolo alimentatori
-        potenza_per_metro = estrai_potenza_strip(strip.get('Potenza', ''))
-        voltaggio_strip = estrai_voltaggio_strip(strip.get('Input Volt', ''))
+        potenza_per_metro = strip.potenza_per_metro
+        voltaggio_strip = strip.voltaggio_nominale
         calcolo_alimentatori_possibile = (potenza_per_metro is not None and voltaggio_strip is not None)
 
-        return jsonify({
+        return {
             "tipo": "stripled",
-            "strip": strip,
+            "strip": strip.dati,
             "profili_compatibili": profili_compatibili,
             "dimmer_compatibili": dimmer_compatibili,
             "calcolo_alimentatori": {
@@ -553,28 +837,23 @@ def cerca():
                 "num_dimmer_compatibili": len(dimmer_compatibili),
                 "num_profili_compatibili": len(profili_compatibili)
             }
-        })
+        }, 200
 
     # --- RICERCA PROFILO ---
-    profilo = next((p for p in profili_data if p['Codice'].strip().upper() == codice), None)
-    if profilo:
-        print(f"✅ Profilo trovato: {profilo['Codice']}")
-        
-        larghezza_profilo = profilo_larghezze.get(codice)
+    if categoria == "profili":
+        profilo = prodotto
+
+        larghezza_profilo = catalogo.profilo_larghezze.get(codice)
         if larghezza_profilo is None:
-            return jsonify({"error": "Larghezza profilo non trovata"}), 404
+            return {"error": "Larghezza profilo non trovata"}, 404
 
-        strip_compatibili = [
-            s for s in strip_data
-            if s.get('Codice') and
-            strip_larghezze.get(s['Codice'].strip().upper()) is not None and
-            strip_larghezze[s['Codice'].strip().upper()] <= larghezza_profilo
-        ]
+        with fase("profili"):
+            strip_compatibili = ElencoProdotti(catalogo.grafo.strip_per_profilo.get(codice, ()))
 
-        profilo_con_dettagli = profilo.copy()
-        profilo_con_dettagli['dettagli_completi'] = prepara_dettagli_profilo(profilo)
+        profilo_con_dettagli = profilo.dati
+        profilo_con_dettagli['dettagli_completi'] = prepara_dettagli_profilo(profilo_con_dettagli)
 
-        return jsonify({
+        return {
             "tipo": "profilo",
             "profilo": profilo_con_dettagli,
             "strip_compatibili": strip_compatibili,
@@ -582,122 +861,592 @@ def cerca():
                 "larghezza_profilo": larghezza_profilo,
                 "num_strip_compatibili": len(strip_compatibili)
             }
-        })
+        }, 200
 
     # --- RICERCA DIMMER ---
-    dimmer = next((d for d in dimmer_data if d['Codice'].strip().upper() == codice), None)
-    if dimmer:
-        print(f"✅ Dimmer trovato: {dimmer['Codice']}")
-        
-        min_v, max_v = dimmer_voltaggi.get(codice, (None, None))
-        if min_v is None or max_v is None:
-            return jsonify({"error": "Voltaggio dimmer non trovato"}), 404
-
-        categoria_canali_dimmer = determina_categoria_canali_dimmer(dimmer)
-
-        # Trova strip compatibili
-        strip_compatibili = []
-        for s in strip_data:
-            if not s.get('Codice'):
-                continue
-
-            input_volt_strip = estrai_voltaggio_singolo(s.get('Input Volt', ''))
-            if input_volt_strip is None:
-                continue
+    if categoria == "Dimmer":
+        dimmer = prodotto
 
-            categoria_canali_strip = determina_categoria_canali_strip(s)
+        min_v, max_v = catalogo.dimmer_voltaggi.get(codice, (None, None))
+        if min_v is None or max_v is None:
+            return {"error": "Voltaggio dimmer non trovato"}, 404
 
-            is_volt_compatibile = min_v <= input_volt_strip <= max_v
-            is_canali_compatibile = (
-                categoria_canali_dimmer is not None and 
-                categoria_canali_strip is not None and 
-                categoria_canali_dimmer == categoria_canali_strip
-            )
+        categoria_canali_dimmer = dimmer.categoria_canali
 
-            if is_volt_compatibile and is_canali_compatibile:
-                strip_compatibili.append(s)
+        # Strip compatibili (precalcolate nel grafo)
+        with fase("dimmer"):
+            strip_compatibili = ElencoProdotti(catalogo.grafo.strip_per_dimmer.get(codice, ()))
 
-        return jsonify({
+        return {
             "tipo": "dimmer",
-            "dimmer": dimmer,
+            "dimmer": dimmer.dati,
             "strip_compatibili": strip_compatibili,
             "debug": {
                 "voltaggio_dimmer": [min_v, max_v],
                 "categoria_canali_dimmer": categoria_canali_dimmer,
                 "num_strip_compatibili": len(strip_compatibili)
             }
-        })
+        }, 200
 
     # --- RICERCA ALIMENTATORE ---
-    alimentatore = next((a for a in alimentatori_data if a.get('codice', '').strip().upper() == codice), None)
-    if alimentatore:
-        print(f"✅ Alimentatore trovato: {alimentatore.get('codice', '')}")
-    
-    corrente_alimentatore = alimentatore.get('corrente_A') or alimentatore.get('Corrente A')
-    try:
-        corrente_alimentatore = float(str(corrente_alimentatore).replace(',', '.'))
-    except Exception:
-        corrente_alimentatore = None
+    if categoria == "alimentatori":
+        return risultato_alimentatore(catalogo, prodotto)
 
-    if corrente_alimentatore is None or corrente_alimentatore <= 0:
-        return jsonify({"error": "Corrente alimentatore non valida"}), 404
+    # Codice sconosciuto: proponiamo i codici più simili invece del solo 404
+    with fase("suggerimenti"):
+        suggerimenti = catalogo.indice_ricerca.suggerisci(codice, limite=5)
+    return {
+        "error": "Nessun prodotto trovato",
+        "suggerimenti": [s["codice"] for s in suggerimenti]
+    }, 404
 
-    # Trova strip compatibili
-    strip_compatibili = []
-    MARGINE_SICUREZZA = 1.2
-    
-    for s in strip_data:
-        if not s.get('Codice'):
-            continue
-            
-        potenza_per_metro = estrai_potenza_strip(s.get('Potenza', ''))
-        voltaggio_strip = estrai_voltaggio_strip(s.get('Input Volt', ''))
-        
-        if potenza_per_metro is None or voltaggio_strip is None or voltaggio_strip == 0:
-            continue
-        
-        ampere_per_metro = potenza_per_metro / voltaggio_strip
-        metri_max = corrente_alimentatore / (ampere_per_metro * MARGINE_SICUREZZA)
-        
-        if metri_max >= 0.1:  # Supporta almeno 10cm
-            strip_info = s.copy()
-            strip_info.update({
-                'metri_max_supportati': round(metri_max, 2),
-                'ampere_per_metro': round(ampere_per_metro, 3),
-                'potenza_per_metro': round(potenza_per_metro, 2),
-                'voltaggio': voltaggio_strip
-            })
-            strip_compatibili.append(strip_info)
+def valore_faccetta(valore, numerica):
+    """Converte il valore di una faccetta letto dalla query string; ValueError se non è un numero finito"""
+    valore = valore.strip()
+    if numerica:
+        numero = float(valore.replace(',', '.'))
+        # nan e inf passano float() ma non hanno senso nei confronti degli indici
+        if not math.isfinite(numero):
+            raise ValueError(f"Valore non finito: {valore}")
+        return numero
+    return valore.upper()
+
+def etichetta_faccetta(valore):
+    """Chiave JSON di un valore di faccetta: 24.0 -> '24', 'IP65' resta 'IP65'"""
+    return f"{valore:g}" if isinstance(valore, (int, float)) else str(valore)
 
-    strip_compatibili.sort(key=lambda x: x['metri_max_supportati'], reverse=True)
+def leggi_faccette(indice, args):
+    """(selezioni, intervalli) per IndiceFacette.filtra dai parametri ?nome=, ?nome_min=, ?nome_max=.
+
+    Solleva ValueError se un valore numerico non è valido.
+    """
+    selezioni = {}
+    intervalli = {}
+    for nome in indice.facette:
+        numerica = nome in indice.numeriche
+        valori = [v for v in ",".join(args.getlist(nome)).split(",") if v.strip()]
+        if valori:
+            selezioni[nome] = [valore_faccetta(v, numerica) for v in valori]
+        if nome in indice.intervalli:
+            minimo = args.get(f"{nome}_min", "").strip()
+            massimo = args.get(f"{nome}_max", "").strip()
+            if minimo or massimo:
+                intervalli[nome] = (
+                    valore_faccetta(minimo, True) if minimo else None,
+                    valore_faccetta(massimo, True) if massimo else None
+                )
+    return selezioni, intervalli
+
+@bp.route("/filtra")
+@in_cache(cache_risposte, versione_catalogo_corrente, parametri_filtra)
+@ammissione.limita()
+def filtra():
+    """Filtra strip, profili o dimmer per faccette, con i conteggi per ogni valore.
+
+    ?categoria=stripled|profili|dimmer; ogni faccetta si filtra con
+    ?nome=valore (più valori separati da virgola sono in OR) e quelle
+    numeriche anche con ?nome_min= e ?nome_max=. ?profilo=CODICE limita le
+    strip a quelle che entrano nel profilo, ?strip=CODICE limita profili e
+    dimmer a quelli compatibili con la strip. Paginazione con limite e offset.
+    """
+    categoria = CATEGORIE_FILTRA.get(request.args.get("categoria", "stripled").strip().lower())
+    if categoria is None:
+        return jsonify({"error": f"Categoria non valida, usa una tra: {', '.join(CATEGORIE_FILTRA)}"}), 400
+
+    catalogo = catalogo_corrente()
+    indice = catalogo.filtri[categoria]
+
+    try:
+        selezioni, intervalli = leggi_faccette(indice, request.args)
+        limite = min(int(request.args.get("limite", LIMITE_FILTRA)), MAX_LIMITE_FILTRA)
+        offset = int(request.args.get("offset", 0))
+    except ValueError:
+        return jsonify({"error": "Valori numerici non validi nei filtri"}), 400
+    if limite < 1 or offset < 0:
+        return jsonify({"error": "Limite e offset non validi"}), 400
+
+    # Compatibilità con un altro prodotto, tradotta nelle stesse faccette usate dal grafo
+    if request.args.get("profilo") and categoria == "stripled":
+        larghezza_profilo = catalogo.profilo_larghezze.get(normalizza_codice(request.args["profilo"]))
+        if larghezza_profilo is None:
+            return jsonify({"error": "Profilo non trovato o senza larghezza"}), 404
+        minimo, massimo = intervalli.get("larghezza", (None, None))
+        massimo = larghezza_profilo if massimo is None else min(massimo, larghezza_profilo)
+        intervalli["larghezza"] = (minimo, massimo)
+    if request.args.get("strip") and categoria in ("profili", "Dimmer"):
+        codice_strip = normalizza_codice(request.args["strip"])
+        tipo, strip = catalogo.indice_codici.get(codice_strip, (None, None))
+        if tipo != "stripled":
+            return jsonify({"error": "Strip non trovata"}), 404
+        if categoria == "profili":
+            larghezza_strip = catalogo.strip_larghezze.get(codice_strip)
+            if larghezza_strip is None:
+                return jsonify({"error": "Larghezza strip non trovata"}), 404
+            minimo, massimo = intervalli.get("larghezza", (None, None))
+            intervalli["larghezza"] = (larghezza_strip if minimo is None else max(minimo, larghezza_strip), massimo)
+        else:
+            selezioni["voltaggio"] = [strip.voltaggio] if strip.voltaggio is not None else []
+            selezioni["categoria_canali"] = [strip.categoria_canali] if strip.categoria_canali is not None else []
+
+    risultato, conteggi = indice.filtra(selezioni, intervalli)
+    posizioni = posizioni_da_bitmap(risultato, offset, limite)
 
     return jsonify({
+        "categoria": categoria,
+        "totale": risultato.bit_count(),
+        "offset": offset,
+        "limite": limite,
+        "risultati": materializza([indice.prodotti[p] for p in posizioni]),
+        "facette": {
+            nome: {etichetta_faccetta(valore): n for valore, n in valori.items()}
+            for nome, valori in conteggi.items()
+        },
+        "intervalli": indice.estremi()
+    })
+
+def leggi_numero(args, nome):
+    """Parametro numerico opzionale (accetta la virgola decimale); ValueError se non valido"""
+    valore = args.get(nome, "").strip()
+    if not valore:
+        return None
+    try:
+        return valore_faccetta(valore, True)
+    except ValueError:
+        raise ValueError(f"{nome} deve essere un numero valido") from None
+
+def leggi_categoria_canali(args, per_strip):
+    """Categoria canali delle specifiche: ?categoria_canali=, oppure da ?canali= (e ?kelvin= per una strip).
+
+    Segue le regole dei fogli: per una strip conta prima la temperatura
+    colore, poi i canali; per un dimmer solo i canali. None se non indicata.
+    """
+    categoria = args.get("categoria_canali", "").strip().upper()
+    if categoria:
+        if categoria not in CATEGORIE_CANALI:
+            raise ValueError(f"categoria_canali non valida, usa una tra: {', '.join(CATEGORIE_CANALI)}")
+        return categoria
+    canali = args.get("canali", "").strip()
+    numero = None
+    if canali:
+        numero = int(canali) if canali.isdigit() else estrai_numero_canali(canali)
+        if not numero:
+            raise ValueError("canali non validi, usa ad esempio 4 o 4CH")
+    if per_strip:
+        kelvin = leggi_numero(args, "kelvin")
+        return categoria_canali_strip(kelvin, numero)
+    return categoria_canali_dimmer(numero)
+
+@bp.route("/compatibili")
+@in_cache(cache_risposte, versione_catalogo_corrente, parametri_filtra)
+@ammissione.limita()
+def compatibili():
+    """Prodotti compatibili con specifiche date a mano, anche di prodotti non a catalogo.
+
+    ?tipo=dimmer&voltaggio=36&canali=4CH: dimmer per una strip (categoria
+    dai canali, da ?kelvin= o da ?categoria_canali=1-2CH|3-5CH);
+    ?tipo=profili&larghezza=12.5: profili per una strip larga 12,5 mm;
+    ?tipo=strip con ?larghezza_profilo= e/o ?voltaggio_min=&voltaggio_max=
+    (più ?canali= del dimmer): strip per un profilo o un dimmer. Senza
+    categoria canali vale qualsiasi categoria. Stesse regole del grafo di
+    compatibilità; elenco con campi, limite, cursore e stream come /cerca.
+    """
+    tipo = request.args.get("tipo", "").strip().lower()
+    try:
+        pagina = leggi_pagina(request.args)
+        if tipo == "dimmer":
+            specifiche = {
+                "voltaggio": leggi_numero(request.args, "voltaggio"),
+                "categoria_canali": leggi_categoria_canali(request.args, per_strip=True)
+            }
+            if specifiche["voltaggio"] is None:
+                raise ValueError("Indica il voltaggio della strip")
+        elif tipo in ("profili", "profilo"):
+            tipo = "profili"
+            specifiche = {"larghezza": leggi_numero(request.args, "larghezza")}
+            if specifiche["larghezza"] is None:
+                raise ValueError("Indica la larghezza della strip")
+        elif tipo in ("strip", "stripled"):
+            tipo = "strip"
+            specifiche = {
+                "larghezza_profilo": leggi_numero(request.args, "larghezza_profilo"),
+                "voltaggio_min": leggi_numero(request.args, "voltaggio_min"),
+                "voltaggio_max": leggi_numero(request.args, "voltaggio_max"),
+                "categoria_canali": leggi_categoria_canali(request.args, per_strip=False)
+            }
+            if all(valore is None for valore in specifiche.values()):
+                raise ValueError("Indica larghezza_profilo oppure il range di voltaggio o i canali del dimmer")
+        else:
+            return jsonify({"error": "Tipo non valido, usa uno tra: dimmer, profili, strip"}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    catalogo = catalogo_corrente()
+    if pagina["etag"] is not None and pagina["etag"] != catalogo.etag:
+        return jsonify({"error": "Il catalogo è stato aggiornato: ricomincia dalla prima pagina"}), 409
+
+    with fase("lookup"):
+        if tipo == "dimmer":
+            trovati = catalogo.specifiche.dimmer_per_voltaggio(**specifiche)
+        elif tipo == "profili":
+            trovati = catalogo.specifiche.profili_per_larghezza(specifiche["larghezza"])
+        else:
+            trovati = catalogo.specifiche.strip_compatibili(**specifiche)
+
+    risultato = {
+        "tipo": tipo,
+        "specifiche": specifiche,
+        "compatibili": ElencoProdotti(trovati),
+        "debug": {"num_compatibili": len(trovati)}
+    }
+    return risposta_con_elenchi(risultato, 200, pagina, catalogo.etag)
+
+@bp.route("/suggerisci")
+@in_cache(cache_risposte, versione_catalogo_corrente, parametri_suggerisci)
+@ammissione.limita()
+def suggerisci():
+    """Suggerimenti mentre si digita: codici esatti, per prefisso e simili (errori di battitura)"""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Nessun testo fornito"}), 400
+
+    try:
+        limite = int(request.args.get("limite", "10"))
+    except ValueError:
+        return jsonify({"error": "Limite deve essere un numero intero"}), 400
+    limite = max(1, min(limite, MAX_SUGGERIMENTI))
+
+    suggerimenti = catalogo_corrente().indice_ricerca.suggerisci(query, limite)
+    return jsonify({"query": query, "suggerimenti": suggerimenti})
+
+def risultato_alimentatore(catalogo, alimentatore):
+    """Strip alimentabili da un alimentatore, precalcolate nel grafo: (dizionario, stato HTTP)"""
+    corrente_alimentatore = alimentatore.corrente_nominale
+    if corrente_alimentatore is None or corrente_alimentatore <= 0:
+        return {"error": "Corrente alimentatore non valida"}, 404
+
+    # Solo strip alla tensione dell'alimentatore, già ordinate per metri supportati
+    with fase("alimentatori"):
+        strip_compatibili = catalogo.grafo.strip_alimentabili(alimentatore.codice) or ElencoProdotti(())
+    tensione_fissa = alimentatore.tensione_min is not None and alimentatore.tensione_min == alimentatore.tensione_max
+
+    return {
         "tipo": "alimentatore",
-        "alimentatore": alimentatore,
+        "alimentatore": alimentatore.dati,
         "strip_compatibili": strip_compatibili,
         "debug": {
             "corrente_alimentatore": corrente_alimentatore,
+            "tensione_alimentatore": alimentatore.tensione_min if tensione_fissa else None,
+            "margine_sicurezza": 1.2,
             "num_strip_compatibili": len(strip_compatibili)
         }
+    }, 200
+
+@bp.route("/strip_alimentabili")
+@in_cache(cache_risposte, versione_catalogo_corrente, parametri_cerca)
+@ammissione.limita()
+def strip_alimentabili():
+    """Strip alimentabili da un alimentatore, con i metri massimi per ciascuna (parametri come /cerca)"""
+    codice = request.args.get("codice", "").strip().upper()
+    if not codice:
+        return jsonify({"error": "Nessun codice fornito"}), 400
+    try:
+        pagina = leggi_pagina(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    catalogo = catalogo_corrente()
+    categoria, alimentatore = catalogo.indice_codici.get(codice, (None, None))
+    if categoria != "alimentatori":
+        return jsonify({"error": "Alimentatore non trovato"}), 404
+    if pagina["etag"] is not None and pagina["etag"] != catalogo.etag:
+        return jsonify({"error": "Il catalogo è stato aggiornato: ricomincia dalla prima pagina"}), 409
+
+    risultato, stato = risultato_alimentatore(catalogo, alimentatore)
+    return risposta_con_elenchi(risultato, stato, pagina, catalogo.etag)
+
+def leggi_codici_richiesta():
+    """Lista dei codici nel corpo: JSON ({"codici": [...]} o lista) oppure NDJSON.
+
+    None se il corpo non contiene una lista; ValueError se una riga NDJSON non
+    è JSON o se un codice non è una stringa o un numero.
+    """
+    if request.mimetype == "application/x-ndjson":
+        codici = []
+        for riga in request.get_data(as_text=True).splitlines():
+            if not riga.strip():
+                continue
+            valore = json.loads(riga)
+            codici.append(valore.get("codice") if isinstance(valore, dict) else valore)
+    else:
+        corpo = request.get_json(silent=True)
+        if isinstance(corpo, dict):
+            corpo = corpo.get("codici")
+        if not isinstance(corpo, list):
+            return None
+        codici = corpo
+
+    # bool è una sottoclasse di int, ma true/false non sono codici
+    if any(isinstance(c, bool) or not isinstance(c, (str, int, float)) for c in codici):
+        raise ValueError("Ogni codice deve essere una stringa o un numero")
+    return codici
+
+@bp.route("/cerca_multipla", methods=["POST"])
+@ammissione.limita(CONCORRENZA_ROUTE_PESANTI)
+def cerca_multipla():
+    """Risolve in una sola richiesta tutti i codici di una distinta materiali.
+
+    Ogni codice distinto viene cercato una volta sola; le liste di profili e
+    dimmer compatibili sono quelle del grafo, condivise tra le strip con la
+    stessa larghezza, voltaggio e categoria canali, e le loro righe JSON sono
+    costruite una volta per richiesta. Con ?stream=1 i risultati vengono
+    inviati come NDJSON man mano che sono pronti.
+    """
+    try:
+        codici = leggi_codici_richiesta()
+    except json.JSONDecodeError:
+        codici = None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if codici is None:
+        return jsonify({"error": "Fornisci una lista di codici (JSON o NDJSON)"}), 400
+
+    # Codici normalizzati, senza duplicati, nell'ordine in cui compaiono
+    codici_unici = list(dict.fromkeys(c for c in map(normalizza_codice, codici) if c))
+    if not codici_unici:
+        return jsonify({"error": "Nessun codice fornito"}), 400
+    if len(codici_unici) > MAX_CODICI_MULTIPLI:
+        return jsonify({"error": f"Massimo {MAX_CODICI_MULTIPLI} codici per richiesta"}), 400
+
+    catalogo = catalogo_corrente()
+    materializzate = {}
+
+    if request.args.get("stream") in ("1", "true"):
+        json_app = current_app.json
+
+        def genera():
+            for codice in codici_unici:
+                risultato, stato = ricerca_prodotto(catalogo, codice)
+                completa_elenchi(risultato, materializzate)
+                yield json_app.dumps({"codice": codice, "stato": stato, "risultato": risultato}) + "\n"
+        return Response(genera(), mimetype="application/x-ndjson")
+
+    risultati = []
+    for codice in codici_unici:
+        risultato, stato = ricerca_prodotto(catalogo, codice)
+        completa_elenchi(risultato, materializzate)
+        risultati.append({"codice": codice, "stato": stato, "risultato": risultato})
+
+    return jsonify({
+        "risultati": risultati,
+        "debug": {
+            "num_codici": len(codici),
+            "num_codici_unici": len(codici_unici),
+            "num_trovati": sum(1 for r in risultati if r["stato"] == 200)
+        }
     })
 
-    return jsonify({"error": "Nessun prodotto trovato"}), 404
+@bp.route("/catalogo")
+@ammissione.limita()
+def esporta_catalogo():
+    """Catalogo compatto con gli attributi estratti, per la copia locale del frontend.
+
+    La versione è l'etag del catalogo e fa da ETag della risposta: con
+    If-None-Match uguale si risponde 304 senza corpo. Il corpo è compresso
+    una volta per versione (brotli o gzip secondo Accept-Encoding).
+    """
+    esportazione = catalogo_corrente().esportazione
+    if request.if_none_match.contains_weak(esportazione.versione):
+        risposta = Response(status=304)
+    else:
+        codifica = next((c for c in CODIFICHE if request.accept_encodings[c] > 0), None)
+        with fase("esportazione"):
+            corpo = esportazione.corpo(codifica)
+        risposta = Response(corpo, mimetype="application/json")
+        if codifica is not None:
+            risposta.headers["Content-Encoding"] = codifica
+    # Debole: lo stesso ETag vale per tutte le codifiche
+    risposta.set_etag(esportazione.versione, weak=True)
+    risposta.headers["Vary"] = "Accept-Encoding"
+    risposta.headers["Cache-Control"] = "no-cache"
+    return risposta
+
+@bp.route("/catalogo/delta")
+@in_cache(cache_risposte, versione_catalogo_corrente, parametri_delta)
+@ammissione.limita()
+def delta_catalogo():
+    """Righe cambiate dalla versione ?da= (o ?since=) a quella attuale, per aggiornare la copia locale.
+
+    Se la versione è quella attuale "fogli" è vuoto; se non è più ricordata
+    risponde 409 e il client riscarica /catalogo.
+    """
+    da = parametri_delta(request.args).strip()
+    if not da:
+        return jsonify({"error": "Indica la versione di partenza con ?da="}), 400
+    with fase("delta"):
+        risultato, stato = catalogo_corrente().esportazione.delta(da)
+    return jsonify(risultato), stato
 
 # Test endpoint per verificare la connessione
-@app.route("/test")
+@bp.route("/test")
 def test():
+    aggiornatore = aggiornatore_corrente()
+    catalogo = catalogo_corrente()
     return jsonify({
         "status": "OK",
         "message": "Server Flask funzionante",
-        "dati_caricati": {
-            "strip": len(strip_data),
-            "profili": len(profili_data),
-            "dimmer": len(dimmer_data),
-            "alimentatori": len(alimentatori_data)
+        "dati_caricati": catalogo.riepilogo(),
+        "catalogo": {
+            "versione": catalogo.versione,
+            "etag": catalogo.etag,
+            "origine": catalogo.origine,
+            "caricato_il": catalogo.caricato_il,
+            "durata_costruzione_s": round(catalogo.durata_costruzione, 4),
+            "valori_non_interpretati": len(catalogo.anomalie),
+            # Codici aggiunti, rimossi, modificati e spostati per foglio rispetto alla versione precedente
+            "modifiche": None if catalogo.modifiche is None else {
+                foglio: {tipo: len(codici) for tipo, codici in voce.items()}
+                for foglio, voce in catalogo.modifiche.items()
+            },
+            "fasi_costruzione_s": {f: round(d, 4) for f, d in catalogo.durate_costruzione.items()}
+        },
+        "aggiornamento": {
+            "ultimo_controllo": aggiornatore.ultimo_controllo,
+            "ultimo_errore": aggiornatore.ultimo_errore,
+            "durata_ultima_ricarica_s": aggiornatore.durata_ultima_ricarica,
+            "ricariche": aggiornatore.ricariche,
+            "ultimo_download_sheets": ultimo_download_sheets or None
         }
     })
 
+def valori_istantanei(aggiornatore):
+    """Metriche lette al momento dell'esportazione da cache, aggiornatore e catalogo"""
+    catalogo = aggiornatore.catalogo
+    valori = [
+        ("avtecno_cache_hit_total", "counter", "Risposte servite dalla cache", {}, cache_risposte.hit),
+        ("avtecno_cache_miss_total", "counter", "Risposte calcolate perché assenti dalla cache", {}, cache_risposte.miss),
+        ("avtecno_cache_voci", "gauge", "Voci presenti nella cache delle risposte", {}, len(cache_risposte)),
+        ("avtecno_cache_condivise_total", "counter", "Risposte prese dal calcolo di una richiesta identica in corso", {}, cache_risposte.condivise),
+        ("avtecno_catalogo_versione", "gauge", "Versione dello snapshot del catalogo in uso", {}, catalogo.versione),
+        ("avtecno_catalogo_caricato_timestamp_seconds", "gauge", "Istante di costruzione dello snapshot in uso", {}, catalogo.caricato_il),
+        ("avtecno_profiler_attivo", "gauge", "1 se il profiler a campionamento è attivo", {}, int(profiler.attivo))
+    ]
+    for route, limite in ammissione.limiti.items():
+        valori.append(("avtecno_ammissione_in_esecuzione", "gauge", "Richieste in esecuzione per route", {"endpoint": route}, limite.in_esecuzione))
+        valori.append(("avtecno_ammissione_in_coda", "gauge", "Richieste in attesa di un posto per route", {"endpoint": route}, limite.in_coda))
+        valori.append(("avtecno_ammissione_rifiutate_total", "counter", "Richieste rifiutate con 503 per sovraccarico", {"endpoint": route}, limite.rifiutate))
+    for esito, n in aggiornatore.ricariche.items():
+        valori.append(("avtecno_ricariche_total", "counter", "Ricariche del catalogo per esito", {"esito": esito}, n))
+    if aggiornatore.durata_ultima_ricarica is not None:
+        valori.append(("avtecno_ultima_ricarica_seconds", "gauge", "Durata dell'ultima ricarica", {}, aggiornatore.durata_ultima_ricarica))
+    for nome_fase, durata in catalogo.durate_costruzione.items():
+        valori.append(("avtecno_catalogo_costruzione_seconds", "gauge", "Durata delle fasi di costruzione dello snapshot in uso", {"fase": nome_fase}, durata))
+    for categoria, n in catalogo.riepilogo().items():
+        valori.append(("avtecno_catalogo_prodotti", "gauge", "Prodotti nello snapshot in uso per categoria", {"categoria": categoria}, n))
+    valori.append(("avtecno_catalogo_valori_non_interpretati", "gauge", "Campi compilati ma non interpretati nello snapshot in uso", {}, len(catalogo.anomalie)))
+    for funzione, (ritrovati, interpretati, _) in statistiche_memoria().items():
+        valori.append(("avtecno_estrattori_memoria_hit_total", "counter", "Valori già interpretati ritrovati in memoria", {"funzione": funzione}, ritrovati))
+        valori.append(("avtecno_estrattori_memoria_miss_total", "counter", "Valori interpretati per la prima volta", {"funzione": funzione}, interpretati))
+    return valori
+
+@bp.route("/anomalie")
+def anomalie():
+    """Campi dei fogli compilati ma non interpretati (es. CRI 'M1615'), filtrabili con ?foglio= e ?campo="""
+    foglio = request.args.get("foglio", "").strip().lower()
+    campo = request.args.get("campo", "").strip().lower()
+    elenco = [
+        a for a in catalogo_corrente().anomalie
+        if (not foglio or a["foglio"].lower() == foglio) and (not campo or a["campo"].lower() == campo)
+    ]
+    conteggi = {}
+    for a in elenco:
+        chiave = f"{a['foglio']}.{a['campo']}"
+        conteggi[chiave] = conteggi.get(chiave, 0) + 1
+    return jsonify({
+        "versione_catalogo": catalogo_corrente().versione,
+        "totale": len(elenco),
+        "per_campo": conteggi,
+        "anomalie": elenco
+    })
+
+@bp.route("/metrics")
+def metrics():
+    """Metriche in formato testo Prometheus.
+
+    Sono quelle del processo che risponde: con più worker gunicorn ogni
+    scrape vede un worker diverso.
+    """
+    testo = metriche.esporta(valori_istantanei(aggiornatore_corrente()))
+    return Response(testo, mimetype="text/plain; version=0.0.4")
+
+def autorizzato():
+    return bool(ADMIN_TOKEN) and request.headers.get("X-Admin-Token") == ADMIN_TOKEN
+
+@bp.route("/admin/profiler", methods=["GET", "POST"])
+def admin_profiler():
+    """Profiler a campionamento del processo che risponde.
+
+    POST ?attiva=1 lo avvia, ?attiva=0 lo ferma, ?azzera=1 cancella i
+    campioni raccolti; GET restituisce gli stack campionati nel formato
+    "collapsed" dei flame graph.
+    """
+    if not autorizzato():
+        return jsonify({"error": "Non autorizzato"}), 403
+
+    if request.method == "GET":
+        return Response(profiler.esporta(), mimetype="text/plain")
+
+    if request.args.get("azzera") in ("1", "true"):
+        profiler.azzera()
+    attiva = request.args.get("attiva")
+    if attiva in ("1", "true"):
+        profiler.attiva()
+    elif attiva in ("0", "false"):
+        profiler.disattiva()
+    return jsonify({
+        "attivo": profiler.attivo,
+        "intervallo_s": profiler.intervallo,
+        "stack_campionati": len(profiler.campioni)
+    })
+
+@bp.route("/admin/ricarica", methods=["POST"])
+def admin_ricarica():
+    """Riscarica il catalogo da Google Sheets.
+
+    Senza parametri la ricarica parte in background e la risposta è 202. Con
+    ?attendi=1 la route aspetta (al più TIMEOUT_ATTESA_RICARICA secondi) la
+    ricarica, eseguita in un thread: richieste contemporanee condividono lo
+    stesso download.
+    """
+    if not autorizzato():
+        return jsonify({"error": "Non autorizzato"}), 403
+
+    aggiornatore = aggiornatore_corrente()
+    if request.args.get("attendi") not in ("1", "true"):
+        aggiornatore.richiedi_ricarica()
+        return jsonify({
+            "status": "Ricarica avviata",
+            "versione_corrente": aggiornatore.catalogo.versione,
+            "ultimo_errore": aggiornatore.ultimo_errore
+        }), 202
+
+    try:
+        esito = aggiornatore.ricarica_in_thread(forza=True).result(TIMEOUT_ATTESA_RICARICA)
+    except TimeoutAttesa:
+        return jsonify({
+            "status": "Ricarica ancora in corso",
+            "versione_corrente": aggiornatore.catalogo.versione
+        }), 202
+
+    return jsonify({
+        "status": "Ricarica completata" if esito else "Ricarica fallita",
+        "versione_corrente": aggiornatore.catalogo.versione,
+        "etag": aggiornatore.catalogo.etag,
+        "ultimo_errore": aggiornatore.ultimo_errore
+    }), 200 if esito else 502
+
 if __name__ == "__main__":
+    # Server di sviluppo; in produzione: gunicorn -c gunicorn.conf.py wsgi:app
     print("🚀 Avvio server Flask...")
-    print(f"📊 Dati caricati: {len(strip_data)} strip, {len(profili_data)} profili, {len(dimmer_data)} dimmer, {len(alimentatori_data)} alimentatori")
+    app = crea_app()
+    print(f"📊 Dati caricati: {app.extensions['aggiornatore_catalogo'].catalogo.riepilogo()}")
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,98 @@
+"""Archivio locale dell'ultimo catalogo valido, per avvii rapidi e funzionamento offline"""
+import hashlib
+import json
+import os
+import pickle
+import time
+
+FORMATO_SNAPSHOT = 1
+
+
+# Byte dell'impronta di ogni riga
+DIMENSIONE_IMPRONTA = 8
+
+
+# Serializzazione canonica delle righe, creata una volta sola invece che a ogni json.dumps
+_codifica_riga = json.JSONEncoder(sort_keys=True, ensure_ascii=False, default=str).encode
+
+
+def impronta_riga(riga):
+    """Impronta di una riga di un foglio, indipendente dall'ordine delle chiavi"""
+    return hashlib.blake2b(_codifica_riga(riga).encode("utf-8"), digest_size=DIMENSIONE_IMPRONTA).digest()
+
+
+class ImpronteCatalogo:
+    """Impronte di ogni riga e di ogni foglio, per confrontare due versioni del catalogo.
+
+    'righe[foglio]' concatena le impronte delle righe nell'ordine del foglio
+    (DIMENSIONE_IMPRONTA byte ciascuna), 'fogli[foglio]' è l'hash del
+    contenuto dell'intero foglio e 'etag' quello di tutto il catalogo. Sono
+    deterministiche, quindi uguali tra processi diversi.
+    """
+
+    def __init__(self, righe):
+        self.righe = {
+            foglio: b"".join(impronta_riga(riga) for riga in righe_foglio)
+            for foglio, righe_foglio in righe.items()
+        }
+        self.fogli = {
+            foglio: hashlib.blake2b(impronte, digest_size=16).hexdigest()
+            for foglio, impronte in self.righe.items()
+        }
+        testo = json.dumps(self.fogli, sort_keys=True)
+        self.etag = hashlib.sha256(testo.encode("utf-8")).hexdigest()[:16]
+
+    def per_riga(self, foglio):
+        """Impronte delle righe di un foglio, una per riga"""
+        impronte = self.righe.get(foglio, b"")
+        return [impronte[i:i + DIMENSIONE_IMPRONTA] for i in range(0, len(impronte), DIMENSIONE_IMPRONTA)]
+
+
+def impronta_righe(righe):
+    """ETag del catalogo: hash del contenuto dei fogli, indipendente dall'ordine delle chiavi"""
+    return ImpronteCatalogo(righe).etag
+
+
+def salva_snapshot(righe, percorso, etag=None):
+    """Scrive le righe del catalogo in formato binario, sostituendo il file in modo atomico"""
+    contenuto = {
+        "formato": FORMATO_SNAPSHOT,
+        "etag": etag or impronta_righe(righe),
+        "salvato_il": time.time(),
+        "righe": righe
+    }
+    temporaneo = f"{percorso}.tmp"
+    with open(temporaneo, "wb") as f:
+        pickle.dump(contenuto, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporaneo, percorso)
+    return contenuto["etag"]
+
+
+def leggi_snapshot(percorso, percorso_json=None):
+    """Legge l'ultimo snapshot salvato, oppure in alternativa un export JSON dei fogli.
+
+    Restituisce (righe, etag, origine), con righe None se non c'è nulla di
+    utilizzabile.
+    """
+    try:
+        with open(percorso, "rb") as f:
+            contenuto = pickle.load(f)
+        if contenuto.get("formato") == FORMATO_SNAPSHOT:
+            return contenuto["righe"], contenuto["etag"], "snapshot"
+        print(f"Snapshot {percorso} in un formato non supportato, ignorato")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Errore nel leggere lo snapshot {percorso}: {str(e)}")
+
+    if percorso_json:
+        try:
+            with open(percorso_json, encoding="utf-8") as f:
+                righe = json.load(f)
+            return righe, impronta_righe(righe), "json"
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Errore nel leggere {percorso_json}: {str(e)}")
+
+    return None, None, None
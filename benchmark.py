@@ -0,0 +1,272 @@
+"""Benchmark offline del finder: caricamento, memoria e latenza delle route tramite il test client Flask.
+
+Uso:
+    python benchmark.py                          # dati_prodotti.json
+    python benchmark.py --sintetico 100000       # catalogo_sintetico.py con 100k prodotti
+    python benchmark.py -o risultati.json --confronta precedenti.json
+
+Non contatta Google Sheets: il catalogo viene costruito in memoria e
+l'aggiornatore non ha niente da scaricare. Il risultato è un JSON con chiavi
+stabili, confrontabile tra commit diversi.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows: niente RSS massimo
+    resource = None
+
+from catalogo import AggiornatoreCatalogo, Catalogo
+from catalogo_sintetico import genera_catalogo
+
+FORMATO_RISULTATI = 1
+
+# Percentuale di codici inesistenti nelle richieste a /cerca (percorso dei suggerimenti)
+QUOTA_CODICI_SCONOSCIUTI = 0.1
+# Codici per richiesta di /cerca_multipla
+CODICI_PER_DISTINTA = 50
+
+
+def _codici(catalogo, categoria):
+    return [c for c, (cat, _) in catalogo.indice_codici.items() if cat == categoria]
+
+
+def richieste_di_prova(catalogo, rng):
+    """Per ogni endpoint, una funzione che genera (metodo, url, corpo JSON) casuali"""
+    tutti = list(catalogo.indice_codici)
+    strip = _codici(catalogo, "stripled") or tutti
+    alimentatori = _codici(catalogo, "alimentatori") or tutti
+
+    def cerca():
+        if rng.random() < QUOTA_CODICI_SCONOSCIUTI:
+            codice = rng.choice(tutti)[:-2] + "ZZ"
+        else:
+            codice = rng.choice(tutti)
+        return "GET", f"/cerca?codice={codice}", None
+
+    def filtra():
+        parametri = rng.choice((
+            "categoria=stripled&ip=IP65", "categoria=stripled&voltaggio=24&kelvin_max=3000",
+            "categoria=stripled&potenza_min=10&potenza_max=20&cri=90", "categoria=dimmer&voltaggio=24",
+            "categoria=profili&larghezza_min=10"
+        ))
+        return "GET", f"/filtra?{parametri}&offset={rng.randrange(0, 100)}", None
+
+    return {
+        "cerca": cerca,
+        "calcola_alimentatori": lambda: (
+            "GET", f"/calcola_alimentatori?codice={rng.choice(strip)}&metri={rng.randint(1, 20)}", None
+        ),
+        "pianifica_alimentatori": lambda: (
+            "GET", f"/pianifica_alimentatori?codice={rng.choice(strip)}&metri={rng.randint(5, 100)}", None
+        ),
+        "strip_alimentabili": lambda: ("GET", f"/strip_alimentabili?codice={rng.choice(alimentatori)}", None),
+        "suggerisci": lambda: ("GET", f"/suggerisci?q={rng.choice(tutti)[:rng.randint(3, 7)]}", None),
+        "filtra": filtra,
+        "cerca_multipla": lambda: (
+            "POST", "/cerca_multipla", {"codici": rng.sample(tutti, min(CODICI_PER_DISTINTA, len(tutti)))}
+        ),
+        "tabella_alimentatori": lambda: ("GET", "/tabella_alimentatori?metri=1,2,5,10", None)
+    }
+
+
+def percentile(valori_ordinati, p):
+    indice = min(len(valori_ordinati) - 1, max(0, round(p / 100 * len(valori_ordinati)) - 1))
+    return valori_ordinati[indice]
+
+
+def misura_endpoint(client, genera, richieste, thread, durata_massima=None):
+    """Latenze (ms), throughput e stati HTTP di 'richieste' chiamate, su 'thread' thread.
+
+    Con 'durata_massima' (secondi) ci si ferma prima se l'endpoint è lento:
+    'richieste' nel risultato è il numero effettivamente eseguito.
+    """
+    def esegui(chiamata):
+        metodo, url, corpo = chiamata
+        inizio = time.perf_counter()
+        risposta = client.open(url, method=metodo, json=corpo)
+        risposta.get_data()
+        return (time.perf_counter() - inizio) * 1000, risposta.status_code
+
+    esiti = []
+    inizio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=thread) as esecutore:
+        # A blocchi di 'thread' richieste, per controllare il tempo trascorso tra un blocco e l'altro
+        while len(esiti) < richieste:
+            blocco = [genera() for _ in range(min(thread, richieste - len(esiti)))]
+            esiti.extend(esecutore.map(esegui, blocco) if thread > 1 else map(esegui, blocco))
+            if durata_massima is not None and time.perf_counter() - inizio > durata_massima:
+                break
+    durata = time.perf_counter() - inizio
+    richieste = len(esiti)
+
+    latenze = sorted(ms for ms, _ in esiti)
+    stati = {}
+    for _, stato in esiti:
+        stati[str(stato)] = stati.get(str(stato), 0) + 1
+    return {
+        "richieste": richieste,
+        "p50_ms": round(percentile(latenze, 50), 3),
+        "p90_ms": round(percentile(latenze, 90), 3),
+        "p99_ms": round(percentile(latenze, 99), 3),
+        "max_ms": round(latenze[-1], 3),
+        "media_ms": round(statistics.fmean(latenze), 3),
+        "richieste_al_secondo": round(richieste / durata, 1),
+        "stati": stati
+    }
+
+
+def misura_caricamento(righe, memoria):
+    """Tempo di costruzione del catalogo e, con memoria=True, memoria occupata (tracemalloc)"""
+    inizio = time.perf_counter()
+    catalogo = Catalogo(righe, origine="benchmark")
+    risultato = {
+        "secondi": round(time.perf_counter() - inizio, 4),
+        "fasi_s": {fase: round(d, 4) for fase, d in catalogo.durate_costruzione.items()}
+    }
+    if memoria:
+        # Seconda costruzione sotto tracemalloc, che rallenta e falserebbe i tempi
+        tracemalloc.start()
+        prima = tracemalloc.get_traced_memory()[0]
+        copie = [Catalogo(righe, origine="benchmark")]
+        occupata, picco = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        copie.clear()
+        risultato["memoria_catalogo_mb"] = round((occupata - prima) / 2 ** 20, 2)
+        risultato["memoria_picco_mb"] = round((picco - prima) / 2 ** 20, 2)
+    return catalogo, risultato
+
+
+def rss_massimo_mb():
+    if resource is None:
+        return None
+    massimo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo riporta in KB, macOS in byte
+    return round(massimo / (2 ** 20 if sys.platform == "darwin" else 1024), 1)
+
+
+def commit_corrente():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def confronta(risultati, precedenti):
+    """Rapporto nuovo / precedente per caricamento e per le metriche principali di ogni endpoint"""
+    def rapporto(nuovo, vecchio):
+        return round(nuovo / vecchio, 3) if nuovo is not None and vecchio else None
+
+    confronto = {
+        "commit_precedente": precedenti.get("commit"),
+        "caricamento_secondi": rapporto(risultati["caricamento"]["secondi"], precedenti["caricamento"]["secondi"]),
+        "endpoint": {}
+    }
+    for nome, attuale in risultati["endpoint"].items():
+        vecchio = precedenti.get("endpoint", {}).get(nome)
+        if vecchio is None:
+            continue
+        confronto["endpoint"][nome] = {
+            chiave: rapporto(attuale[chiave], vecchio.get(chiave))
+            for chiave in ("p50_ms", "p99_ms", "richieste_al_secondo")
+        }
+    return confronto
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline delle route del finder")
+    parser.add_argument("--dati", default="dati_prodotti.json", help="export JSON dei fogli")
+    parser.add_argument("--sintetico", type=int, help="usa un catalogo sintetico con questo numero di prodotti")
+    parser.add_argument("--seme", type=int, default=0)
+    parser.add_argument("--richieste", type=int, default=500, help="richieste per endpoint")
+    parser.add_argument("--thread", type=int, default=1, help="richieste in parallelo")
+    parser.add_argument("--durata-massima", type=float, default=30,
+                        help="secondi massimi per endpoint, poi si passa al successivo")
+    parser.add_argument("--endpoint", action="append", help="misura solo questi endpoint (ripetibile)")
+    parser.add_argument("--cache", action="store_true", help="lascia attiva la cache delle risposte")
+    parser.add_argument("--senza-memoria", action="store_true", help="salta la misura della memoria")
+    parser.add_argument("-o", "--uscita", help="file JSON dei risultati (predefinito: stdout)")
+    parser.add_argument("--confronta", help="risultati precedenti da confrontare")
+    argomenti = parser.parse_args()
+
+    if argomenti.sintetico:
+        righe = genera_catalogo(argomenti.sintetico, argomenti.seme)
+        origine = "sintetico"
+    else:
+        with open(argomenti.dati, encoding="utf-8") as f:
+            righe = json.load(f)
+        origine = argomenti.dati
+    catalogo, caricamento = misura_caricamento(righe, not argomenti.senza_memoria)
+
+    # Importato qui: app legge la configurazione dall'ambiente all'import
+    import app as applicazione
+    if not argomenti.cache:
+        # Capacità 0: ogni risposta viene scartata subito, si misura sempre il calcolo
+        applicazione.cache_risposte.capacita = 0
+    aggiornatore = AggiornatoreCatalogo(lambda forza: (None, None), catalogo)
+    client = applicazione.crea_app(avvia_aggiornamento=False, aggiornatore=aggiornatore).test_client()
+
+    rng = random.Random(argomenti.seme)
+    generatori = richieste_di_prova(catalogo, rng)
+    endpoint = {}
+    for nome, genera in generatori.items():
+        if argomenti.endpoint and nome not in argomenti.endpoint:
+            continue
+        # Poche richieste a vuoto per scaldare memoizzazioni e allocatore
+        misura_endpoint(client, genera, min(20, argomenti.richieste), 1, argomenti.durata_massima / 10)
+        endpoint[nome] = misura_endpoint(
+            client, genera, argomenti.richieste, argomenti.thread, argomenti.durata_massima
+        )
+        print(f"{nome}: p50 {endpoint[nome]['p50_ms']} ms, p99 {endpoint[nome]['p99_ms']} ms, "
+              f"{endpoint[nome]['richieste_al_secondo']} req/s", file=sys.stderr)
+
+    risultati = {
+        "formato": FORMATO_RISULTATI,
+        "quando": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit_corrente(),
+        "python": platform.python_version(),
+        "piattaforma": platform.platform(),
+        "dati": {
+            "origine": origine,
+            "seme": argomenti.seme if argomenti.sintetico else None,
+            "prodotti": sum(len(v) for v in righe.values()),
+            "per_foglio": {nome: len(v) for nome, v in righe.items()}
+        },
+        "parametri": {
+            "richieste": argomenti.richieste,
+            "thread": argomenti.thread,
+            "durata_massima_s": argomenti.durata_massima,
+            "cache": argomenti.cache
+        },
+        "caricamento": caricamento,
+        "endpoint": endpoint,
+        "rss_max_mb": rss_massimo_mb()
+    }
+    if argomenti.confronta:
+        with open(argomenti.confronta, encoding="utf-8") as f:
+            risultati["confronto"] = confronta(risultati, json.load(f))
+
+    testo = json.dumps(risultati, indent=2, ensure_ascii=False)
+    if argomenti.uscita:
+        with open(argomenti.uscita, "w", encoding="utf-8") as f:
+            f.write(testo + "\n")
+    else:
+        print(testo)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Cache LRU delle risposte JSON già serializzate, con ETag, risposte 304 e calcoli condivisi"""
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, current_app, request
+
+
+class _Calcolo:
+    """Risposta in calcolo per una chiave, attesa dalle richieste identiche arrivate nel frattempo"""
+    __slots__ = ('fatto', 'risultato')
+
+    def __init__(self):
+        self.fatto = threading.Event()
+        # (corpo, stato, etag) se la risposta è riusabile, altrimenti None
+        self.risultato = None
+
+
+class CacheRisposte:
+    """Cache LRU con scadenza: chiave -> (corpo, stato, etag, scadenza).
+
+    Le chiavi includono la versione del catalogo, quindi una ricarica rende
+    subito irraggiungibili le voci vecchie; svuota() le libera del tutto.
+    Tiene anche i calcoli in corso per chiave: le richieste identiche che
+    arrivano prima che la risposta sia in cache aspettano quel calcolo (fino
+    a 'attesa' secondi) invece di ripeterlo.
+    """
+
+    def __init__(self, capacita=1024, ttl=300, attesa=30):
+        self.capacita = capacita
+        self.ttl = ttl
+        self.attesa = attesa
+        self._voci = OrderedDict()
+        self._in_corso = {}
+        self._lock = threading.Lock()
+        self.hit = 0
+        self.miss = 0
+        self.condivise = 0
+
+    def leggi(self, chiave):
+        """Restituisce (corpo, stato, etag) oppure None se assente o scaduta"""
+        with self._lock:
+            voce = self._voci.get(chiave)
+            if voce is None or voce[3] < time.monotonic():
+                if voce is not None:
+                    del self._voci[chiave]
+                self.miss += 1
+                return None
+            self._voci.move_to_end(chiave)
+            self.hit += 1
+            return voce[:3]
+
+    def scrivi(self, chiave, corpo, stato, etag):
+        with self._lock:
+            self._voci[chiave] = (corpo, stato, etag, time.monotonic() + self.ttl)
+            self._voci.move_to_end(chiave)
+            while len(self._voci) > self.capacita:
+                self._voci.popitem(last=False)
+
+    def prenota(self, chiave):
+        """(calcolo, True) se tocca a chi chiama calcolare la risposta, (calcolo già in corso, False) altrimenti"""
+        with self._lock:
+            calcolo = self._in_corso.get(chiave)
+            if calcolo is not None:
+                return calcolo, False
+            calcolo = self._in_corso[chiave] = _Calcolo()
+            return calcolo, True
+
+    def completa(self, chiave, calcolo, risultato):
+        """Chiude il calcolo prenotato e sveglia chi lo aspetta; 'risultato' None se non riusabile"""
+        with self._lock:
+            if self._in_corso.get(chiave) is calcolo:
+                del self._in_corso[chiave]
+        calcolo.risultato = risultato
+        calcolo.fatto.set()
+
+    def attendi(self, calcolo):
+        """(corpo, stato, etag) del calcolo di un'altra richiesta, o None se non arriva o non è riusabile"""
+        if not calcolo.fatto.wait(self.attesa) or calcolo.risultato is None:
+            return None
+        with self._lock:
+            self.condivise += 1
+        return calcolo.risultato
+
+    def svuota(self):
+        with self._lock:
+            self._voci.clear()
+
+    def __len__(self):
+        return len(self._voci)
+
+
+def _risposta(corpo, stato, etag, esito):
+    """Costruisce la risposta dalla cache, oppure un 304 se il client ha già il corpo"""
+    if stato == 200 and request.if_none_match.contains(etag):
+        risposta = Response(status=304)
+    else:
+        risposta = Response(corpo, status=stato, mimetype="application/json")
+    risposta.set_etag(etag)
+    risposta.headers["Cache-Control"] = "no-cache"
+    risposta.headers["X-Cache"] = esito
+    return risposta
+
+
+def in_cache(cache, versione_catalogo, parametri):
+    """Decoratore per le route GET la cui risposta dipende solo da parametri e catalogo.
+
+    'versione_catalogo()' restituisce la versione dello snapshot usato dalla
+    richiesta, 'parametri(args)' i parametri normalizzati che entrano nella
+    chiave. Le risposte con errore 5xx non vengono salvate. Le richieste
+    identiche contemporanee condividono un solo calcolo (X-Cache: COALESCED);
+    se quel calcolo non produce una risposta riusabile (5xx, stream) ognuna
+    calcola la propria.
+    """
+    def calcola(vista, args, kwargs, chiave):
+        """(risposta, (corpo, stato, etag) salvati in cache o None)"""
+        risposta = current_app.make_response(vista(*args, **kwargs))
+        if risposta.status_code >= 500 or risposta.is_streamed:
+            return risposta, None
+
+        corpo = risposta.get_data()
+        etag = hashlib.blake2b(corpo, digest_size=8).hexdigest()
+        cache.scrivi(chiave, corpo, risposta.status_code, etag)
+        return _risposta(corpo, risposta.status_code, etag, "MISS"), (corpo, risposta.status_code, etag)
+
+    def decoratore(vista):
+        @functools.wraps(vista)
+        def wrapper(*args, **kwargs):
+            chiave = (request.endpoint, parametri(request.args), versione_catalogo())
+            salvata = cache.leggi(chiave)
+            if salvata is not None:
+                return _risposta(*salvata, "HIT")
+
+            calcolo, primo = cache.prenota(chiave)
+            if not primo:
+                condivisa = cache.attendi(calcolo)
+                if condivisa is not None:
+                    return _risposta(*condivisa, "COALESCED")
+                return calcola(vista, args, kwargs, chiave)[0]
+
+            risultato = None
+            try:
+                risposta, risultato = calcola(vista, args, kwargs, chiave)
+                return risposta
+            finally:
+                cache.completa(chiave, calcolo, risultato)
+        return wrapper
+    return decoratore
@@ -0,0 +1,345 @@
+"""Snapshot immutabile del catalogo e aggiornamento periodico in background"""
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+try:
+    import fcntl
+except ImportError:  # Windows: un solo processo, che scarica sempre lui
+    fcntl = None
+
+from archivio import ImpronteCatalogo, leggi_snapshot
+from compatibilita import GrafoCompatibilita
+from configuratore import ConfiguratoreKit
+from differenze import codici_modificati, confronta_fogli, riepilogo_modifiche
+from dimensionamento import MotoreDimensionamento
+from esportazione import EsportazioneCatalogo
+from filtri import costruisci_filtri
+from modelli import costruisci_indice_codici, costruisci_modelli
+from pianificazione import PianificatoreAlimentazione
+from ricerca import IndiceRicerca
+from specifiche import IndiceSpecifiche
+
+# Transizioni tra versioni ricordate da ogni snapshot per /catalogo/delta
+MAX_VERSIONI_STORICO = 50
+
+
+class Catalogo:
+    """Snapshot del catalogo con modelli, dizionari di supporto, indici e grafo.
+
+    Viene costruito per intero prima di essere pubblicato e non viene più
+    modificato: le richieste leggono sempre uno snapshot coerente. Con
+    'precedente' la ricarica è incrementale: i fogli con lo stesso hash
+    riusano i modelli e ogni struttura che dipende solo da fogli invariati
+    viene presa così com'è dallo snapshot precedente (che non viene
+    modificato), le righe invariate dei fogli cambiati non vengono
+    interpretate di nuovo e l'indice di ricerca aggiorna solo i codici
+    cambiati. 'modifiche' riporta codici aggiunti, rimossi e modificati per
+    foglio (None al primo caricamento) e 'storico' le ultime transizioni
+    (etag precedente, modifiche) fino a questa versione.
+    """
+
+    def __init__(self, righe, versione=0, etag=None, origine="sheets", precedente=None, impronte=None):
+        # Secondi spesi in ogni fase della costruzione, per /test e /metrics
+        self.durate_costruzione = {}
+        istante = time.perf_counter()
+        # Campi compilati ma non interpretati, per /anomalie
+        self.anomalie = []
+        self.impronte = impronte or ImpronteCatalogo(righe)
+        self.modelli = modelli = costruisci_modelli(righe, self.anomalie, self.impronte, precedente)
+        self.versione = versione
+        self.etag = etag or self.impronte.etag
+        self.origine = origine
+        self.caricato_il = time.time()
+        self.modifiche = confronta_fogli(precedente, modelli, self.impronte) if precedente is not None else None
+
+        self.strip_data = modelli["stripled"]
+        self.profili_data = modelli["profili"]
+        self.dimmer_data = modelli["Dimmer"]
+        self.alimentatori_data = modelli["alimentatori"]
+
+        def invariati(*fogli):
+            # True se i fogli sono gli stessi oggetti dello snapshot precedente
+            return precedente is not None and all(modelli[f] is precedente.modelli[f] for f in fogli)
+
+        # Dizionari di supporto
+        if invariati("stripled"):
+            self.strip_larghezze = precedente.strip_larghezze
+        else:
+            self.strip_larghezze = {s.codice: s.larghezza for s in self.strip_data if s.codice}
+        if invariati("profili"):
+            self.profilo_larghezze = precedente.profilo_larghezze
+        else:
+            self.profilo_larghezze = {p.codice: p.larghezza for p in self.profili_data if p.codice}
+        if invariati("Dimmer"):
+            self.dimmer_voltaggi = precedente.dimmer_voltaggi
+        else:
+            self.dimmer_voltaggi = {
+                d.codice: (d.voltaggio_min, d.voltaggio_max)
+                for d in self.dimmer_data if d.codice
+            }
+
+        self.indice_codici = costruisci_indice_codici(modelli)
+        istante = self._segna("modelli", istante)
+        if invariati("stripled", "alimentatori"):
+            self.dimensionamento = precedente.dimensionamento
+        else:
+            self.dimensionamento = MotoreDimensionamento(self.strip_data, self.alimentatori_data)
+        istante = self._segna("dimensionamento", istante)
+        self.specifiche = IndiceSpecifiche(
+            self.strip_data, self.profili_data, self.dimmer_data, self.strip_larghezze, self.profilo_larghezze,
+            precedente.specifiche if precedente is not None else None
+        )
+        self.grafo = GrafoCompatibilita(
+            self.strip_data, self.profili_data, self.dimmer_data, self.alimentatori_data,
+            self.strip_larghezze, self.profilo_larghezze, self.dimmer_voltaggi,
+            self.dimensionamento, self.specifiche, precedente.grafo if precedente is not None else None
+        )
+        istante = self._segna("grafo", istante)
+        self.filtri = costruisci_filtri(self, precedente)
+        istante = self._segna("filtri", istante)
+        if invariati("alimentatori"):
+            # Le tabelle già calcolate per i metri richiesti restano valide
+            self.pianificatore = precedente.pianificatore
+        else:
+            self.pianificatore = PianificatoreAlimentazione(self.alimentatori_data)
+        # Il grafo è sempre un oggetto nuovo: il configuratore, che memorizza solo su richiesta, si ricrea
+        self.configuratore = ConfiguratoreKit(
+            self.grafo, self.pianificatore, self.strip_larghezze, self.profilo_larghezze
+        )
+        self.indice_ricerca = IndiceRicerca(
+            self.indice_codici, precedente.indice_ricerca if precedente is not None else None,
+            codici_modificati(self.modifiche) if self.modifiche is not None else None
+        )
+        self._segna("ricerca", istante)
+
+        self.storico = () if precedente is None else (
+            precedente.storico + ((precedente.etag, self.modifiche),)
+        )[-MAX_VERSIONI_STORICO:]
+        # Esportazione per il frontend, costruita alla prima richiesta
+        self.esportazione = EsportazioneCatalogo(modelli, self.etag, self.storico)
+        self.durata_costruzione = sum(self.durate_costruzione.values())
+
+    def _segna(self, fase, inizio):
+        """Registra la durata della fase iniziata a 'inizio' e restituisce l'istante attuale"""
+        adesso = time.perf_counter()
+        self.durate_costruzione[fase] = adesso - inizio
+        return adesso
+
+    def riepilogo(self):
+        """Numero di prodotti caricati per categoria"""
+        return {
+            "strip": len(self.strip_data),
+            "profili": len(self.profili_data),
+            "dimmer": len(self.dimmer_data),
+            "alimentatori": len(self.alimentatori_data)
+        }
+
+
+class CaricatoreCondiviso:
+    """Caricatore per AggiornatoreCatalogo condiviso tra più processi worker.
+
+    Solo il processo che ottiene il lock accanto allo snapshot scarica da
+    Google Sheets ogni 'intervallo' secondi (0 = solo su richiesta
+    esplicita); tutti rileggono lo snapshot su disco quando cambia. Se il processo
+    col lock termina, il lock passa al primo che lo richiede. Restituisce
+    (righe, origine), con righe None se non c'è niente di nuovo.
+    """
+
+    def __init__(self, scarica, percorso_snapshot, intervallo=0, scarica_subito=False):
+        self._scarica = scarica
+        self.percorso_snapshot = percorso_snapshot
+        self.intervallo = intervallo
+        self._prossimo_download = 0 if scarica_subito else self._dopo_intervallo()
+        self._ultima_modifica = self._modifica_snapshot()
+        self._file_lock = None
+
+    def _dopo_intervallo(self):
+        """Istante del prossimo download automatico, None se solo su richiesta"""
+        return time.monotonic() + self.intervallo if self.intervallo > 0 else None
+
+    def _modifica_snapshot(self):
+        try:
+            return os.stat(self.percorso_snapshot).st_mtime_ns
+        except OSError:
+            return None
+
+    def principale(self):
+        """True se questo processo è quello che scarica da Google Sheets"""
+        if fcntl is None or self._file_lock is not None:
+            return True
+        file_lock = open(self.percorso_snapshot + ".lock", "a")
+        try:
+            fcntl.flock(file_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file_lock.close()
+            return False
+        # Il file resta aperto finché il processo vive: il lock è suo
+        self._file_lock = file_lock
+        return True
+
+    def __call__(self, forza=False):
+        prossimo = self._prossimo_download
+        if self.principale() and prossimo is not None and time.monotonic() >= prossimo:
+            self._prossimo_download = self._dopo_intervallo()
+            return self._scarica(), "sheets"
+        if forza:
+            # Richiesta esplicita (es. /admin/ricarica), anche se arriva a un altro worker
+            return self._scarica(), "sheets"
+
+        # Snapshot scritto da un altro worker (o da questo: stesso etag, nessuna ricostruzione)
+        modifica = self._modifica_snapshot()
+        if modifica is None or modifica == self._ultima_modifica:
+            return None, None
+        self._ultima_modifica = modifica
+        righe, _, _ = leggi_snapshot(self.percorso_snapshot)
+        return righe, "snapshot"
+
+
+class AggiornatoreCatalogo:
+    """Ricarica il catalogo in un thread separato e pubblica il nuovo snapshot.
+
+    'caricatore(forza)' restituisce (righe, origine) con le righe grezze dei
+    quattro fogli, oppure (None, None) se non c'è niente di nuovo, e deve
+    sollevare un'eccezione in caso di errore: in quel caso resta in uso lo
+    snapshot precedente. La sostituzione è un singolo assegnamento di
+    riferimento. 'dopo_aggiornamento(righe, catalogo)' viene chiamata dopo ogni
+    pubblicazione, ad esempio per salvare lo snapshot su disco.
+
+    Le ricariche richieste mentre ce n'è già una in corso non scaricano di
+    nuovo: aspettano quella in corso e ne ricevono l'esito, sia chi la
+    esegue nel proprio thread (ricarica) sia chi ne riceve il Future
+    (ricarica_in_thread).
+    """
+
+    def __init__(self, caricatore, catalogo, intervallo=0, dopo_aggiornamento=None):
+        self._caricatore = caricatore
+        self._catalogo = catalogo
+        self.intervallo = intervallo
+        self._dopo_aggiornamento = dopo_aggiornamento
+        self.ultimo_controllo = None
+        self._lock_ricarica = threading.Lock()
+        self._lock_in_corso = threading.Lock()
+        self._in_corso = None
+        self._richiesta = threading.Event()
+        self._thread = None
+        self.ultimo_errore = None
+        # Esiti delle ricariche di questo processo e durata dell'ultima, per /metrics
+        self.ricariche = {"pubblicate": 0, "invariate": 0, "fallite": 0}
+        self.durata_ultima_ricarica = None
+
+    @property
+    def catalogo(self):
+        """Snapshot corrente; le richieste lo leggono una volta sola all'inizio"""
+        return self._catalogo
+
+    def _unisciti_o_avvia(self):
+        """(future della ricarica in corso, True se tocca al chiamante eseguirla)"""
+        with self._lock_in_corso:
+            if self._in_corso is not None:
+                return self._in_corso, False
+            self._in_corso = Future()
+            return self._in_corso, True
+
+    def _esegui(self, futuro, forza):
+        try:
+            esito = self._ricarica(forza)
+        except BaseException as e:
+            with self._lock_in_corso:
+                self._in_corso = None
+            if not futuro.cancelled():
+                futuro.set_exception(e)
+            raise
+        # Chi chiede una ricarica da qui in poi ne avvia una nuova
+        with self._lock_in_corso:
+            self._in_corso = None
+        if not futuro.cancelled():
+            futuro.set_result(esito)
+        return esito
+
+    def ricarica(self, forza=False):
+        """Esegue una ricarica, o aspetta quella già in corso, e ne restituisce l'esito"""
+        futuro, proprietario = self._unisciti_o_avvia()
+        if proprietario:
+            return self._esegui(futuro, forza)
+        return futuro.result()
+
+    def ricarica_in_thread(self, forza=False):
+        """Come ricarica(), ma il download gira in un thread: restituisce subito il Future dell'esito.
+
+        Chi smette di aspettare il Future (es. per un timeout) non interrompe
+        la ricarica condivisa.
+        """
+        futuro, proprietario = self._unisciti_o_avvia()
+        if proprietario:
+            threading.Thread(target=self._esegui, args=(futuro, forza), daemon=True).start()
+        return futuro
+
+    def _ricarica(self, forza):
+        """Chiede le righe al caricatore e, se sono cambiate, pubblica un nuovo snapshot"""
+        with self._lock_ricarica:
+            inizio = time.perf_counter()
+            esito = self._ricarica_bloccata(forza)
+            self.durata_ultima_ricarica = time.perf_counter() - inizio
+            self.ricariche[esito] += 1
+            return esito != "fallite"
+
+    def _ricarica_bloccata(self, forza):
+        """Corpo di _ricarica, chiamato col lock: restituisce la chiave di self.ricariche"""
+        try:
+            righe, origine = self._caricatore(forza)
+            if righe is None:
+                self.ultimo_controllo = time.time()
+                return "invariate"
+            impronte = ImpronteCatalogo(righe)
+            # Contenuto identico: si ricostruisce solo per confermare con Google Sheets dati locali
+            if impronte.etag == self._catalogo.etag and (self._catalogo.origine == "sheets" or origine != "sheets"):
+                self.ultimo_controllo = time.time()
+                self.ultimo_errore = None
+                return "invariate"
+            nuovo = Catalogo(
+                righe, versione=self._catalogo.versione + 1, origine=origine,
+                precedente=self._catalogo, impronte=impronte
+            )
+        except Exception as e:
+            self.ultimo_errore = str(e)
+            print(f"Errore nell'aggiornamento del catalogo: {str(e)}")
+            return "fallite"
+
+        self._catalogo = nuovo
+        self.ultimo_controllo = time.time()
+        self.ultimo_errore = None
+        print(f"Catalogo aggiornato alla versione {nuovo.versione} ({nuovo.etag}, {nuovo.origine}): {nuovo.riepilogo()}")
+        print(f"Modifiche: {riepilogo_modifiche(nuovo.modifiche)} (costruito in {nuovo.durata_costruzione:.2f}s)")
+
+        if self._dopo_aggiornamento is not None:
+            try:
+                self._dopo_aggiornamento(righe, nuovo)
+            except Exception as e:
+                print(f"Errore dopo l'aggiornamento del catalogo: {str(e)}")
+        return "pubblicate"
+
+    def richiedi_ricarica(self):
+        """Chiede al thread in background di riscaricare da Google Sheets senza attenderlo"""
+        self.avvia()
+        self._richiesta.set()
+
+    def avvia(self):
+        """Avvia il thread di aggiornamento, se non è già attivo in questo processo.
+
+        Dopo un fork il thread del processo padre non esiste nel figlio, quindi
+        ogni worker avvia il proprio alla prima chiamata.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._ciclo, name="aggiornatore-catalogo", daemon=True)
+        self._thread.start()
+
+    def _ciclo(self):
+        self.ricarica()
+        while True:
+            # Senza intervallo il thread si sveglia solo su richiesta esplicita
+            forzata = self._richiesta.wait(self.intervallo or None)
+            self._richiesta.clear()
+            self.ricarica(forza=forzata)
@@ -0,0 +1,150 @@
+"""Catalogo sintetico con i formati reali dei fogli, per benchmark su 10k-1M prodotti.
+
+Uso: python catalogo_sintetico.py 100000 -o catalogo_100k.json [--seme 1]
+"""
+import argparse
+import json
+import random
+
+# Quota di ciascun foglio sul totale dei prodotti, come in dati_prodotti.json
+PROPORZIONI = {"stripled": 0.50, "profili": 0.28, "Dimmer": 0.09, "alimentatori": 0.13}
+
+POTENZE_STRIP = (4.8, 6, 7.2, 9.6, 10, 12, 14.4, 15, 18, 19.2, 24, 26, 28.8)
+VOLTAGGI_STRIP = (("24VDC", 80), ("12VDC", 6), ("48VDC", 6), ("220V", 3), ("12-24VDC", 2), ("24V DC", 2), ("5VDC", 1))
+LARGHEZZE_STRIP = (4, 5, 8, 8.5, 10, 10.5, 12, 15, 20)
+# (Colore Luce, Canali): le strip colorate riportano anche i canali, es. 'RGBW - 4CH'
+COLORI_STRIP = (
+    (("4000K", ""), 25), (("3000K", ""), 25), (("6000K", ""), 12), (("2700K", ""), 8), (("6500K", ""), 4),
+    (("CCT 2700K~6000K", "CCT - 2CH"), 4), (("RGB", "RGB - 3CH"), 6), (("RGBW", "RGBW - 4CH"), 4),
+    (("RGB+3000K", "RGBW - 4CH"), 3), (("RGB+CCT", "RGB+CCT - 5CH"), 2)
+)
+CRI_STRIP = (("≥80", 35), ("≥90", 30), ("≥85", 13), ("≥95", 7), ("-", 10), ("", 1))
+IP_STRIP = (("IP20", 74), ("IP65", 19), ("IP67", 4), ("IP68", 3))
+
+VOLTAGGI_DIMMER = (
+    ("DC 12~24V", 35), ("DC 5~24V", 13), ("DC 24V", 10), ("DC 12~48V", 8), ("AC 100~240V", 8),
+    ("DC 12_24V", 5), ("DC 5-24V", 5), ("12-24VDC", 5), ("DC 5-12-24V", 3), ("", 3)
+)
+CANALI_DIMMER = (
+    ("1CH Mono", 15), ("1CH/2CH", 15), ("2CH CCT", 10), ("RGBW - 4CH", 10), ("4CH RGBW", 10),
+    ("5CH RGB+CCT", 15), (" 3CH /4CH/5CH", 10), ("Monocolore", 5), ("", 10)
+)
+
+TENSIONI_ALIMENTATORI = ((24, 55), (12, 16), (48, 7), (None, 18), ("22-54", 4))
+POTENZE_ALIMENTATORI = (8, 12, 18, 25, 36, 40, 60, 75, 100, 150, 185, 240, 320, 480)
+IP_ALIMENTATORI = (("IP20", 20), ("IP67", 27), ("IP66", 5), (None, 48))
+
+
+def _scegli(rng, pesati):
+    valori, pesi = zip(*pesati)
+    return rng.choices(valori, pesi)[0]
+
+
+def _decimale(valore, rng):
+    """Numero come lo scrive il foglio: virgola o punto a caso, senza '.0'"""
+    testo = f"{valore:g}"
+    return testo.replace(".", ",") if rng.random() < 0.7 else testo
+
+
+def _strip(i, rng):
+    colore, canali = _scegli(rng, COLORI_STRIP)
+    potenza = rng.choice(POTENZE_STRIP)
+    larghezza = rng.choice(LARGHEZZE_STRIP)
+    lumen = int(potenza * rng.uniform(90, 160))
+    riga = {
+        "Codice": f"AV{i:07d}LU-{rng.choice('EFS')}",
+        "Dimensioni": f"5000x{_decimale(larghezza, rng)}x{_decimale(rng.choice((1.5, 1.6, 2)), rng)}mm",
+        "Unita di taglio": f"{rng.choice((6, 9, 12, 14))}LED/{rng.choice((25, 50, 100))}mm",
+        "Input Volt": _scegli(rng, VOLTAGGI_STRIP),
+        "Potenza": f"{_decimale(potenza, rng)}W/m",
+        "CRI": _scegli(rng, CRI_STRIP),
+        "Colore Luce": colore,
+        "Lumen nominali": f"{lumen}LM/m",
+        "Lumen effettivi": f"{int(lumen * rng.uniform(0.9, 1))}LM/m",
+        "IP": _scegli(rng, IP_STRIP)
+    }
+    if canali:
+        riga["Canali"] = canali
+    return riga
+
+
+def _profilo(i, rng):
+    larghezza = rng.choice(LARGHEZZE_STRIP + (16, 25))
+    return {
+        "Codice": f"AV{i:07d}XIAA",
+        "Dimensioni": f"{rng.choice((2000, 3000))}x{_decimale(larghezza + 4, rng)}x{_decimale(rng.choice((7.4, 8, 12, 20)), rng)}mm",
+        "Dissipazione Max": f"{rng.choice((9, 15, 20, 30))}W/m",
+        "Larghezza Max Strip": f"{_decimale(larghezza, rng)}mm",
+        "Materiale/Finitura": rng.choice(("All. anodizzato", "All. anodizzato ", "All. verniciato nero", "All. bianco")),
+        "Cover": rng.choice(("opaca", "trasparente", "satinata")),
+        "Tappi": rng.choice(("kit 2pz grigi", "Kit 2 grigi", "Kit 2pz silver")),
+        "Ganci": rng.choice(("kit 2pz inox", "Kit 2pz inox", ""))
+    }
+
+
+def _dimmer(i, rng):
+    return {
+        "Codice": f"AV{i:07d}XIAD",
+        "Misure": f"{_decimale(rng.choice((74.5, 90, 120)), rng)}x36x17mm",
+        "Voltaggio Input": _scegli(rng, VOLTAGGI_DIMMER),
+        "Corrente output": f"{rng.choice((4, 6, 8, 12, 15))}A{rng.choice(('', ' '))}",
+        "Canali Dimmer": _scegli(rng, CANALI_DIMMER),
+        "Telecomandi Compatibili": rng.choice(("FUT006/FUT007/FUT087", "FUT089/FUT088/FUT092/B8/B4", "")),
+        "Pulsante/Collegamento": "",
+        "Uscita Max.": ""
+    }
+
+
+def _alimentatore(i, rng):
+    tensione = _scegli(rng, TENSIONI_ALIMENTATORI)
+    potenza = rng.choice(POTENZE_ALIMENTATORI)
+    if isinstance(tensione, int):
+        corrente = round(potenza / tensione, 2)
+        nome = f"Constant Voltage {potenza}W {tensione}Vdc {corrente:g}A"
+        tipo = "tensione costante"
+    else:
+        corrente = rng.choice((0.25, 0.35, 0.5, 0.7, 1.05, 1.4))
+        nome = f"Constant Current {potenza}W {int(corrente * 1000)}mA"
+        tipo = "costante"
+    riga = {
+        "codice": f"PS-{potenza}-{tensione or 'CC'}-{i:07d}",
+        "potenza_W": potenza,
+        "tensione_V": tensione,
+        "corrente_A": corrente,
+        "ip": _scegli(rng, IP_ALIMENTATORI)
+    }
+    # Metà delle righe col formato 'nome'/'tipo_corrente', metà con 'modello'
+    if rng.random() < 0.5:
+        riga.update({"nome": nome, "tipo_corrente": tipo})
+    else:
+        riga["modello"] = nome
+    return riga
+
+
+GENERATORI = {"stripled": _strip, "profili": _profilo, "Dimmer": _dimmer, "alimentatori": _alimentatore}
+
+
+def genera_catalogo(prodotti, seme=0):
+    """Righe dei quattro fogli con 'prodotti' prodotti in totale, riproducibili dato il seme"""
+    rng = random.Random(seme)
+    righe = {}
+    inizio = 0
+    for nome, quota in PROPORZIONI.items():
+        quanti = max(1, round(prodotti * quota))
+        genera = GENERATORI[nome]
+        righe[nome] = [genera(inizio + i, rng) for i in range(quanti)]
+        inizio += quanti
+    return righe
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("prodotti", type=int, help="numero totale di prodotti")
+    parser.add_argument("-o", "--uscita", default="catalogo_sintetico.json")
+    parser.add_argument("--seme", type=int, default=0)
+    argomenti = parser.parse_args()
+
+    catalogo = genera_catalogo(argomenti.prodotti, argomenti.seme)
+    with open(argomenti.uscita, "w", encoding="utf-8") as f:
+        json.dump(catalogo, f, ensure_ascii=False)
+    print(f"{argomenti.uscita}: " + ", ".join(f"{len(v)} {k}" for k, v in catalogo.items()))
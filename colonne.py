@@ -0,0 +1,139 @@
+"""Archivio a colonne delle righe dei fogli: testi condivisi e valori estratti in array tipizzati"""
+import sys
+from array import array
+from operator import itemgetter
+
+# Interi mancanti negli array tipizzati (i numeri decimali mancanti sono NaN)
+INTERO_MANCANTE = -2 ** 63
+
+
+class _Assente:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "ASSENTE"
+
+
+# Segnaposto per le colonne che non compaiono in una riga del foglio
+ASSENTE = _Assente()
+
+
+class TabellaColonnare:
+    """Righe di un foglio memorizzate per colonna, identificate dalla posizione.
+
+    Ogni colonna del foglio è una lista con un valore per riga e i testi sono
+    internati, quindi i valori ripetuti ("24VDC", "IP20") sono un solo
+    oggetto. I valori estratti dai modelli stanno in array tipizzati (8 byte
+    per numero invece di un oggetto float) o in liste di testi internati.
+    riga(i) ricostruisce il dizionario originale solo quando serve una
+    risposta.
+    """
+
+    def __init__(self, righe):
+        self.numero_righe = len(righe)
+        self.colonne = {}
+        for i, record in enumerate(righe):
+            for chiave, valore in record.items():
+                colonna = self.colonne.get(chiave)
+                if colonna is None:
+                    colonna = self.colonne[sys.intern(chiave)] = [ASSENTE] * self.numero_righe
+                colonna[i] = sys.intern(valore) if isinstance(valore, str) else valore
+        # Colonne che mancano in almeno una riga: solo queste vanno ripulite in righe()
+        self._incomplete = [nome for nome, valori in self.colonne.items() if ASSENTE in valori]
+        self.numeri = {}
+        self.interi = {}
+        self.testi = {}
+
+    def __len__(self):
+        return self.numero_righe
+
+    def riga(self, i):
+        """Dizionario della riga i come nel foglio (nuovo a ogni chiamata)"""
+        return {nome: valori[i] for nome, valori in self.colonne.items() if valori[i] is not ASSENTE}
+
+    def righe(self, indici, campi=None):
+        """Dizionari di più righe, leggendo ogni colonna una volta sola per tutte.
+
+        Con 'campi' si leggono solo quelle colonne (nell'ordine dato), le
+        altre non vengono nemmeno toccate.
+        """
+        if not indici:
+            return []
+        nomi = list(self.colonne) if campi is None else [c for c in campi if c in self.colonne]
+        if not nomi:
+            return [{} for _ in indici]
+        if len(indici) == 1:
+            per_colonna = [(self.colonne[nome][indici[0]],) for nome in nomi]
+        else:
+            prendi = itemgetter(*indici)
+            per_colonna = [prendi(self.colonne[nome]) for nome in nomi]
+        risultato = [dict(zip(nomi, valori)) for valori in zip(*per_colonna)]
+        for nome in self._incomplete:
+            if nome not in nomi:
+                continue
+            for riga in risultato:
+                if riga[nome] is ASSENTE:
+                    del riga[nome]
+        return risultato
+
+    def valore(self, i, colonna, predefinito=None):
+        """Valore grezzo di una cella, senza ricostruire la riga"""
+        valori = self.colonne.get(colonna)
+        if valori is None or valori[i] is ASSENTE:
+            return predefinito
+        return valori[i]
+
+    def aggiungi_numeri(self, nome, valori):
+        self.numeri[nome] = array('d', (float('nan') if v is None else v for v in valori))
+
+    def aggiungi_interi(self, nome, valori):
+        self.interi[nome] = array('q', (INTERO_MANCANTE if v is None else v for v in valori))
+
+    def aggiungi_testi(self, nome, valori):
+        self.testi[nome] = [sys.intern(v) if isinstance(v, str) else v for v in valori]
+
+
+class ColonnaNumerica:
+    """Attributo di un modello letto dall'array di numeri della sua tabella (None se mancante)"""
+    def __set_name__(self, modello, nome):
+        self.nome = nome
+
+    def aggiungi(self, tabella, valori):
+        tabella.aggiungi_numeri(self.nome, valori)
+
+    def grezzi(self, tabella):
+        """Valori memorizzati nella tabella (NaN per i mancanti), accettati da aggiungi()"""
+        return tabella.numeri[self.nome]
+
+    def __get__(self, prodotto, modello=None):
+        if prodotto is None:
+            return self
+        valore = prodotto.tabella.numeri[self.nome][prodotto.riga]
+        return None if valore != valore else valore
+
+
+class ColonnaIntera(ColonnaNumerica):
+    def aggiungi(self, tabella, valori):
+        tabella.aggiungi_interi(self.nome, valori)
+
+    def grezzi(self, tabella):
+        return tabella.interi[self.nome]
+
+    def __get__(self, prodotto, modello=None):
+        if prodotto is None:
+            return self
+        valore = prodotto.tabella.interi[self.nome][prodotto.riga]
+        return None if valore == INTERO_MANCANTE else valore
+
+
+class ColonnaTesto(ColonnaNumerica):
+    def aggiungi(self, tabella, valori):
+        tabella.aggiungi_testi(self.nome, valori)
+
+    def grezzi(self, tabella):
+        return tabella.testi[self.nome]
+
+    def __get__(self, prodotto, modello=None):
+        if prodotto is None:
+            return self
+        return prodotto.tabella.testi[self.nome][prodotto.riga]
@@ -0,0 +1,202 @@
+"""Grafo di compatibilità tra strip, profili, dimmer e alimentatori, calcolato al caricamento"""
+import numpy as np
+
+from modelli import materializza
+
+
+class GrafoCompatibilita:
+    """Archi di compatibilità precalcolati, indicizzati per codice normalizzato.
+
+    Lavora sui modelli di modelli.py e conserva riferimenti ai prodotti, non
+    copie delle righe: le righe JSON si costruiscono solo nella risposta
+    (modelli.ElencoProdotti, ElencoStripAlimentabili). Le liste sono
+    condivise tra i prodotti con gli stessi attributi (stessa larghezza,
+    stesso voltaggio e categoria canali, stessa corrente e tensione) e non
+    vanno modificate dai chiamanti. Le liste per larghezza e voltaggio si
+    ottengono dagli indici di specifiche.IndiceSpecifiche, senza scorrere
+    tutti i prodotti per ogni combinazione di attributi.
+
+    Con 'precedente' (il grafo dello snapshot precedente) gli archi tra fogli
+    invariati vengono riusati per intero, e le liste per attributo restano
+    valide se il foglio di destinazione non è cambiato: dopo una modifica
+    alle strip, ad esempio, i profili per ogni larghezza già vista non
+    vengono ricalcolati.
+    """
+
+    def __init__(self, strip_data, profili_data, dimmer_data, alimentatori_data,
+                 strip_larghezze, profilo_larghezze, dimmer_voltaggi, dimensionamento, specifiche,
+                 precedente=None):
+        self.profili_per_strip = {}
+        self.dimmer_per_strip = {}
+        self.strip_per_profilo = {}
+        self.strip_per_dimmer = {}
+        self.strip_per_alimentatore = {}
+        self._fonti = {
+            "strip": strip_data, "profili": profili_data, "dimmer": dimmer_data,
+            "alimentatori": alimentatori_data, "dimensionamento": dimensionamento
+        }
+        # Liste condivise per attributo, riusabili dal grafo successivo
+        self._per_chiave = {}
+
+        self._collega_strip(strip_data, strip_larghezze, specifiche, precedente)
+        self._collega_profili(profili_data, profilo_larghezze, specifiche, precedente)
+        self._collega_dimmer(dimmer_data, dimmer_voltaggi, specifiche, precedente)
+        self._collega_alimentatori(alimentatori_data, dimensionamento, precedente)
+
+    def _invariati(self, precedente, *fonti):
+        return precedente is not None and all(precedente._fonti[f] is self._fonti[f] for f in fonti)
+
+    def _liste(self, nome, precedente, *fonti):
+        """Liste per attributo di nome 'nome': quelle del grafo precedente se le fonti non sono cambiate"""
+        liste = dict(precedente._per_chiave[nome]) if self._invariati(precedente, *fonti) else {}
+        self._per_chiave[nome] = liste
+        return liste
+
+    def _collega_strip(self, strip_data, strip_larghezze, specifiche, precedente):
+        """Strip -> profili (per larghezza) e strip -> dimmer (per voltaggio e canali)"""
+        profili_per_larghezza = self._liste("profili_per_larghezza", precedente, "profili")
+        dimmer_per_chiave = self._liste("dimmer_per_chiave", precedente, "dimmer")
+
+        if self._invariati(precedente, "strip", "profili"):
+            self.profili_per_strip = precedente.profili_per_strip
+        else:
+            # strip_larghezze ha i codici nell'ordine del foglio: non serve leggere le strip
+            for codice, larghezza_strip in strip_larghezze.items():
+                if larghezza_strip is None:
+                    continue
+                if larghezza_strip not in profili_per_larghezza:
+                    profili_per_larghezza[larghezza_strip] = specifiche.profili_per_larghezza(larghezza_strip)
+                self.profili_per_strip[codice] = profili_per_larghezza[larghezza_strip]
+
+        if self._invariati(precedente, "strip", "dimmer"):
+            self.dimmer_per_strip = precedente.dimmer_per_strip
+            return
+        for s in strip_data:
+            if not s.codice or s.codice in self.dimmer_per_strip:
+                continue
+            chiave = (s.voltaggio, s.categoria_canali)
+            if chiave not in dimmer_per_chiave:
+                dimmer_per_chiave[chiave] = (
+                    specifiche.dimmer_per_voltaggio(s.voltaggio, s.categoria_canali)
+                    if s.voltaggio is not None and s.categoria_canali is not None else []
+                )
+            self.dimmer_per_strip[s.codice] = dimmer_per_chiave[chiave]
+
+    def _collega_profili(self, profili_data, profilo_larghezze, specifiche, precedente):
+        """Profilo -> strip che entrano nella larghezza massima del profilo"""
+        strip_per_larghezza = self._liste("strip_per_larghezza", precedente, "strip")
+        if self._invariati(precedente, "strip", "profili"):
+            self.strip_per_profilo = precedente.strip_per_profilo
+            return
+
+        for p in profili_data:
+            if p.codice in self.strip_per_profilo:
+                continue
+            larghezza_profilo = profilo_larghezze.get(p.codice)
+            if larghezza_profilo is None:
+                continue
+            if larghezza_profilo not in strip_per_larghezza:
+                strip_per_larghezza[larghezza_profilo] = specifiche.strip_compatibili(larghezza_profilo=larghezza_profilo)
+            self.strip_per_profilo[p.codice] = strip_per_larghezza[larghezza_profilo]
+
+    def _collega_dimmer(self, dimmer_data, dimmer_voltaggi, specifiche, precedente):
+        """Dimmer -> strip compatibili per range di voltaggio e categoria canali"""
+        strip_per_chiave = self._liste("strip_per_dimmer", precedente, "strip")
+        if self._invariati(precedente, "strip", "dimmer"):
+            self.strip_per_dimmer = precedente.strip_per_dimmer
+            return
+        visti = set()
+
+        for d in dimmer_data:
+            if d.codice in visti:
+                continue
+            visti.add(d.codice)
+            min_v, max_v = dimmer_voltaggi.get(d.codice, (None, None))
+            if min_v is None or max_v is None:
+                continue
+
+            chiave = (min_v, max_v, d.categoria_canali)
+            if chiave not in strip_per_chiave:
+                strip_per_chiave[chiave] = (
+                    specifiche.strip_compatibili(voltaggio_min=min_v, voltaggio_max=max_v, categoria_canali=d.categoria_canali)
+                    if d.categoria_canali is not None else []
+                )
+            self.strip_per_dimmer[d.codice] = strip_per_chiave[chiave]
+
+    def _collega_alimentatori(self, alimentatori_data, dimensionamento, precedente):
+        """Alimentatore -> (indici delle strip alla stessa tensione, metri massimi supportati)"""
+        self._dimensionamento = dimensionamento
+        # Gli indici e i metri dipendono solo dalle strip: restano validi se cambiano gli alimentatori
+        strip_per_chiave = self._liste("strip_per_alimentatore", precedente, "strip")
+        if self._invariati(precedente, "alimentatori", "dimensionamento"):
+            self.strip_per_alimentatore = precedente.strip_per_alimentatore
+            return
+
+        for a in alimentatori_data:
+            if a.codice in self.strip_per_alimentatore:
+                continue
+            corrente_alimentatore = a.corrente_nominale
+            if corrente_alimentatore is None or corrente_alimentatore <= 0:
+                continue
+            # Solo uscite a tensione fissa: driver a corrente costante e range non alimentano strip
+            if a.tensione_min is None or a.tensione_min != a.tensione_max:
+                self.strip_per_alimentatore[a.codice] = (np.empty(0, dtype=np.int64), np.empty(0))
+                continue
+
+            chiave = (corrente_alimentatore, a.tensione_min)
+            if chiave not in strip_per_chiave:
+                strip_per_chiave[chiave] = dimensionamento.strip_alimentabili(corrente_alimentatore, a.tensione_min)
+            self.strip_per_alimentatore[a.codice] = strip_per_chiave[chiave]
+
+    def strip_alimentabili(self, codice_alimentatore):
+        """Elenco delle strip alimentabili, o None se l'alimentatore non ha una corrente utilizzabile"""
+        voce = self.strip_per_alimentatore.get(codice_alimentatore)
+        if voce is None:
+            return None
+        return ElencoStripAlimentabili(self._dimensionamento, *voce)
+
+
+class ElencoStripAlimentabili:
+    """Strip alimentabili da un alimentatore, con metri massimi e dati di calcolo.
+
+    Tiene gli indici e i metri salvati nel grafo; le righe JSON si costruiscono
+    a pezzi, leggendo i valori di calcolo dagli array del dimensionamento.
+    Stessa interfaccia di modelli.ElencoProdotti.
+    """
+    __slots__ = ('motore', 'indici', 'metri_max')
+
+    def __init__(self, motore, indici, metri_max):
+        self.motore = motore
+        self.indici = indici
+        self.metri_max = metri_max
+
+    def __len__(self):
+        return len(self.indici)
+
+    @property
+    def chiave(self):
+        return id(self.indici)
+
+    def righe(self, inizio=0, fine=None, campi=None):
+        """Righe JSON delle strip da 'inizio' a 'fine', con i soli 'campi' se indicati"""
+        indici = self.indici[inizio:fine]
+        if not len(indici):
+            return []
+        motore = self.motore
+        strip_compatibili = materializza([motore.strip[i] for i in indici.tolist()], campi)
+        for strip_info, metri, ampere, da_colonna, potenza, voltaggio in zip(
+            strip_compatibili, self.metri_max[inizio:fine].tolist(), motore.ampere_per_metro_effettivi[indici].tolist(),
+            np.isnan(motore.ampere_per_metro[indici]).tolist(), motore.potenza_per_metro[indici].tolist(),
+            motore.voltaggio[indici].tolist()
+        ):
+            calcolati = {
+                'metri_max_supportati': metri,
+                'ampere_per_metro': round(ampere, 3),
+                'potenza_per_metro': None if potenza != potenza else round(potenza, 2),
+                'voltaggio': voltaggio,
+                'metodo_calcolo': 'potenza_voltaggio' if da_colonna else 'ampere_per_metro'
+            }
+            if campi is not None:
+                calcolati = {campo: valore for campo, valore in calcolati.items() if campo in campi}
+            strip_info.update(calcolati)
+        return strip_compatibili
@@ -0,0 +1,198 @@
+"""Configuratore di kit completi: strip, profilo, dimmer e alimentatori scelti insieme"""
+import heapq
+import math
+import threading
+
+from pianificazione import PASSO_METRI, PESO_UNITA
+
+# Oltre questo numero di classifiche memorizzate si ricomincia da capo
+MAX_CLASSIFICHE = 4096
+
+
+def migliori_coppie(n_prima, n_seconda, chiave, k):
+    """Le k coppie (i, j) con la chiave più bassa, senza enumerarle tutte.
+
+    'chiave(i, j)' deve crescere con i e con j (due liste già ordinate): si
+    parte da (0, 0) e dopo ogni estrazione si aggiungono solo i due vicini.
+    Restituisce [(chiave, i, j)] in ordine crescente.
+    """
+    if not n_prima or not n_seconda or k <= 0:
+        return []
+    coda = [(chiave(0, 0), 0, 0)]
+    visti = {(0, 0)}
+    migliori = []
+    while coda and len(migliori) < k:
+        valore, i, j = heapq.heappop(coda)
+        migliori.append((valore, i, j))
+        for vicino in ((i + 1, j), (i, j + 1)):
+            if vicino[0] < n_prima and vicino[1] < n_seconda and vicino not in visti:
+                visti.add(vicino)
+                heapq.heappush(coda, (chiave(*vicino), *vicino))
+    return migliori
+
+
+def costo_alimentazione(segmenti, criterio):
+    """Costo di un piano di PianificatoreAlimentazione, con lo stesso criterio usato per sceglierlo"""
+    if criterio == "numero":
+        return PESO_UNITA * len(segmenti) + sum(a.potenza or 0.0 for a, _, _ in segmenti)
+    if criterio == "prezzo":
+        return sum(a.prezzo for a, _, _ in segmenti)
+    return sum(a.potenza for a, _, _ in segmenti)
+
+
+class ConfiguratoreKit:
+    """Kit strip + profilo + dimmer + alimentatori per una tratta, dal migliore.
+
+    Un kit è valido se il profilo accetta la larghezza della strip, il dimmer
+    ha un range che comprende il voltaggio e la stessa categoria canali (le
+    regole del grafo di compatibilità) e il pianificatore trova alimentatori
+    per i metri richiesti. L'ordine è: costo dell'alimentazione (numero di
+    alimentatori o prezzo, come in PianificatoreAlimentazione), poi dimmer
+    con lo stesso profilo colore della strip, poi profilo con lo scarto di
+    larghezza minore, poi i codici.
+
+    La ricerca è potata: le strip con gli stessi attributi (una classe) hanno
+    gli stessi profili, dimmer e alimentatori, quindi per ogni classe si
+    cercano solo i k migliori abbinamenti profilo x dimmer a partire dalle
+    liste ordinate, senza enumerare tutte le combinazioni. Le classifiche
+    sono memorizzate per (classe, metri in passi da 10 cm, obiettivo, dimmer,
+    k) e restano valide fino alla prossima ricarica del catalogo; tra le
+    strip candidate i k kit migliori si estraggono con un heap.
+    """
+
+    def __init__(self, grafo, pianificatore, strip_larghezze, profilo_larghezze):
+        self.grafo = grafo
+        self.pianificatore = pianificatore
+        self.strip_larghezze = strip_larghezze
+        self.profilo_larghezze = profilo_larghezze
+        self._classifiche = {}
+        self._classi = {}
+        self._profili_ordinati = {}
+        self._dimmer_ordinati = {}
+        self._lock = threading.Lock()
+
+    def classe(self, strip):
+        """Attributi da cui dipendono profili, dimmer e alimentatori di una strip (None se non configurabile).
+
+        Calcolati una volta per riga del foglio e poi letti dalla memoria.
+        """
+        try:
+            return self._classi[strip.riga]
+        except KeyError:
+            pass
+        larghezza = self.strip_larghezze.get(strip.codice)
+        ampere_per_metro = strip.ampere_per_metro_effettivi
+        if not strip.codice or larghezza is None or not ampere_per_metro or strip.voltaggio_nominale is None:
+            classe = None
+        else:
+            # I dimmer vengono dal grafo, per codice: con codici duplicati non dipendono dalla riga
+            dimmer = tuple(d.riga for d in self.grafo.dimmer_per_strip.get(strip.codice, ()))
+            classe = (larghezza, dimmer, strip.profilo_colore, ampere_per_metro, strip.voltaggio_nominale)
+        self._classi[strip.riga] = classe
+        return classe
+
+    def _profili(self, strip):
+        """[(scarto di larghezza, profilo)] compatibili con la strip, dal più aderente"""
+        larghezza = self.strip_larghezze.get(strip.codice)
+        profili = self._profili_ordinati.get(larghezza)
+        if profili is None:
+            profili = sorted(
+                ((self.profilo_larghezze[p.codice] - larghezza, p) for p in self.grafo.profili_per_strip.get(strip.codice, ())),
+                key=lambda voce: (voce[0], voce[1].codice)
+            )
+            self._profili_ordinati[larghezza] = profili
+        return profili
+
+    def _dimmer(self, strip):
+        """[(profilo colore diverso, dimmer)] compatibili con la strip, prima quelli dello stesso profilo colore"""
+        # (righe dei dimmer compatibili, profilo colore)
+        chiave = self.classe(strip)[1:3]
+        dimmer = self._dimmer_ordinati.get(chiave)
+        if dimmer is None:
+            dimmer = sorted(
+                ((d.profilo_colore != strip.profilo_colore, d) for d in self.grafo.dimmer_per_strip.get(strip.codice, ())),
+                key=lambda voce: (voce[0], voce[1].codice)
+            )
+            self._dimmer_ordinati[chiave] = dimmer
+        return dimmer
+
+    def _classifica(self, strip, n_passi, obiettivo, con_dimmer, k):
+        """(costo alimentazione, [(chiave, profilo, dimmer)]) dei k abbinamenti migliori, o None"""
+        piano = self.pianificatore.pianifica(
+            strip.ampere_per_metro_effettivi, strip.voltaggio_nominale, n_passi * PASSO_METRI, obiettivo
+        )
+        if piano is None:
+            return None
+        costo = costo_alimentazione(*piano)
+
+        profili = self._profili(strip)
+        dimmer = self._dimmer(strip) if con_dimmer else [(False, None)]
+
+        def chiave(i, j):
+            scarto, profilo = profili[i]
+            diverso, d = dimmer[j]
+            return (diverso, scarto, profilo.codice, d.codice if d is not None else "")
+
+        coppie = migliori_coppie(len(profili), len(dimmer), chiave, k)
+        return costo, [(valore, profili[i][1], dimmer[j][1]) for valore, i, j in coppie]
+
+    def classifica(self, strip, n_passi, obiettivo="numero", con_dimmer=True, k=5):
+        """Classifica memorizzata della classe della strip per una lunghezza in passi"""
+        chiave = (self.classe(strip), n_passi, obiettivo, con_dimmer, k)
+        with self._lock:
+            if chiave not in self._classifiche:
+                if len(self._classifiche) >= MAX_CLASSIFICHE:
+                    self._classifiche.clear()
+                self._classifiche[chiave] = self._classifica(strip, n_passi, obiettivo, con_dimmer, k)
+            return self._classifiche[chiave]
+
+    def configura(self, strip_candidate, metri, obiettivo="numero", con_dimmer=True, k=5):
+        """I k kit migliori tra tutte le strip candidate.
+
+        Restituisce (kit, classi) dove ogni kit è un dizionario con strip,
+        profilo, dimmer (None senza dimmer), scarto di larghezza e
+        stesso_profilo_colore, e 'classi' è il numero di classi di strip
+        valutate.
+        """
+        n_passi = max(1, int(math.ceil(metri / PASSO_METRI - 1e-9)))
+        per_classe = {}
+        for strip in strip_candidate:
+            classe = self.classe(strip)
+            if classe is not None:
+                per_classe.setdefault(classe, []).append(strip)
+
+        # Per ogni strip la sua sequenza ordinata di kit; l'heap ne tiene in testa uno per strip.
+        # In una classe bastano le k strip con il codice più basso: le altre hanno gli stessi
+        # abbinamenti e a parità di chiave verrebbero dopo.
+        sequenze = []
+        coda = []
+        for strip_classe in per_classe.values():
+            classifica = self.classifica(strip_classe[0], n_passi, obiettivo, con_dimmer, k)
+            if classifica is None or not classifica[1]:
+                continue
+            costo, abbinamenti = classifica
+            for strip in heapq.nsmallest(k, strip_classe, key=lambda s: s.codice):
+                sequenze.append((strip, costo, abbinamenti))
+                coda.append((self._chiave_kit(strip, costo, abbinamenti[0][0]), len(sequenze) - 1, 0))
+        heapq.heapify(coda)
+
+        kit = []
+        while coda and len(kit) < k:
+            _, n, posizione = heapq.heappop(coda)
+            strip, costo, abbinamenti = sequenze[n]
+            (diverso, scarto, _, _), profilo, dimmer = abbinamenti[posizione]
+            kit.append({
+                "strip": strip,
+                "profilo": profilo,
+                "dimmer": dimmer,
+                "scarto_larghezza": scarto,
+                "stesso_profilo_colore": None if dimmer is None else not diverso
+            })
+            if posizione + 1 < len(abbinamenti):
+                heapq.heappush(coda, (self._chiave_kit(strip, costo, abbinamenti[posizione + 1][0]), n, posizione + 1))
+        return kit, len(per_classe)
+
+    @staticmethod
+    def _chiave_kit(strip, costo, chiave_abbinamento):
+        diverso, scarto, codice_profilo, codice_dimmer = chiave_abbinamento
+        return (costo, diverso, scarto, strip.codice, codice_profilo, codice_dimmer)
@@ -0,0 +1,72 @@
+"""Differenze tra due versioni del catalogo: codici aggiunti, rimossi e modificati per foglio"""
+
+# Codici elencati per foglio nel riepilogo stampato nel log
+MAX_CODICI_RIEPILOGO = 5
+
+
+def impronte_per_codice(prodotti, impronte):
+    """Codice -> impronte concatenate delle sue righe, nell'ordine del foglio (righe senza codice escluse)"""
+    per_codice = {}
+    for prodotto, impronta in zip(prodotti, impronte):
+        if prodotto.codice:
+            per_codice[prodotto.codice] = per_codice.get(prodotto.codice, b"") + impronta
+    return per_codice
+
+
+def codici_spostati(vecchi, prodotti, esclusi):
+    """Codici presenti in entrambe le versioni, esclusi 'esclusi', le cui righe cambiano posto tra loro"""
+    prima = {p.codice for p in vecchi if p.codice}
+    dopo = {p.codice for p in prodotti if p.codice}
+    comuni = (prima & dopo) - esclusi
+    # I codici non esclusi hanno le stesse righe nelle due versioni: le sequenze hanno la stessa lunghezza
+    ordine_prima = [p.codice for p in vecchi if p.codice in comuni]
+    ordine_dopo = [p.codice for p in prodotti if p.codice in comuni]
+    return {codice for coppia in zip(ordine_prima, ordine_dopo) if coppia[0] != coppia[1] for codice in coppia}
+
+
+def confronta_fogli(precedente, modelli, impronte):
+    """Modifiche di ogni foglio rispetto alla versione precedente del catalogo.
+
+    Restituisce {foglio: {"aggiunti", "rimossi", "modificati", "spostati"}}
+    con insiemi di codici; un codice è modificato se cambia una delle sue
+    righe o il loro ordine, spostato se solo la sua posizione rispetto agli
+    altri codici cambia. I fogli con lo stesso hash non vengono nemmeno
+    confrontati e hanno insiemi vuoti.
+    """
+    modifiche = {}
+    for foglio, prodotti in modelli.items():
+        vecchi = precedente.modelli.get(foglio, [])
+        if prodotti is vecchi or impronte.fogli.get(foglio) == precedente.impronte.fogli.get(foglio):
+            modifiche[foglio] = {"aggiunti": set(), "rimossi": set(), "modificati": set(), "spostati": set()}
+            continue
+        prima = impronte_per_codice(vecchi, precedente.impronte.per_riga(foglio))
+        dopo = impronte_per_codice(prodotti, impronte.per_riga(foglio))
+        modificati = {codice for codice in dopo.keys() & prima.keys() if dopo[codice] != prima[codice]}
+        modifiche[foglio] = {
+            "aggiunti": dopo.keys() - prima.keys(),
+            "rimossi": prima.keys() - dopo.keys(),
+            "modificati": modificati,
+            "spostati": codici_spostati(vecchi, prodotti, modificati)
+        }
+    return modifiche
+
+
+def codici_modificati(modifiche):
+    """Tutti i codici aggiunti, rimossi o modificati in almeno un foglio (gli spostati no)"""
+    return set().union(*(
+        voce[tipo] for voce in modifiche.values() for tipo in ("aggiunti", "rimossi", "modificati")
+    ))
+
+
+def riepilogo_modifiche(modifiche):
+    """Riepilogo leggibile delle modifiche, es. 'stripled +1 -0 ~2 (AV01, AV02, AV03), profili invariato'"""
+    parti = []
+    for foglio, voce in modifiche.items():
+        aggiunti, rimossi, modificati = voce["aggiunti"], voce["rimossi"], voce["modificati"]
+        if not (aggiunti or rimossi or modificati):
+            parti.append(f"{foglio} riordinato" if voce["spostati"] else f"{foglio} invariato")
+            continue
+        codici = sorted(aggiunti | rimossi | modificati)
+        esempi = ", ".join(codici[:MAX_CODICI_RIEPILOGO]) + (", ..." if len(codici) > MAX_CODICI_RIEPILOGO else "")
+        parti.append(f"{foglio} +{len(aggiunti)} -{len(rimossi)} ~{len(modificati)} ({esempi})")
+    return ", ".join(parti)
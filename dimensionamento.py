@@ -0,0 +1,118 @@
+"""Dimensionamento degli alimentatori su array NumPy (strip x alimentatori x metri)"""
+import numpy as np
+
+from modelli import materializza
+
+MARGINE_SICUREZZA = 1.2
+
+
+def _array(valori):
+    return np.array([np.nan if v is None else v for v in valori], dtype=float)
+
+
+class MotoreDimensionamento:
+    """Correnti e tensioni degli alimentatori e ampere per metro delle strip tenuti in array.
+
+    Sono usati gli alimentatori a tensione di uscita fissa con corrente nota
+    (colonna 'corrente_A' o 'Corrente A'), ordinati per tensione e poi per
+    corrente crescente: quelli compatibili con una strip sono sempre un
+    intervallo contiguo della lista, dalla prima corrente sufficiente alla
+    fine del gruppo con la tensione della strip, e si trovano con due
+    searchsorted.
+    """
+
+    def __init__(self, strip_data, alimentatori_data):
+        validi = [
+            a for a in alimentatori_data
+            if a.corrente_nominale is not None and a.corrente_nominale > 0
+            # Solo uscite a tensione fissa: i driver a corrente costante non hanno tensione o hanno un range
+            and a.tensione_min is not None and a.tensione_min == a.tensione_max
+        ]
+        # sorted() è stabile: a parità di tensione e corrente resta l'ordine del foglio
+        self.alimentatori = sorted(validi, key=lambda a: (a.tensione_min, a.corrente_nominale))
+        self.correnti = _array(a.corrente_nominale for a in self.alimentatori)
+        self.tensioni = _array(a.tensione_min for a in self.alimentatori)
+
+        self.strip = [s for s in strip_data if s.codice]
+        self.posizione_strip = {}
+        for i, s in enumerate(self.strip):
+            self.posizione_strip.setdefault(s.codice, i)
+        # Colonna "ampere per metro" e, in alternativa, potenza / voltaggio
+        self.ampere_per_metro = _array(s.ampere_per_metro for s in self.strip)
+        self.ampere_per_metro_calcolati = _array(s.ampere_per_metro_calcolati for s in self.strip)
+        self.potenza_per_metro = _array(s.potenza_per_metro for s in self.strip)
+        self.voltaggio = _array(s.voltaggio_nominale for s in self.strip)
+        self.ampere_per_metro_effettivi = np.where(
+            np.isnan(self.ampere_per_metro), self.ampere_per_metro_calcolati, self.ampere_per_metro
+        )
+
+    def gruppo_tensione(self, tensione):
+        """(inizio, fine) degli alimentatori con uscita uguale alla tensione data"""
+        if tensione is None:
+            return 0, 0
+        inizio = int(np.searchsorted(self.tensioni, tensione, side="left"))
+        return inizio, int(np.searchsorted(self.tensioni, tensione, side="right"))
+
+    def primo_alimentatore(self, ampere_necessari, tensione, margine_sicurezza=MARGINE_SICUREZZA):
+        """Posizione del primo alimentatore alla tensione data con corrente >= ampere necessari col margine"""
+        inizio, fine = self.gruppo_tensione(tensione)
+        return inizio + int(np.searchsorted(self.correnti[inizio:fine], ampere_necessari * margine_sicurezza, side="left"))
+
+    def alimentatori_compatibili(self, ampere_necessari, tensione, margine_sicurezza=MARGINE_SICUREZZA):
+        """Alimentatori compatibili alla tensione della strip, per corrente crescente, con le informazioni di utilizzo"""
+        if ampere_necessari is None:
+            return []
+
+        primo = self.primo_alimentatore(ampere_necessari, tensione, margine_sicurezza)
+        fine = self.gruppo_tensione(tensione)[1]
+        alimentatori_compatibili = materializza(self.alimentatori[primo:fine])
+        for alimentatore_info, corrente_alimentatore in zip(alimentatori_compatibili, self.correnti[primo:fine].tolist()):
+            alimentatore_info['corrente_A'] = corrente_alimentatore
+            alimentatore_info['margine_utilizzazione'] = round((ampere_necessari / corrente_alimentatore) * 100, 1)
+            alimentatore_info['ampere_disponibili'] = corrente_alimentatore
+            alimentatore_info['ampere_necessari'] = ampere_necessari
+        return alimentatori_compatibili
+
+    def strip_alimentabili(self, corrente, tensione, margine_sicurezza=MARGINE_SICUREZZA):
+        """Strip alla tensione data alimentabili per almeno 10 cm con la corrente data.
+
+        Usa la colonna "ampere per metro" e, se manca, potenza / voltaggio.
+        Restituisce (indici, metri_max) ordinati per metri supportati
+        decrescenti; i metri sono arrotondati al centimetro.
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            metri_max = corrente / (self.ampere_per_metro_effettivi * margine_sicurezza)
+        indici = np.flatnonzero((metri_max >= 0.1) & (self.voltaggio == tensione))  # Supporta almeno 10cm
+        arrotondati = np.array([round(float(m), 2) for m in metri_max[indici]], dtype=float)
+        ordine = np.argsort(-arrotondati, kind="stable")
+        return indici[ordine], arrotondati[ordine]
+
+    def ampere_necessari(self, lunghezze):
+        """Matrice strip x lunghezze degli ampere necessari, come calcola_ampere_necessari_v2"""
+        lunghezze = np.asarray(lunghezze, dtype=float)
+        da_colonna = self.ampere_per_metro[:, None] * lunghezze[None, :]
+        calcolati = np.round((self.potenza_per_metro[:, None] * lunghezze[None, :]) / self.voltaggio[:, None], 3)
+        return np.where(np.isnan(self.ampere_per_metro)[:, None], calcolati, da_colonna)
+
+    def tabella(self, lunghezze, margine_sicurezza=MARGINE_SICUREZZA):
+        """Tabella completa strip x lunghezze per l'export.
+
+        Per ogni coppia restituisce gli ampere necessari e la posizione del primo
+        alimentatore compatibile in 'self.alimentatori'; per ogni strip anche
+        la fine del gruppo alla sua tensione. Gli alimentatori compatibili sono
+        quelli da 'primo' a 'fine' escluso (nessuno se primo == fine), quindi la
+        tabella strip x alimentatori x lunghezze è implicita.
+        """
+        ampere = self.ampere_necessari(lunghezze)
+        richiesti = ampere * margine_sicurezza
+        inizio = np.searchsorted(self.tensioni, self.voltaggio, side="left")
+        fine = np.searchsorted(self.tensioni, self.voltaggio, side="right")
+        primo = np.repeat(fine[:, None], ampere.shape[1], axis=1)
+        # Una searchsorted per ogni tensione presente tra le strip
+        for i, f in set(zip(inizio.tolist(), fine.tolist())):
+            if i == f:
+                continue
+            righe = (inizio == i) & (fine == f)
+            primo[righe] = i + np.searchsorted(self.correnti[i:f], richiesti[righe], side="left")
+        # Senza dati di potenza la strip non ha alimentatori compatibili
+        return ampere, np.where(np.isnan(ampere), fine[:, None], primo), fine
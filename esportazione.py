@@ -0,0 +1,112 @@
+"""Catalogo compatto per il frontend: esportazione completa precompressa e differenze tra versioni"""
+import gzip
+import json
+import threading
+
+try:
+    import brotli
+except ImportError:  # brotli è facoltativo: senza, si serve solo gzip
+    brotli = None
+
+from modelli import MODELLI_PER_FOGLIO
+
+# Codifiche precompresse servite, in ordine di preferenza
+CODIFICHE = ("br", "gzip") if brotli is not None else ("gzip",)
+# Livelli di compressione: l'esportazione si comprime una volta per versione
+LIVELLO_GZIP = 9
+QUALITA_BROTLI = 9
+
+
+def righe_esportate(prodotti, attributi):
+    """[codice, [attributi estratti], riga del foglio] di ogni prodotto, in un colpo per tabella"""
+    if not prodotti:
+        return []
+    valori = zip(*([getattr(p, nome) for p in prodotti] for nome in attributi)) if attributi else ([] for _ in prodotti)
+    dati = prodotti[0].tabella.righe([p.riga for p in prodotti])
+    return [[p.codice, list(v), d] for p, v, d in zip(prodotti, valori, dati)]
+
+
+class EsportazioneCatalogo:
+    """Catalogo compatto di uno snapshot, con gli attributi già estratti, per il confronto lato client.
+
+    Per ogni foglio: "attributi" (i nomi delle colonne estratte dal modello)
+    e "righe", una [codice, [valori], riga originale] per ogni riga con
+    codice, nell'ordine del foglio (duplicati compresi, come negli elenchi
+    del grafo). La versione è l'etag del catalogo, uguale in tutti i worker.
+
+    Il JSON e le sue versioni gzip e brotli si costruiscono alla prima
+    richiesta e poi restano in memoria con lo snapshot. 'storico' sono le
+    ultime transizioni (etag precedente, modifiche) che hanno portato a
+    questa versione: delta() ne ricava i fogli e i codici cambiati da una
+    versione precedente senza tenere in memoria i vecchi snapshot.
+    """
+
+    def __init__(self, modelli, versione, storico=()):
+        self.versione = versione
+        self.storico = storico
+        self._modelli = modelli
+        self._corpi = {}
+        self._lock = threading.Lock()
+
+    def _prodotti(self, foglio):
+        return [p for p in self._modelli.get(foglio, []) if p.codice]
+
+    def _foglio(self, foglio, codici=None):
+        """Foglio esportato, con le sole righe dei 'codici' indicati se non None"""
+        prodotti = self._prodotti(foglio)
+        attributi = [nome for nome in MODELLI_PER_FOGLIO[foglio].colonne() if nome != "codice"]
+        esportati = prodotti if codici is None else [p for p in prodotti if p.codice in codici]
+        return {"attributi": attributi, "righe": righe_esportate(esportati, attributi)}, prodotti
+
+    def corpo(self, codifica=None):
+        """JSON completo, compresso con 'codifica' ("gzip" o "br") se indicata"""
+        with self._lock:
+            if None not in self._corpi:
+                contenuto = {
+                    "versione": self.versione,
+                    "fogli": {foglio: self._foglio(foglio)[0] for foglio in self._modelli}
+                }
+                self._corpi[None] = json.dumps(contenuto, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            if codifica not in self._corpi:
+                if codifica == "gzip":
+                    self._corpi[codifica] = gzip.compress(self._corpi[None], LIVELLO_GZIP)
+                elif codifica == "br" and brotli is not None:
+                    self._corpi[codifica] = brotli.compress(self._corpi[None], quality=QUALITA_BROTLI)
+                else:
+                    raise ValueError(f"Codifica non supportata: {codifica}")
+            return self._corpi[codifica]
+
+    def delta(self, da):
+        """Differenze dalla versione 'da' a questa: (dizionario, stato HTTP).
+
+        Per ogni foglio cambiato o riordinato restituisce "ordine" (i codici
+        di tutte le righe, nell'ordine del foglio) e "righe" (le sole righe
+        dei codici aggiunti o modificati, come nell'esportazione completa):
+        il client ricostruisce il foglio prendendo le altre righe dalla sua
+        copia. Se 'da' non è tra le versioni ricordate lo stato è 409 e il
+        client deve riscaricare il catalogo completo.
+        """
+        if da == self.versione:
+            return {"versione": self.versione, "da": da, "fogli": {}}, 200
+        # Ultima occorrenza: un contenuto può tornare uguale a una versione già vista
+        inizio = next((i for i in range(len(self.storico) - 1, -1, -1) if self.storico[i][0] == da), None)
+        if inizio is None:
+            return {
+                "error": "Versione del catalogo non più disponibile: scarica di nuovo /catalogo",
+                "versione": self.versione
+            }, 409
+
+        cambiati, riordinati = {}, set()
+        for _, modifiche in self.storico[inizio:]:
+            for foglio, voce in modifiche.items():
+                cambiati.setdefault(foglio, set()).update(voce["aggiunti"], voce["rimossi"], voce["modificati"])
+                if voce["spostati"]:
+                    riordinati.add(foglio)
+        fogli = {}
+        for foglio, codici in cambiati.items():
+            # Un foglio solo riordinato ha "righe" vuote ma "ordine" nuovo
+            if codici or foglio in riordinati:
+                esportato, prodotti = self._foglio(foglio, codici)
+                esportato["ordine"] = [p.codice for p in prodotti]
+                fogli[foglio] = esportato
+        return {"versione": self.versione, "da": da, "fogli": fogli}, 200
@@ -0,0 +1,309 @@
+"""Funzioni di estrazione dei valori tecnici dai campi dei fogli prodotti.
+
+Le espressioni regolari sono compilate una volta sola e le funzioni che
+leggono un singolo campo sono memorizzate per valore: gli stessi testi
+("24VDC", "4,8W/m") si ripetono su centinaia di righe e vengono interpretati
+una volta sola.
+"""
+import functools
+import re
+
+# Valori distinti ricordati da ciascuna funzione memorizzata
+MAX_VALORI_MEMORIZZATI = 65536
+
+memorizzato = functools.lru_cache(maxsize=MAX_VALORI_MEMORIZZATI)
+
+NUMERO = r'\d+(?:[.,]\d+)?'
+RE_NUMERO = re.compile(rf'({NUMERO})')
+RE_CANALI = re.compile(r'(\d+)\s*CH')
+RE_KELVIN = (
+    re.compile(r'(\d{4})K'),  # 3000K, 4000K, etc.
+    re.compile(r'(\d{4})\s*KELVIN'),
+    re.compile(r'(\d{4})\s*°K')
+)
+RE_POTENZA_STRIP = re.compile(rf'({NUMERO})\s*W/M')
+RE_RANGE_VOLTAGGIO = (
+    re.compile(rf'({NUMERO})\s*[~\-–]\s*({NUMERO})'),
+    re.compile(rf'({NUMERO})\s*TO\s*({NUMERO})'),
+    re.compile(rf'({NUMERO})\s+({NUMERO})')
+)
+RE_CRI = re.compile(r'^(?:CRI)?\s*(?:≥|>=|>)?\s*(\d{2,3})$')
+RE_GRADO_IP = re.compile(r'IP\s*(\d{2})')
+RE_LARGHEZZA_STRIP = re.compile(rf'\d+[xX×]({NUMERO})[xX×]\d+')
+
+# Testi che indicano il profilo colore, in ordine di priorità
+PROFILI_COLORE_TESTO = (
+    ("RGBW", ('RGBW',)),
+    ("RGB", ('RGB',)),
+    ("CCT", ('3000K', '4000K', '6000K', 'CCT', 'TUNABLE'))
+)
+
+def _numero(testo):
+    return float(testo.replace(',', '.'))
+
+@memorizzato
+def _primo_numero(testo):
+    match = RE_NUMERO.search(testo)
+    if match:
+        return _numero(match.group(1))
+    return None
+
+def estrai_numero_testo(valore):
+    """Primo numero in un campo, es. '2,5A' -> 2.5; None se il campo è vuoto"""
+    if not valore:
+        return None
+    return _primo_numero(str(valore))
+
+@memorizzato
+def estrai_numero_canali(valore):
+    """Estrae il numero di canali da una stringa tipo '1CH', 'RGBW - 4CH', ecc."""
+    if not valore:
+        return None
+    match = RE_CANALI.search(str(valore).upper())
+    if match:
+        return int(match.group(1))
+    return None
+
+@memorizzato
+def _temperature_testo(testo):
+    """(temperature in Kelvin trovate, priorità della parola chiave di ripiego) di un campo"""
+    testo = testo.upper()
+    temperature = []
+    for pattern in RE_KELVIN:
+        for match in pattern.findall(testo):
+            temp = int(match)
+            if 1000 <= temp <= 10000:  # Range ragionevole per temperature colore
+                temperature.append(temp)
+
+    if any(keyword in testo for keyword in ['2700', '2800', '2900']):
+        ripiego = 0
+    elif '4000' in testo:
+        ripiego = 1
+    elif any(keyword in testo for keyword in ['6000', '6500']):
+        ripiego = 2
+    else:
+        ripiego = None
+    return tuple(temperature), ripiego
+
+def estrai_temperatura_colore(item):
+    """Estrae la temperatura colore da una strip LED"""
+    if not item:
+        return None
+
+    # Cerca nei campi "Colore Luce", "Descrizione" e nel codice, uno alla volta
+    temperature_trovate = []
+    ripieghi = []
+    for campo in ('Colore Luce', 'Descrizione', 'Codice'):
+        temperature, ripiego = _temperature_testo(str(item.get(campo) or ''))
+        temperature_trovate.extend(temperature)
+        if ripiego is not None:
+            ripieghi.append(ripiego)
+
+    if temperature_trovate:
+        return min(temperature_trovate)
+
+    # Fallback: parole chiave comuni (bianco caldo, naturale, freddo)
+    if ripieghi:
+        return (2700, 4000, 6000)[min(ripieghi)]
+    return None
+
+def categoria_canali_strip(temp_colore, num_canali):
+    """Categoria 1-2CH o 3-5CH di una strip dalla temperatura colore, o dai canali se manca"""
+    if temp_colore is None:
+        # Se non riusciamo a determinare la temperatura, usiamo il vecchio sistema basato sui canali
+        if num_canali:
+            return "1-2CH" if num_canali <= 2 else "3-5CH"
+        return None
+
+    # Logica principale: <= 3000K = 1-2CH, > 3000K = 3-5CH
+    return "1-2CH" if temp_colore <= 3000 else "3-5CH"
+
+def determina_categoria_canali_strip(item):
+    """Determina se una strip appartiene alla categoria 1-2CH o 3-5CH based sulla temperatura colore"""
+    if not item:
+        return None
+    return categoria_canali_strip(estrai_temperatura_colore(item), estrai_numero_canali(item.get("Canali", "")))
+
+def categoria_canali_dimmer(num_canali):
+    """Categoria 1-2CH o 3-5CH dal numero di canali del dimmer"""
+    if num_canali is None:
+        return None
+    return "1-2CH" if num_canali <= 2 else "3-5CH"
+
+def determina_categoria_canali_dimmer(item):
+    """Determina la categoria di canali del dimmer"""
+    if not item:
+        return None
+    return categoria_canali_dimmer(estrai_numero_canali(item.get("Canali Dimmer", "")))
+
+@memorizzato
+def estrai_potenza_strip(potenza_str):
+    """Estrae la potenza per metro da una stringa tipo '4,8W/m'"""
+    if not potenza_str:
+        return None
+
+    match = RE_POTENZA_STRIP.search(str(potenza_str).upper())
+    if match:
+        return _numero(match.group(1))
+
+    return None
+
+@memorizzato
+def estrai_voltaggio_strip(voltaggio_str):
+    """Estrae il voltaggio da una stringa tipo '24VDC'"""
+    if not voltaggio_str:
+        return None
+
+    # Pulisce e estrae il numero
+    cleaned = str(voltaggio_str).upper().replace('VDC', '').replace('VAC', '').replace('V', '').strip()
+    return _primo_numero(cleaned)
+
+def estrai_ampere_per_metro(strip):
+    """Estrae gli ampere per metro dalla colonna specifica"""
+    if not strip:
+        return None
+    return estrai_numero_testo(strip.get('ampere per metro', ''))
+
+def estrai_tensione_alimentatore(alimentatore):
+    """Estrae la tensione di uscita (min, max) dalle colonne 'tensione_V' o 'Tensione V'"""
+    if not alimentatore:
+        return None, None
+
+    tensione = alimentatore.get('tensione_V')
+    if tensione is None or tensione == '':
+        tensione = alimentatore.get('Tensione V', '')
+    return estrai_range_voltaggio_dimmer(str(tensione) if tensione is not None else '')
+
+def estrai_valore_numerico(item, *colonne):
+    """Primo numero trovato nelle colonne indicate (es. 'potenza_W', 'prezzo')"""
+    if not item:
+        return None
+
+    for colonna in colonne:
+        valore = item.get(colonna)
+        if valore is None or valore == '':
+            continue
+        numero = _primo_numero(str(valore))
+        if numero is not None:
+            return numero
+    return None
+
+@memorizzato
+def estrai_cri(valore):
+    """Estrae l'indice di resa cromatica da stringhe tipo '≥80' o 'CRI 90'"""
+    if not valore:
+        return None
+
+    match = RE_CRI.search(str(valore).strip().upper())
+    if match and int(match.group(1)) <= 100:
+        return float(match.group(1))
+    return None
+
+@memorizzato
+def estrai_grado_ip(valore):
+    """Normalizza il grado di protezione, es. 'ip 65' -> 'IP65'"""
+    if not valore:
+        return None
+
+    match = RE_GRADO_IP.search(str(valore).upper())
+    if match:
+        return f"IP{match.group(1)}"
+    return None
+
+def profilo_colore_da_canali(num_canali):
+    if num_canali == 1:
+        return "MONO"  # Monocromatico
+    elif num_canali == 2:
+        return "CCT"   # Color Temperature (bianco variabile)
+    elif num_canali == 3:
+        return "RGB"   # RGB
+    elif num_canali == 4:
+        return "RGBW"  # RGB + White
+    return "MULTI"     # Multi-canale
+
+def profilo_colore_strip(item):
+    """Determina il profilo colore di una strip o dimmer basandosi sui canali o descrizione"""
+    if not item:
+        return None
+
+    # Controlla prima i canali
+    canali_raw = item.get("Canali", "") or item.get("Canali Dimmer", "")
+    num_canali = estrai_numero_canali(canali_raw)
+    if num_canali:
+        return profilo_colore_da_canali(num_canali)
+
+    # Fallback: analisi del nome/descrizione, campo per campo
+    testi = [str(item.get(campo) or '').upper() for campo in ('Descrizione', 'Codice')]
+    for profilo, parole in PROFILI_COLORE_TESTO:
+        if any(parola in testo for testo in testi for parola in parole):
+            return profilo
+    return "MONO"
+
+@memorizzato
+def pulisci_voltaggio(valore):
+    """Pulisce una stringa voltaggio rimuovendo prefissi e suffissi comuni"""
+    if not valore:
+        return ""
+
+    cleaned = str(valore).upper()
+    # Rimuovi prefissi/suffissi comuni
+    for term in ['DC', 'AC', 'V']:
+        cleaned = cleaned.replace(term, '')
+
+    return cleaned.strip()
+
+@memorizzato
+def estrai_voltaggio_singolo(valore):
+    """Estrae un singolo valore di voltaggio"""
+    if not valore:
+        return None
+    return _primo_numero(pulisci_voltaggio(valore))
+
+@memorizzato
+def estrai_range_voltaggio_dimmer(valore):
+    """Versione migliorata per estrarre range voltaggio dimmer"""
+    if not valore:
+        return None, None
+
+    cleaned = pulisci_voltaggio(valore)
+
+    for pattern in RE_RANGE_VOLTAGGIO:
+        match = pattern.search(cleaned)
+        if match:
+            return _numero(match.group(1)), _numero(match.group(2))
+
+    # Se non è un range, prova singolo valore
+    single_v = estrai_voltaggio_singolo(valore)
+    if single_v is not None:
+        return single_v, single_v
+
+    return None, None
+
+@memorizzato
+def estrai_larghezza_strip(dimensioni):
+    if not dimensioni:
+        return None
+    match = RE_LARGHEZZA_STRIP.search(str(dimensioni))
+    if match:
+        return _numero(match.group(1))
+    return None
+
+@memorizzato
+def estrai_larghezza_profilo(valore):
+    if not valore:
+        return None
+    return _primo_numero(str(valore))
+
+# Funzioni memorizzate, per le statistiche di /metrics
+FUNZIONI_MEMORIZZATE = (
+    _primo_numero, estrai_numero_canali, _temperature_testo, estrai_potenza_strip, estrai_voltaggio_strip,
+    estrai_cri, estrai_grado_ip, pulisci_voltaggio, estrai_voltaggio_singolo, estrai_range_voltaggio_dimmer,
+    estrai_larghezza_strip, estrai_larghezza_profilo
+)
+
+def statistiche_memoria():
+    """Per ogni funzione memorizzata: (valori ritrovati, valori interpretati, valori in memoria)"""
+    return {
+        funzione.__name__.lstrip('_'): (info.hits, info.misses, info.currsize)
+        for funzione, info in ((f, f.cache_info()) for f in FUNZIONI_MEMORIZZATE)
+    }
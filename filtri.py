@@ -0,0 +1,227 @@
+"""Filtri a faccette su strip, profili e dimmer con bitmap precalcolate"""
+import bisect
+
+# Ogni quanti elementi di una faccetta numerica si salva la bitmap cumulativa
+BLOCCO = 64
+
+
+def bitmap_da_posizioni(posizioni, quanti):
+    """Bitmap (intero Python) con a 1 i bit delle posizioni indicate"""
+    byte = bytearray((quanti + 7) // 8)
+    for posizione in posizioni:
+        byte[posizione >> 3] |= 1 << (posizione & 7)
+    return int.from_bytes(byte, "little")
+
+
+def posizioni_da_bitmap(bitmap, salta=0, quanti=None):
+    """Posizioni dei bit a 1 in ordine crescente, saltando le prime 'salta'"""
+    posizioni = []
+    while bitmap and (quanti is None or len(posizioni) < quanti):
+        bit_basso = bitmap & -bitmap
+        if salta:
+            salta -= 1
+        else:
+            posizioni.append(bit_basso.bit_length() - 1)
+        bitmap ^= bit_basso
+    return posizioni
+
+
+def _lista(valore):
+    if valore is None:
+        return ()
+    return valore if isinstance(valore, (list, tuple, set, frozenset)) else (valore,)
+
+
+class FacettaNumerica:
+    """Valori ordinati con le posizioni dei prodotti, per filtri per intervallo.
+
+    cumulative[i] è la bitmap dei primi i * BLOCCO valori in ordine, quindi
+    la bitmap di un intervallo richiede due bisect e al massimo 2 * BLOCCO
+    bit da aggiungere a mano.
+    """
+
+    def __init__(self, coppie, quanti):
+        coppie = sorted(coppie)
+        self.quanti = quanti
+        self.valori = [valore for valore, _ in coppie]
+        self.posizioni = [posizione for _, posizione in coppie]
+        self.cumulative = [0]
+        byte = bytearray((quanti + 7) // 8)
+        for i, posizione in enumerate(self.posizioni, 1):
+            byte[posizione >> 3] |= 1 << (posizione & 7)
+            if i % BLOCCO == 0:
+                self.cumulative.append(int.from_bytes(byte, "little"))
+
+    def _primi(self, n):
+        """Bitmap dei primi n valori in ordine crescente"""
+        blocco = n // BLOCCO
+        return self.cumulative[blocco] | bitmap_da_posizioni(self.posizioni[blocco * BLOCCO:n], self.quanti)
+
+    def intervallo(self, minimo=None, massimo=None):
+        """Bitmap dei prodotti con minimo <= valore <= massimo (estremi opzionali)"""
+        inizio = bisect.bisect_left(self.valori, minimo) if minimo is not None else 0
+        fine = bisect.bisect_right(self.valori, massimo) if massimo is not None else len(self.valori)
+        if fine <= inizio:
+            return 0
+        return self._primi(fine) ^ self._primi(inizio)
+
+    def estremi(self):
+        if not self.valori:
+            return None
+        return {"min": self.valori[0], "max": self.valori[-1]}
+
+
+class IndiceFacette:
+    """Bitmap per ogni valore di ogni faccetta di una categoria di prodotti.
+
+    'discrete' e 'numeriche' mappano il nome della faccetta alla funzione che
+    ne estrae il valore (o la lista di valori) da un prodotto. Le faccette
+    numeriche hanno anche l'indice per intervalli. Il bit i di ogni bitmap
+    corrisponde a prodotti[i].
+    """
+
+    def __init__(self, prodotti, discrete, numeriche=None):
+        numeriche = numeriche or {}
+        self.prodotti = prodotti
+        self.tutti = (1 << len(prodotti)) - 1
+
+        self.facette = {}
+        for nome, estrai in {**discrete, **numeriche}.items():
+            posizioni_per_valore = {}
+            for posizione, prodotto in enumerate(prodotti):
+                for valore in _lista(estrai(prodotto)):
+                    posizioni_per_valore.setdefault(valore, []).append(posizione)
+            self.facette[nome] = {
+                valore: bitmap_da_posizioni(posizioni, len(prodotti))
+                for valore, posizioni in posizioni_per_valore.items()
+            }
+        # Faccette con valori numerici, anche se discrete (es. voltaggi dei dimmer)
+        self.numeriche = set(numeriche) | {
+            nome for nome, valori in self.facette.items()
+            if valori and all(isinstance(v, (int, float)) for v in valori)
+        }
+
+        self.intervalli = {
+            nome: FacettaNumerica(
+                [(v, posizione) for posizione, prodotto in enumerate(prodotti) for v in _lista(estrai(prodotto))],
+                len(prodotti)
+            )
+            for nome, estrai in numeriche.items()
+        }
+
+    def filtra(self, selezioni, intervalli=None, vincolo=None):
+        """Bitmap dei risultati e conteggi per faccetta.
+
+        'selezioni' mappa una faccetta ai valori ammessi (in OR), 'intervalli'
+        una faccetta numerica a (minimo, massimo). I conteggi di ogni faccetta
+        ignorano il filtro sulla faccetta stessa, così mostrano quanti
+        risultati si avrebbero cambiando solo quel valore.
+        """
+        filtri = {}
+        for nome, valori in selezioni.items():
+            valori_faccetta = self.facette[nome]
+            bitmap = 0
+            for valore in valori:
+                bitmap |= valori_faccetta.get(valore, 0)
+            filtri[nome] = bitmap
+        for nome, (minimo, massimo) in (intervalli or {}).items():
+            bitmap = self.intervalli[nome].intervallo(minimo, massimo)
+            filtri[nome] = filtri.get(nome, self.tutti) & bitmap
+
+        base = self.tutti if vincolo is None else self.tutti & vincolo
+        risultato = base
+        for bitmap in filtri.values():
+            risultato &= bitmap
+
+        conteggi = {}
+        for nome, valori_faccetta in self.facette.items():
+            senza_questa = base
+            for altro, bitmap in filtri.items():
+                if altro != nome:
+                    senza_questa &= bitmap
+            conteggi[nome] = {
+                valore: (bitmap & senza_questa).bit_count()
+                for valore, bitmap in valori_faccetta.items()
+            }
+        return risultato, conteggi
+
+    def estremi(self):
+        """Valori minimo e massimo di ogni faccetta numerica su tutta la categoria"""
+        return {nome: facetta.estremi() for nome, facetta in self.intervalli.items()}
+
+
+def _unici(prodotti):
+    """Prodotti con codice, senza duplicati: a parità di codice vince la prima riga"""
+    visti = set()
+    unici = []
+    for p in prodotti:
+        if p.codice and p.codice not in visti:
+            visti.add(p.codice)
+            unici.append(p)
+    return unici
+
+
+def costruisci_filtri(catalogo, precedente=None):
+    """Indici a faccette di strip, profili e dimmer per uno snapshot del catalogo.
+
+    Larghezze e range di voltaggio vengono dai dizionari di supporto del
+    catalogo, come nel grafo di compatibilità. Con 'precedente' (lo snapshot
+    precedente) gli indici dei fogli invariati vengono riusati.
+    """
+    def invariati(*attributi):
+        return precedente is not None and all(
+            getattr(precedente, nome) is getattr(catalogo, nome) for nome in attributi
+        )
+
+    filtri = {}
+    if invariati("strip_data"):
+        filtri["stripled"] = precedente.filtri["stripled"]
+    else:
+        strip = _unici(catalogo.strip_data)
+        filtri["stripled"] = IndiceFacette(
+            strip,
+            discrete={
+                "ip": lambda s: s.ip,
+                "categoria_canali": lambda s: s.categoria_canali,
+                "profilo_colore": lambda s: s.profilo_colore
+            },
+            numeriche={
+                "voltaggio": lambda s: s.voltaggio,
+                "kelvin": lambda s: s.temperatura_colore,
+                "cri": lambda s: s.cri,
+                "potenza": lambda s: s.potenza_per_metro,
+                "larghezza": lambda s: catalogo.strip_larghezze.get(s.codice)
+            }
+        )
+
+    if invariati("profili_data"):
+        filtri["profili"] = precedente.filtri["profili"]
+    else:
+        filtri["profili"] = IndiceFacette(
+            _unici(catalogo.profili_data),
+            discrete={},
+            numeriche={"larghezza": lambda p: catalogo.profilo_larghezze.get(p.codice)}
+        )
+
+    # I voltaggi dei dimmer dipendono anche da quelli delle strip
+    if invariati("dimmer_data", "strip_data"):
+        filtri["Dimmer"] = precedente.filtri["Dimmer"]
+    else:
+        voltaggi_strip = sorted({s.voltaggio for s in filtri["stripled"].prodotti if s.voltaggio is not None})
+
+        def voltaggi_dimmer(d):
+            # Un dimmer compare sotto ogni voltaggio di strip che rientra nel suo range
+            min_v, max_v = catalogo.dimmer_voltaggi.get(d.codice, (None, None))
+            if min_v is None or max_v is None:
+                return ()
+            return [v for v in voltaggi_strip if min_v <= v <= max_v]
+
+        filtri["Dimmer"] = IndiceFacette(
+            _unici(catalogo.dimmer_data),
+            discrete={
+                "voltaggio": voltaggi_dimmer,
+                "categoria_canali": lambda d: d.categoria_canali,
+                "profilo_colore": lambda d: d.profilo_colore
+            }
+        )
+    return filtri
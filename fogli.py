@@ -0,0 +1,84 @@
+"""Lettura dei fogli prodotti da Google Sheets, in parallelo e con ripetizioni sugli errori di quota"""
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from gspread.exceptions import APIError, WorksheetNotFound
+from requests.exceptions import ConnectionError, Timeout
+
+NOME_SPREADSHEET = "Specifiche prodotti avtecno"
+FOGLI_CATALOGO = ("stripled", "profili", "Dimmer", "alimentatori")
+
+# Quota superata o errori temporanei lato Google
+CODICI_RIPROVABILI = {429, 500, 502, 503, 504}
+
+
+def errore_riprovabile(errore):
+    """True per gli errori per cui ha senso riprovare: quota, errori 5xx, rete"""
+    if isinstance(errore, APIError):
+        codice = getattr(errore, "code", None)
+        if codice is None and getattr(errore, "response", None) is not None:
+            codice = errore.response.status_code
+        return codice in CODICI_RIPROVABILI
+    return isinstance(errore, (ConnectionError, Timeout))
+
+
+def con_ripetizioni(funzione, tentativi=4, attesa=1.0):
+    """Esegue funzione() riprovando con backoff esponenziale sugli errori temporanei"""
+    for tentativo in range(tentativi):
+        try:
+            return funzione()
+        except Exception as e:
+            if tentativo == tentativi - 1 or not errore_riprovabile(e):
+                raise
+            pausa = attesa * 2 ** tentativo + random.uniform(0, attesa)
+            print(f"Errore temporaneo da Google Sheets ({str(e)}), nuovo tentativo tra {pausa:.1f}s")
+            time.sleep(pausa)
+
+
+def _leggi_foglio(worksheet, tentativi, durate):
+    inizio = time.perf_counter()
+    try:
+        return con_ripetizioni(worksheet.get_all_records, tentativi)
+    finally:
+        durate[worksheet.title] = time.perf_counter() - inizio
+
+
+def scarica_fogli(client, nomi=FOGLI_CATALOGO, timeout=30, tentativi=4, durate=None):
+    """Scarica i fogli indicati aprendo lo spreadsheet una sola volta.
+
+    I fogli vengono letti in parallelo, quindi il tempo totale è quello del
+    foglio più lento. Restituisce (righe, errori): righe contiene i record dei
+    fogli letti, errori l'eccezione di ciascun foglio non letto entro 'timeout'
+    secondi. Se 'durate' è un dizionario vi vengono scritti i secondi impiegati
+    per ogni foglio completato.
+    """
+    durate = {} if durate is None else durate
+    spreadsheet = con_ripetizioni(lambda: client.open(NOME_SPREADSHEET), tentativi)
+    worksheets = {ws.title: ws for ws in con_ripetizioni(spreadsheet.worksheets, tentativi)}
+
+    righe = {}
+    errori = {}
+    esecutore = ThreadPoolExecutor(max_workers=len(nomi), thread_name_prefix="foglio")
+    try:
+        futures = {}
+        for nome in nomi:
+            if nome not in worksheets:
+                errori[nome] = WorksheetNotFound(nome)
+                continue
+            futures[nome] = esecutore.submit(_leggi_foglio, worksheets[nome], tentativi, durate)
+
+        scadenza = time.monotonic() + timeout
+        for nome, future in futures.items():
+            try:
+                righe[nome] = future.result(timeout=max(0, scadenza - time.monotonic()))
+            except FutureTimeoutError:
+                errori[nome] = TimeoutError(f"timeout di {timeout}s superato")
+            except Exception as e:
+                errori[nome] = e
+    finally:
+        # Non aspettiamo i fogli andati in timeout
+        esecutore.shutdown(wait=False, cancel_futures=True)
+
+    return righe, errori
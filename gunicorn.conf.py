@@ -0,0 +1,36 @@
+"""Configurazione gunicorn per la produzione: gunicorn -c gunicorn.conf.py wsgi:app
+
+Worker e thread si impostano da ambiente (GUNICORN_WORKERS, GUNICORN_THREADS).
+'kill -HUP <pid master>' sostituisce i worker senza perdere richieste: i
+nuovi worker nascono dal catalogo del master e passano subito all'ultimo
+snapshot salvato su disco.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+
+# Un processo per core più uno; ogni worker serve più richieste con i thread
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+worker_class = "gthread"
+
+# Catalogo caricato nel master e condiviso copy-on-write dai worker
+preload_app = True
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+# Riciclo periodico dei worker (0 = disattivato)
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-")
+
+
+def when_ready(server):
+    # Gli oggetti del catalogo caricati nel master non vengono più visitati dal
+    # garbage collector, che altrimenti ne sporcherebbe le pagine nei worker
+    gc.freeze()
@@ -0,0 +1,164 @@
+"""Contatori, tempi per route e per fase, esportati in formato testo Prometheus, e profiler a campionamento"""
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Limiti superiori (secondi) dei bucket degli istogrammi di durata
+BUCKET_DURATA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(valore):
+    return str(valore).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etichette(etichette):
+    if not etichette:
+        return ""
+    return "{" + ",".join(f'{nome}="{_escape(valore)}"' for nome, valore in etichette) + "}"
+
+
+def _numero(valore):
+    return repr(float(valore)) if valore == valore else "NaN"
+
+
+class Metriche:
+    """Registro delle metriche del processo.
+
+    Contatori e istogrammi sono indicizzati per (nome, etichette); gli
+    aggiornamenti prendono un lock solo per il tempo di una somma, quindi si
+    possono chiamare dalle route senza costi apprezzabili.
+    """
+
+    def __init__(self, bucket=BUCKET_DURATA):
+        self.bucket = bucket
+        self._lock = threading.Lock()
+        self._descrizioni = {}
+        self._contatori = {}
+        self._istogrammi = {}
+
+    def descrivi(self, nome, tipo, descrizione):
+        self._descrizioni[nome] = (tipo, descrizione)
+
+    def incrementa(self, nome, valore=1, **etichette):
+        chiave = (nome, tuple(sorted(etichette.items())))
+        with self._lock:
+            self._contatori[chiave] = self._contatori.get(chiave, 0) + valore
+
+    def osserva(self, nome, secondi, **etichette):
+        chiave = (nome, tuple(sorted(etichette.items())))
+        with self._lock:
+            istogramma = self._istogrammi.get(chiave)
+            if istogramma is None:
+                # Un conteggio per bucket, poi somma e numero di osservazioni
+                istogramma = self._istogrammi[chiave] = [0] * len(self.bucket) + [0.0, 0]
+            for i, limite in enumerate(self.bucket):
+                if secondi <= limite:
+                    istogramma[i] += 1
+                    break
+            istogramma[-2] += secondi
+            istogramma[-1] += 1
+
+    @contextmanager
+    def cronometra(self, nome, **etichette):
+        """Osserva in 'nome' la durata del blocco with"""
+        inizio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.osserva(nome, time.perf_counter() - inizio, **etichette)
+
+    def esporta(self, istantanei=()):
+        """Tutte le metriche nel formato testo di Prometheus (versione 0.0.4).
+
+        'istantanei' sono valori letti altrove al momento dell'esportazione
+        (cache, catalogo) come (nome, tipo, descrizione, etichette, valore).
+        """
+        with self._lock:
+            contatori = dict(self._contatori)
+            istogrammi = {chiave: list(valori) for chiave, valori in self._istogrammi.items()}
+
+        righe_per_nome = {}
+        for (nome, etichette), valore in contatori.items():
+            righe_per_nome.setdefault(nome, []).append(f"{nome}{_etichette(etichette)} {_numero(valore)}")
+        for (nome, etichette), valori in istogrammi.items():
+            righe = righe_per_nome.setdefault(nome, [])
+            cumulato = 0
+            for limite, conteggio in zip(self.bucket, valori):
+                cumulato += conteggio
+                righe.append(f"{nome}_bucket{_etichette(etichette + (('le', _numero(limite)),))} {cumulato}")
+            righe.append(f"{nome}_bucket{_etichette(etichette + (('le', '+Inf'),))} {valori[-1]}")
+            righe.append(f"{nome}_sum{_etichette(etichette)} {_numero(valori[-2])}")
+            righe.append(f"{nome}_count{_etichette(etichette)} {valori[-1]}")
+
+        descrizioni = dict(self._descrizioni)
+        for nome, tipo, descrizione, etichette, valore in istantanei:
+            descrizioni.setdefault(nome, (tipo, descrizione))
+            etichette = tuple(sorted(etichette.items()))
+            righe_per_nome.setdefault(nome, []).append(f"{nome}{_etichette(etichette)} {_numero(valore)}")
+
+        testo = []
+        for nome in sorted(righe_per_nome):
+            tipo, descrizione = descrizioni.get(nome, ("untyped", ""))
+            testo.append(f"# HELP {nome} {descrizione}")
+            testo.append(f"# TYPE {nome} {tipo}")
+            testo.extend(righe_per_nome[nome])
+        return "\n".join(testo) + "\n"
+
+
+class ProfilerCampionamento:
+    """Profiler a campionamento attivabile a runtime.
+
+    Un thread legge ogni 'intervallo' secondi gli stack di tutti gli altri
+    thread e conta gli stack uguali; esporta() li restituisce nel formato
+    "collapsed" (funzione;funzione;... conteggio) usato dai flame graph.
+    """
+
+    def __init__(self, intervallo=0.005, max_stack=10000):
+        self.intervallo = intervallo
+        self.max_stack = max_stack
+        self.campioni = Counter()
+        self._lock = threading.Lock()
+        self._ferma = threading.Event()
+        self._thread = None
+
+    @property
+    def attivo(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def attiva(self):
+        if self.attivo:
+            return
+        self._ferma.clear()
+        self._thread = threading.Thread(target=self._ciclo, name="profiler", daemon=True)
+        self._thread.start()
+
+    def disattiva(self):
+        self._ferma.set()
+        if self._thread is not None:
+            self._thread.join(1)
+
+    def azzera(self):
+        with self._lock:
+            self.campioni.clear()
+
+    def _ciclo(self):
+        proprio = threading.get_ident()
+        while not self._ferma.wait(self.intervallo):
+            for identificativo, frame in sys._current_frames().items():
+                if identificativo == proprio:
+                    continue
+                funzioni = []
+                while frame is not None:
+                    codice = frame.f_code
+                    funzioni.append(f"{codice.co_filename.rsplit('/', 1)[-1]}:{codice.co_name}")
+                    frame = frame.f_back
+                stack = ";".join(reversed(funzioni))
+                with self._lock:
+                    if stack in self.campioni or len(self.campioni) < self.max_stack:
+                        self.campioni[stack] += 1
+
+    def esporta(self):
+        with self._lock:
+            return "".join(f"{stack} {conteggio}\n" for stack, conteggio in self.campioni.most_common())
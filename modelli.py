@@ -0,0 +1,320 @@
+"""Modelli tipizzati dei prodotti, con i valori numerici estratti una sola volta al caricamento"""
+from colonne import ColonnaIntera, ColonnaNumerica, ColonnaTesto, TabellaColonnare
+from estrattori import (
+    categoria_canali_dimmer,
+    categoria_canali_strip,
+    estrai_cri,
+    estrai_grado_ip,
+    estrai_larghezza_profilo,
+    estrai_larghezza_strip,
+    estrai_numero_canali,
+    estrai_numero_testo,
+    estrai_potenza_strip,
+    estrai_range_voltaggio_dimmer,
+    estrai_temperatura_colore,
+    estrai_tensione_alimentatore,
+    estrai_valore_numerico,
+    estrai_voltaggio_singolo,
+    estrai_voltaggio_strip,
+    profilo_colore_strip,
+)
+
+# Testi che nei fogli indicano un dato assente, non un formato sconosciuto
+VALORI_ASSENTI = {'', '-', '/', 'N/A', 'NA'}
+
+
+def normalizza_codice(valore):
+    """Normalizza un codice prodotto per i confronti (senza spazi, maiuscolo)"""
+    return str(valore or '').strip().upper()
+
+
+def estrai_corrente_nominale(alimentatore):
+    """Legge la corrente di un alimentatore dalle colonne 'corrente_A' o 'Corrente A'"""
+    corrente = alimentatore.get('corrente_A') or alimentatore.get('Corrente A')
+    try:
+        return float(str(corrente).replace(',', '.'))
+    except Exception:
+        return None
+
+
+def segnala(anomalie, colonna, valore, risultato):
+    """Aggiunge (colonna, valore) ad 'anomalie' se il campo è compilato ma non interpretato"""
+    if anomalie is None or valore is None or (risultato is not None and risultato != (None, None)):
+        return
+    if str(valore).strip().upper() not in VALORI_ASSENTI:
+        anomalie.append((colonna, valore))
+
+
+def leggi_campo(dati, colonna, estrai, anomalie=None):
+    """Legge e interpreta una colonna della riga, segnalando i valori non interpretati"""
+    valore = dati.get(colonna, '')
+    risultato = estrai(valore)
+    segnala(anomalie, colonna, valore, risultato)
+    return risultato
+
+
+def materializza(prodotti, campi=None):
+    """Righe JSON di prodotti dello stesso foglio, costruite solo al momento della risposta"""
+    if not prodotti:
+        return []
+    return prodotti[0].tabella.righe([p.riga for p in prodotti], campi)
+
+
+class ElencoProdotti:
+    """Lista di prodotti dello stesso foglio le cui righe JSON si costruiscono a pezzi.
+
+    'chiave' identifica la lista condivisa da cui viene l'elenco, per non
+    costruire due volte le stesse righe nella stessa richiesta.
+    """
+    __slots__ = ('prodotti',)
+
+    def __init__(self, prodotti):
+        self.prodotti = prodotti
+
+    def __len__(self):
+        return len(self.prodotti)
+
+    @property
+    def chiave(self):
+        return id(self.prodotti)
+
+    def righe(self, inizio=0, fine=None, campi=None):
+        """Righe JSON dei prodotti da 'inizio' a 'fine', con le sole colonne 'campi' se indicate"""
+        return materializza(self.prodotti[inizio:fine], campi)
+
+
+class Prodotto:
+    """Riga di un foglio prodotti, letta dalla tabella a colonne del foglio.
+
+    Il prodotto non copia niente: contiene la tabella e la posizione della
+    riga. Gli attributi estratti sono colonne tipizzate della tabella e 'dati'
+    ricostruisce la riga originale, usata per le risposte JSON.
+    """
+    __slots__ = ('tabella', 'riga')
+    codice = ColonnaTesto()
+
+    def __init__(self, tabella, riga):
+        self.tabella = tabella
+        self.riga = riga
+
+    @property
+    def dati(self):
+        return self.tabella.riga(self.riga)
+
+    def valore(self, colonna, predefinito=None):
+        """Valore di una colonna del foglio, senza ricostruire la riga"""
+        return self.tabella.valore(self.riga, colonna, predefinito)
+
+    @classmethod
+    def colonne(cls):
+        """Attributi estratti del modello, come {nome: colonna}"""
+        return {
+            nome: attributo for classe in reversed(cls.__mro__) for nome, attributo in vars(classe).items()
+            if isinstance(attributo, ColonnaNumerica)
+        }
+
+    @staticmethod
+    def analizza(dati, anomalie=None):
+        """Attributi estratti da una riga del foglio, come {nome: valore}"""
+        return {'codice': normalizza_codice(dati.get('Codice'))}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.codice!r})"
+
+
+class Strip(Prodotto):
+    """Strip LED con larghezza, voltaggio, potenza, categoria canali, CRI e IP già estratti"""
+    __slots__ = ()
+    larghezza = ColonnaNumerica()
+    voltaggio = ColonnaNumerica()
+    voltaggio_nominale = ColonnaNumerica()
+    potenza_per_metro = ColonnaNumerica()
+    ampere_per_metro = ColonnaNumerica()
+    temperatura_colore = ColonnaIntera()
+    categoria_canali = ColonnaTesto()
+    profilo_colore = ColonnaTesto()
+    cri = ColonnaNumerica()
+    ip = ColonnaTesto()
+
+    @staticmethod
+    def analizza(dati, anomalie=None):
+        # Categoria dalla temperatura già estratta, senza rileggere i campi di testo
+        temperatura = estrai_temperatura_colore(dati)
+        canali = leggi_campo(dati, 'Canali', estrai_numero_canali, anomalie)
+        return {
+            'codice': normalizza_codice(dati.get('Codice')),
+            'larghezza': leggi_campo(dati, 'Dimensioni', estrai_larghezza_strip, anomalie),
+            'voltaggio': leggi_campo(dati, 'Input Volt', estrai_voltaggio_singolo, anomalie),
+            'voltaggio_nominale': estrai_voltaggio_strip(dati.get('Input Volt', '')),
+            'potenza_per_metro': leggi_campo(dati, 'Potenza', estrai_potenza_strip, anomalie),
+            'ampere_per_metro': leggi_campo(dati, 'ampere per metro', estrai_numero_testo, anomalie),
+            'temperatura_colore': temperatura,
+            'categoria_canali': categoria_canali_strip(temperatura, canali),
+            'profilo_colore': profilo_colore_strip(dati),
+            'cri': leggi_campo(dati, 'CRI', estrai_cri, anomalie),
+            'ip': leggi_campo(dati, 'IP', estrai_grado_ip, anomalie)
+        }
+
+    @property
+    def ampere_per_metro_calcolati(self):
+        """Ampere per metro ricavati da potenza e voltaggio, se disponibili"""
+        if self.potenza_per_metro is None or not self.voltaggio_nominale:
+            return None
+        return self.potenza_per_metro / self.voltaggio_nominale
+
+    @property
+    def ampere_per_metro_effettivi(self):
+        """Colonna "ampere per metro" se presente, altrimenti potenza / voltaggio"""
+        if self.ampere_per_metro is not None:
+            return self.ampere_per_metro
+        return self.ampere_per_metro_calcolati
+
+
+class Profilo(Prodotto):
+    """Profilo in alluminio con la larghezza massima di strip accettata"""
+    __slots__ = ()
+    larghezza = ColonnaNumerica()
+
+    @staticmethod
+    def analizza(dati, anomalie=None):
+        return {
+            'codice': normalizza_codice(dati.get('Codice')),
+            'larghezza': leggi_campo(dati, 'Larghezza Max Strip', estrai_larghezza_profilo, anomalie)
+        }
+
+
+class Dimmer(Prodotto):
+    """Dimmer con range di voltaggio in ingresso e categoria canali"""
+    __slots__ = ()
+    voltaggio_min = ColonnaNumerica()
+    voltaggio_max = ColonnaNumerica()
+    categoria_canali = ColonnaTesto()
+    profilo_colore = ColonnaTesto()
+
+    @staticmethod
+    def analizza(dati, anomalie=None):
+        voltaggio_min, voltaggio_max = leggi_campo(dati, 'Voltaggio Input', estrai_range_voltaggio_dimmer, anomalie)
+        return {
+            'codice': normalizza_codice(dati.get('Codice')),
+            'voltaggio_min': voltaggio_min,
+            'voltaggio_max': voltaggio_max,
+            'categoria_canali': categoria_canali_dimmer(
+                leggi_campo(dati, 'Canali Dimmer', estrai_numero_canali, anomalie)
+            ),
+            'profilo_colore': profilo_colore_strip(dati)
+        }
+
+
+class Alimentatore(Prodotto):
+    """Alimentatore con corrente, tensione di uscita, potenza e prezzo già convertiti in numero"""
+    __slots__ = ()
+    corrente_nominale = ColonnaNumerica()
+    tensione_min = ColonnaNumerica()
+    tensione_max = ColonnaNumerica()
+    potenza = ColonnaNumerica()
+    prezzo = ColonnaNumerica()
+
+    @staticmethod
+    def analizza(dati, anomalie=None):
+        tensione_min, tensione_max = estrai_tensione_alimentatore(dati)
+        valori = {
+            # Il foglio alimentatori usa 'codice' in minuscolo, ma accettiamo anche 'Codice'
+            'codice': normalizza_codice(dati.get('codice') or dati.get('Codice')),
+            'corrente_nominale': estrai_corrente_nominale(dati),
+            'tensione_min': tensione_min,
+            'tensione_max': tensione_max,
+            'potenza': estrai_valore_numerico(dati, 'potenza_W', 'Potenza W'),
+            'prezzo': estrai_valore_numerico(dati, 'prezzo', 'Prezzo')
+        }
+
+        # Le colonne hanno due nomi possibili: si segnala quella compilata
+        for colonne, risultato in (
+            (('corrente_A', 'Corrente A'), valori['corrente_nominale']),
+            (('tensione_V', 'Tensione V'), (tensione_min, tensione_max)),
+            (('potenza_W', 'Potenza W'), valori['potenza']),
+            (('prezzo', 'Prezzo'), valori['prezzo'])
+        ):
+            colonna = next((c for c in colonne if dati.get(c) not in (None, '')), colonne[0])
+            segnala(anomalie, colonna, dati.get(colonna), risultato)
+        return valori
+
+
+MODELLI_PER_FOGLIO = {"stripled": Strip, "profili": Profilo, "Dimmer": Dimmer, "alimentatori": Alimentatore}
+
+
+def costruisci_modelli(all_data, anomalie=None, impronte=None, precedente=None):
+    """Converte le righe grezze dei quattro fogli nei rispettivi modelli.
+
+    Ogni foglio diventa una TabellaColonnare: le righe originali vengono
+    lette una volta sola e i valori estratti finiscono nelle colonne
+    tipizzate dichiarate dal modello. Se 'anomalie' è una lista vi vengono
+    aggiunti i campi compilati ma non interpretati, come dizionari con
+    foglio, riga (numerata come nel foglio, dopo le intestazioni), codice,
+    campo e valore.
+
+    Con le impronte (archivio.ImpronteCatalogo) e la versione precedente
+    (con 'modelli', 'impronte' e 'anomalie') un foglio con lo stesso hash
+    riusa i modelli precedenti così come sono, e in un foglio cambiato le
+    righe con la stessa impronta riusano i valori già estratti invece di
+    interpretarle di nuovo.
+    """
+    modelli = {}
+    for foglio, modello in MODELLI_PER_FOGLIO.items():
+        righe = all_data.get(foglio, [])
+        vecchi = precedente.modelli.get(foglio) if precedente is not None and impronte is not None else None
+        if vecchi is not None and impronte.fogli.get(foglio) == precedente.impronte.fogli.get(foglio):
+            modelli[foglio] = vecchi
+            if anomalie is not None:
+                anomalie.extend(a for a in precedente.anomalie if a["foglio"] == foglio)
+            continue
+
+        # Righe già interpretate nella versione precedente: impronta -> posizione
+        gia_estratte = {}
+        anomalie_vecchie = {}
+        if vecchi:
+            for i, impronta in enumerate(precedente.impronte.per_riga(foglio)):
+                gia_estratte.setdefault(impronta, i)
+            for a in precedente.anomalie:
+                if a["foglio"] == foglio:
+                    anomalie_vecchie.setdefault(a["riga"], []).append(a)
+        nuove_impronte = impronte.per_riga(foglio) if gia_estratte else ()
+
+        # Per ogni riga i valori estratti, oppure la posizione della riga uguale nella tabella precedente
+        estratti = []
+        for numero_riga, record in enumerate(righe, 2):
+            if gia_estratte:
+                vecchia = gia_estratte.get(nuove_impronte[numero_riga - 2])
+                if vecchia is not None:
+                    estratti.append(vecchia)
+                    if anomalie is not None:
+                        anomalie.extend({**a, "riga": numero_riga} for a in anomalie_vecchie.get(vecchia + 2, ()))
+                    continue
+            campi = [] if anomalie is not None else None
+            valori = modello.analizza(record, campi)
+            if campi:
+                anomalie.extend(
+                    {"foglio": foglio, "riga": numero_riga, "codice": valori['codice'], "campo": campo, "valore": valore}
+                    for campo, valore in campi
+                )
+            estratti.append(valori)
+
+        tabella = TabellaColonnare(righe)
+        for nome, colonna in modello.colonne().items():
+            grezzi = colonna.grezzi(vecchi[0].tabella) if gia_estratte else None
+            colonna.aggiungi(tabella, [grezzi[v] if type(v) is int else v[nome] for v in estratti])
+        modelli[foglio] = [modello(tabella, i) for i in range(len(righe))]
+    return modelli
+
+
+def costruisci_indice_codici(all_data):
+    """Indice codice normalizzato -> (categoria, prodotto) sui quattro fogli.
+
+    Le categorie sono visitate nello stesso ordine della ricerca in /cerca e a
+    parità di codice vince la prima riga, come nella vecchia scansione lineare.
+    """
+    indice = {}
+    for categoria in ("stripled", "profili", "Dimmer", "alimentatori"):
+        for prodotto in all_data.get(categoria, []):
+            if prodotto.codice and prodotto.codice not in indice:
+                indice[prodotto.codice] = (categoria, prodotto)
+    return indice
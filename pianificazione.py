@@ -0,0 +1,169 @@
+"""Piano di alimentazione per tratte lunghe: più alimentatori, una tratta ciascuno"""
+import math
+import threading
+
+from dimensionamento import MARGINE_SICUREZZA
+
+# Risoluzione del piano: le tratte si tagliano a multipli di 10 cm
+PASSO_METRI = 0.1
+
+OBIETTIVI = ("numero", "costo")
+
+# Con obiettivo "numero" ogni alimentatore pesa PESO_UNITA più la sua potenza,
+# così a parità di numero vince la combinazione con meno watt installati
+PESO_UNITA = 1e6
+
+# Oltre questo numero di tabelle memorizzate si ricomincia da capo
+MAX_TABELLE = 1024
+
+
+class TabellaCopertura:
+    """Tabella di programmazione dinamica per coprire n passi con alimentatori dati.
+
+    'tipi' è una lista di (capacita_in_passi, costo). costi[n] è il costo
+    minimo per coprire almeno n passi e scelte[n] l'indice del tipo usato per
+    l'ultima tratta. La tabella viene estesa solo fino alla lunghezza richiesta
+    e riusata dalle richieste successive con gli stessi tipi; ogni tabella ha
+    il proprio lock, così l'estensione di una non blocca le altre.
+    """
+
+    def __init__(self, tipi):
+        self.tipi = tipi
+        self.costi = [0.0]
+        self.scelte = [None]
+        self._lock = threading.Lock()
+
+    def estendi(self, n_passi):
+        costi = self.costi
+        scelte = self.scelte
+        for n in range(len(costi), n_passi + 1):
+            migliore = math.inf
+            scelta = None
+            for indice, (capacita, costo) in enumerate(self.tipi):
+                totale = costo + costi[n - capacita] if n > capacita else costo
+                if totale < migliore:
+                    migliore = totale
+                    scelta = indice
+            costi.append(migliore)
+            scelte.append(scelta)
+
+    def combinazione(self, n_passi):
+        """Indici dei tipi usati per coprire n_passi, dalla prima all'ultima tratta"""
+        with self._lock:
+            self.estendi(n_passi)
+            usati = []
+            n = n_passi
+            while n > 0:
+                indice = self.scelte[n]
+                usati.append(indice)
+                n -= self.tipi[indice][0]
+            return usati
+
+
+class PianificatoreAlimentazione:
+    """Divide una tratta di strip in segmenti e sceglie gli alimentatori per ciascuno.
+
+    Sono candidati gli alimentatori a tensione costante con tensione di uscita
+    uguale a quella della strip; ognuno alimenta al massimo
+    corrente / (ampere per metro * margine) metri. La combinazione si trova
+    con un knapsack di copertura sui passi da 10 cm, tenendo solo gli
+    alimentatori non dominati (nessun altro costa meno e copre di più). Le
+    tabelle sono memorizzate per (ampere per metro, tensione, obiettivo,
+    lunghezza massima per tratta) e restano valide fino alla prossima ricarica
+    del catalogo.
+    """
+
+    def __init__(self, alimentatori_data, margine_sicurezza=MARGINE_SICUREZZA, passo=PASSO_METRI):
+        self.margine_sicurezza = margine_sicurezza
+        self.passo = passo
+        self.alimentatori_per_tensione = {}
+        visti = set()
+        for a in alimentatori_data:
+            if not a.codice or a.codice in visti:
+                continue
+            visti.add(a.codice)
+            if a.corrente_nominale is None or a.corrente_nominale <= 0:
+                continue
+            # Solo uscite a tensione fissa: i driver a corrente costante non hanno tensione o hanno un range
+            if a.tensione_min is None or a.tensione_min != a.tensione_max:
+                continue
+            self.alimentatori_per_tensione.setdefault(a.tensione_min, []).append(a)
+
+        self._tabelle = {}
+        self._lock = threading.Lock()
+
+    def criterio_costo(self, obiettivo, tensione):
+        """Colonna usata come costo: 'prezzo' se il foglio lo riporta, altrimenti 'potenza_W'"""
+        if obiettivo == "numero":
+            return "numero"
+        alimentatori = self.alimentatori_per_tensione.get(tensione, [])
+        if any(a.prezzo is not None for a in alimentatori):
+            return "prezzo"
+        return "potenza_W"
+
+    def _candidati(self, ampere_per_metro, tensione, obiettivo, metri_max_tratta):
+        """Alimentatori non dominati come (alimentatore, capacita_in_passi, costo)"""
+        criterio = self.criterio_costo(obiettivo, tensione)
+        candidati = []
+        for a in self.alimentatori_per_tensione.get(tensione, []):
+            metri_max = a.corrente_nominale / (ampere_per_metro * self.margine_sicurezza)
+            if metri_max_tratta is not None:
+                metri_max = min(metri_max, metri_max_tratta)
+            capacita = int(math.floor(metri_max / self.passo + 1e-9))
+            if capacita <= 0:
+                continue
+
+            if criterio == "numero":
+                costo = PESO_UNITA + (a.potenza or 0.0)
+            elif criterio == "prezzo":
+                costo = a.prezzo
+            else:
+                costo = a.potenza
+            if costo is None or costo <= 0:
+                continue
+            candidati.append((a, capacita, costo))
+
+        # Frontiera di Pareto: per costo crescente, solo chi copre più passi dei precedenti
+        candidati.sort(key=lambda c: (c[2], -c[1]))
+        frontiera = []
+        for candidato in candidati:
+            if not frontiera or candidato[1] > frontiera[-1][1]:
+                frontiera.append(candidato)
+        return frontiera
+
+    def pianifica(self, ampere_per_metro, tensione, metri, obiettivo="numero", metri_max_tratta=None):
+        """Segmenti e alimentatori per una tratta, oppure None se nessun alimentatore è adatto.
+
+        Restituisce (segmenti, criterio_costo); ogni segmento è
+        (alimentatore, metri_tratta, metri_max).
+        """
+        chiave = (ampere_per_metro, tensione, obiettivo, metri_max_tratta)
+        # Il lock del pianificatore copre solo l'elenco delle tabelle, non la loro estensione
+        with self._lock:
+            voce = self._tabelle.get(chiave)
+            if voce is None:
+                candidati = self._candidati(ampere_per_metro, tensione, obiettivo, metri_max_tratta)
+                tabella = TabellaCopertura([(c[1], c[2]) for c in candidati]) if candidati else None
+                if len(self._tabelle) >= MAX_TABELLE:
+                    self._tabelle.clear()
+                voce = self._tabelle[chiave] = (candidati, tabella)
+        candidati, tabella = voce
+        if tabella is None:
+            return None
+
+        n_passi = max(1, int(math.ceil(metri / self.passo - 1e-9)))
+        usati = tabella.combinazione(n_passi)
+
+        # Prima le tratte più lunghe; l'ultima prende i metri rimanenti
+        usati.sort(key=lambda i: -candidati[i][1])
+        segmenti = []
+        rimanenti = metri
+        for posizione, indice in enumerate(usati):
+            alimentatore, capacita, _ = candidati[indice]
+            metri_max = round(capacita * self.passo, 2)
+            metri_tratta = rimanenti if posizione == len(usati) - 1 else min(metri_max, rimanenti)
+            metri_tratta = round(metri_tratta, 2)
+            rimanenti -= metri_tratta
+            segmenti.append((alimentatore, metri_tratta, metri_max))
+
+        return segmenti, self.criterio_costo(obiettivo, tensione)
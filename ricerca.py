@@ -0,0 +1,279 @@
+"""Suggerimenti di ricerca: codici prodotto ordinati e indice a trigrammi sui testi"""
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from operator import itemgetter
+from collections import Counter
+
+import numpy as np
+
+# Campi testuali indicizzati oltre al codice (il foglio alimentatori usa 'nome' o 'modello')
+CAMPI_TESTO = ('Descrizione', 'Colore Luce', 'nome', 'modello')
+
+# Codici restituiti per un prefisso: bastano per riempire una lista di suggerimenti
+MAX_PER_NODO = 50
+
+# Frazione minima dei trigrammi della ricerca che un prodotto deve contenere
+SOGLIA_SIMILARITA = 0.4
+
+# Oltre questa frazione di codici cambiati l'indice si ricostruisce da zero invece di aggiornarlo
+MAX_FRAZIONE_AGGIORNAMENTO = 0.05
+
+
+def normalizza_testo(valore):
+    """Maiuscolo, con punteggiatura e spazi ripetuti ridotti a un solo spazio"""
+    return ' '.join(re.split(r'[^0-9A-Z]+', str(valore or '').upper())).strip()
+
+
+def compatta(valore):
+    """Solo lettere e cifre: 'av0372lu-e' e 'AV0372LU E' diventano 'AV0372LUE'"""
+    return re.sub(r'[^0-9A-Z]+', '', str(valore or '').upper())
+
+
+def trigrammi_parola(parola):
+    """Trigrammi di una parola, con uno spazio prima e dopo per pesare inizio e fine"""
+    parola = f" {parola} "
+    return tuple({sys.intern(parola[i:i + 3]) for i in range(len(parola) - 2)})
+
+
+def trigrammi(testo):
+    """Trigrammi di ogni parola del testo"""
+    return frozenset(trigramma for parola in testo.split() for trigramma in trigrammi_parola(parola))
+
+
+def distanza_modifica(a, b):
+    """Distanza di Damerau-Levenshtein (con scambio di caratteri adiacenti)"""
+    precedente = None
+    riga = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        prima, precedente, riga = precedente, riga, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            costo = a[i - 1] != b[j - 1]
+            riga[j] = min(precedente[j] + 1, riga[j - 1] + 1, precedente[j - 1] + costo)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                riga[j] = min(riga[j], prima[j - 2] + 1)
+    return riga[len(b)]
+
+
+class IndiceRicerca:
+    """Indice per la ricerca mentre si digita, costruito per ogni snapshot del catalogo.
+
+    I codici compattati sono tenuti in ordine alfabetico insieme alla
+    posizione del prodotto (un array di interi), quindi codice esatto e
+    prefisso si trovano con una ricerca binaria. I trigrammi di codice e campi
+    testuali stanno in liste invertite compatte (array di interi) per trovare
+    i codici con errori di battitura. Con 'precedente' i trigrammi delle
+    parole già viste vengono riusati invece di essere ricalcolati, e con
+    'modificati' (i codici aggiunti, rimossi o cambiati rispetto a
+    'precedente') l'indice viene aggiornato toccando solo quei codici e le
+    liste dei loro trigrammi. Il risultato è lo stesso di una costruzione da
+    zero; 'precedente' non viene modificato.
+    """
+
+    def __init__(self, indice_codici, precedente=None, modificati=None):
+        self._indice_codici = indice_codici
+        if (
+            precedente is not None and modificati is not None
+            and len(modificati) <= MAX_FRAZIONE_AGGIORNAMENTO * len(precedente.documenti)
+        ):
+            self._aggiorna(precedente, modificati)
+            return
+
+        parole_note = precedente._trigrammi_per_parola if precedente is not None else {}
+        self._trigrammi_per_parola = {}
+        self.documenti = []
+        liste_trigrammi = {}
+
+        for codice in sorted(indice_codici):
+            documento, trigrammi_testo = self._documento(codice, parole_note)
+            posizione = len(self.documenti)
+            self.documenti.append(documento)
+            for trigramma in trigrammi_testo:
+                liste_trigrammi.setdefault(trigramma, []).append(posizione)
+
+        self.trigrammi = {trigramma: array('I', posizioni) for trigramma, posizioni in liste_trigrammi.items()}
+        ordinati = sorted((documento[3], posizione) for posizione, documento in enumerate(self.documenti))
+        self.codici_ordinati = [codice for codice, _ in ordinati]
+        self.posizioni_ordinate = np.array([posizione for _, posizione in ordinati], dtype=np.int64)
+
+    def _documento(self, codice, parole_note, indice_codici=None):
+        """(documento, trigrammi del testo) di un codice dell'indice codici"""
+        categoria, prodotto = (indice_codici or self._indice_codici)[codice]
+        testi = [codice] + [prodotto.valore(campo) for campo in CAMPI_TESTO]
+        testo = normalizza_testo(' '.join(str(t) for t in testi if t))
+        trigrammi_testo = set()
+        for parola in testo.split():
+            trigrammi_testo.update(self._trigrammi_di(parola, parole_note))
+        return (codice, categoria, self._etichetta(prodotto), compatta(codice)), trigrammi_testo
+
+    def _aggiorna(self, precedente, modificati):
+        """Costruisce l'indice da 'precedente' cambiando solo i documenti dei codici modificati"""
+        self._trigrammi_per_parola = dict(precedente._trigrammi_per_parola)
+        parole_note = {}
+        vecchi = precedente.documenti
+        codice_di = itemgetter(0)
+
+        # Posizioni nella versione precedente dei codici che spariscono o cambiano
+        tolti = {}
+        for codice in modificati:
+            posizione = bisect_left(vecchi, codice, key=codice_di)
+            if posizione < len(vecchi) and vecchi[posizione][0] == codice:
+                tolti[posizione] = self._documento(codice, parole_note, precedente._indice_codici)[1]
+        # Documenti nuovi o cambiati, in ordine di codice
+        messi = {
+            codice: self._documento(codice, parole_note)
+            for codice in sorted(modificati) if codice in self._indice_codici
+        }
+
+        # Documenti: copia della lista precedente senza i tolti e con i messi al loro posto
+        self.documenti = [documento for posizione, documento in enumerate(vecchi) if posizione not in tolti] if tolti else list(vecchi)
+        for codice, (documento, _) in messi.items():
+            posizione = bisect_left(self.documenti, codice, key=codice_di)
+            self.documenti.insert(posizione, documento)
+        posizioni_messi = {codice: bisect_left(self.documenti, codice, key=codice_di) for codice in messi}
+
+        # Vecchia posizione -> nuova (-1 per i documenti tolti): i codici restati mantengono l'ordine
+        mappa = np.full(len(vecchi), -1, dtype=np.int64)
+        restati_vecchi = np.setdiff1d(np.arange(len(vecchi)), np.fromiter(tolti, dtype=np.int64, count=len(tolti)))
+        restati_nuovi = np.setdiff1d(
+            np.arange(len(self.documenti)),
+            np.fromiter(posizioni_messi.values(), dtype=np.int64, count=len(posizioni_messi))
+        )
+        mappa[restati_vecchi] = restati_nuovi
+        spostati = np.flatnonzero(mappa[restati_vecchi] != restati_vecchi)
+        primo_spostato = int(restati_vecchi[spostati[0]]) if len(spostati) else len(vecchi)
+
+        # Liste invertite: cambiano quelle dei trigrammi dei documenti tolti o messi, le altre
+        # si rinumerano solo se contengono documenti spostati
+        aggiunte = {}
+        for codice, (_, trigrammi_testo) in messi.items():
+            for trigramma in trigrammi_testo:
+                aggiunte.setdefault(trigramma, []).append(posizioni_messi[codice])
+        toccati = set(aggiunte).union(*tolti.values())
+        self.trigrammi = dict(precedente.trigrammi)
+        for trigramma, posizioni in precedente.trigrammi.items():
+            if trigramma not in toccati and (not posizioni or posizioni[-1] < primo_spostato):
+                continue
+            nuove = mappa[np.frombuffer(posizioni, dtype=np.uint32)]
+            nuove = nuove[nuove >= 0]
+            if trigramma in aggiunte:
+                nuove = np.union1d(nuove, aggiunte.pop(trigramma))
+            if len(nuove):
+                self.trigrammi[trigramma] = array('I', nuove.astype(np.uint32).tobytes())
+            else:
+                del self.trigrammi[trigramma]
+        for trigramma, posizioni in aggiunte.items():
+            self.trigrammi[trigramma] = array('I', sorted(posizioni))
+
+        # Codici compattati in ordine: si tolgono i vecchi, si rinumera e si inseriscono i nuovi
+        rinumerate = mappa[precedente.posizioni_ordinate]
+        restano = (rinumerate >= 0).tolist()
+        self.codici_ordinati = [c for c, resta in zip(precedente.codici_ordinati, restano) if resta]
+        posizioni_ordinate = rinumerate[rinumerate >= 0].tolist()
+        for codice, posizione in posizioni_messi.items():
+            chiave = messi[codice][0][3]
+            i = bisect_left(self.codici_ordinati, chiave)
+            while i < len(self.codici_ordinati) and self.codici_ordinati[i] == chiave and posizioni_ordinate[i] < posizione:
+                i += 1
+            self.codici_ordinati.insert(i, chiave)
+            posizioni_ordinate.insert(i, posizione)
+        self.posizioni_ordinate = np.array(posizioni_ordinate, dtype=np.int64)
+
+    def _trigrammi_di(self, parola, parole_note):
+        """Trigrammi di una parola, riusando quelli già calcolati qui o nell'indice precedente"""
+        noti = self._trigrammi_per_parola.get(parola)
+        if noti is None:
+            noti = parole_note.get(parola) or trigrammi_parola(parola)
+            self._trigrammi_per_parola[parola] = noti
+        return noti
+
+    @staticmethod
+    def _etichetta(prodotto):
+        """Testo mostrato accanto al codice nei suggerimenti"""
+        for campo in CAMPI_TESTO:
+            valore = prodotto.valore(campo)
+            if valore:
+                return str(valore)
+        return ''
+
+    def _intervallo(self, inizio, fine):
+        """Posizioni dei prodotti tra due codici compattati (fine esclusa)"""
+        return self.posizioni_ordinate[
+            bisect_left(self.codici_ordinati, inizio):bisect_left(self.codici_ordinati, fine)
+        ]
+
+    def con_codice(self, chiave):
+        """Posizioni dei prodotti il cui codice compattato è esattamente 'chiave'"""
+        return self._intervallo(chiave, chiave + '\0').tolist()
+
+    def con_prefisso(self, prefisso):
+        """Posizioni dei prodotti il cui codice compattato inizia con 'prefisso'.
+
+        Sono al massimo MAX_PER_NODO, le prime in ordine alfabetico: bastano
+        per riempire una lista di suggerimenti.
+        """
+        if not prefisso:
+            return []
+        posizioni = self._intervallo(prefisso, prefisso[:-1] + chr(ord(prefisso[-1]) + 1))
+        if len(posizioni) > MAX_PER_NODO:
+            posizioni = np.partition(posizioni, MAX_PER_NODO - 1)[:MAX_PER_NODO]
+        return sorted(posizioni.tolist())
+
+    def simili(self, query):
+        """(posizione, similarità) dei prodotti che contengono abbastanza trigrammi della ricerca.
+
+        I candidati trovati coi trigrammi vengono riordinati con la distanza di
+        modifica sul codice, che distingue meglio le lettere scambiate.
+        """
+        trigrammi_query = trigrammi(normalizza_testo(query))
+        if not trigrammi_query:
+            return []
+        conteggi = Counter()
+        for trigramma in trigrammi_query:
+            conteggi.update(self.trigrammi.get(trigramma, ()))
+
+        chiave = compatta(query)
+        risultato = []
+        for posizione, condivisi in conteggi.items():
+            similarita = condivisi / len(trigrammi_query)
+            if similarita < SOGLIA_SIMILARITA:
+                continue
+            codice = self.documenti[posizione][3]
+            if abs(len(codice) - len(chiave)) <= 3:
+                distanza = distanza_modifica(chiave, codice)
+                similarita = max(similarita, 1 - distanza / max(len(chiave), len(codice)))
+            risultato.append((posizione, similarita))
+        return risultato
+
+    def suggerisci(self, query, limite=10):
+        """Suggerimenti ordinati: codice esatto, poi prefisso, poi trigrammi simili"""
+        chiave = compatta(query)
+        if not chiave:
+            return []
+
+        punteggi = {}
+        for posizione in self.con_codice(chiave):
+            punteggi[posizione] = (3.0, "codice")
+        for posizione in self.con_prefisso(chiave):
+            if posizione not in punteggi:
+                # A parità di prefisso vengono prima i codici più corti
+                completezza = len(chiave) / len(self.documenti[posizione][3])
+                punteggi[posizione] = (2.0 + completezza, "prefisso")
+        if len(punteggi) < limite:
+            for posizione, similarita in self.simili(query):
+                if posizione not in punteggi:
+                    punteggi[posizione] = (similarita, "simile")
+
+        migliori = sorted(punteggi.items(), key=lambda voce: (-voce[1][0], self.documenti[voce[0]][0]))
+        suggerimenti = []
+        for posizione, (punteggio, tipo) in migliori[:limite]:
+            codice, categoria, etichetta, _ = self.documenti[posizione]
+            suggerimenti.append({
+                "codice": codice,
+                "categoria": categoria,
+                "etichetta": etichetta,
+                "tipo": tipo,
+                "punteggio": round(punteggio, 3)
+            })
+        return suggerimenti
@@ -0,0 +1,161 @@
+"""Indici per ricerche di compatibilità per specifiche (larghezza, voltaggio, canali) invece che per codice"""
+import numpy as np
+
+
+class IndiceOrdinato:
+    """Valori numerici ordinati con la posizione del prodotto, per intervalli in O(log n + k).
+
+    Le posizioni restituite sono in ordine crescente (l'ordine delle righe del
+    foglio), come nelle liste del grafo di compatibilità.
+    """
+
+    def __init__(self, valori):
+        posizioni = np.array([i for i, v in enumerate(valori) if v is not None], dtype=np.int64)
+        numeri = np.array([valori[i] for i in posizioni.tolist()], dtype=np.float64)
+        ordine = np.argsort(numeri, kind="stable")
+        self.valori = numeri[ordine]
+        self.posizioni = posizioni[ordine]
+
+    def tra(self, minimo=None, massimo=None):
+        """Posizioni dei prodotti con minimo <= valore <= massimo (estremi opzionali)"""
+        inizio = int(np.searchsorted(self.valori, minimo, "left")) if minimo is not None else 0
+        fine = int(np.searchsorted(self.valori, massimo, "right")) if massimo is not None else len(self.valori)
+        if fine <= inizio:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(self.posizioni[inizio:fine])
+
+
+class AlberoIntervalli:
+    """Albero di intervalli centrato: gli intervalli [inizio, fine] che contengono un punto in O(log n + k).
+
+    Ogni nodo tiene gli intervalli che attraversano il suo centro, ordinati
+    per inizio crescente e per fine decrescente; quelli tutti a sinistra o
+    tutti a destra del centro scendono nei figli. Il centro è la mediana
+    degli estremi, quindi la profondità è logaritmica.
+    """
+    __slots__ = ('centro', 'per_inizio', 'per_fine', 'sinistra', 'destra')
+
+    def __init__(self, intervalli):
+        # intervalli: [(inizio, fine, posizione)] non vuota
+        estremi = sorted(estremo for inizio, fine, _ in intervalli for estremo in (inizio, fine))
+        self.centro = estremi[len(estremi) // 2]
+        sinistra, destra, centrali = [], [], []
+        for voce in intervalli:
+            if voce[1] < self.centro:
+                sinistra.append(voce)
+            elif voce[0] > self.centro:
+                destra.append(voce)
+            else:
+                centrali.append(voce)
+        self.per_inizio = sorted((inizio, posizione) for inizio, _, posizione in centrali)
+        self.per_fine = sorted(((fine, posizione) for _, fine, posizione in centrali), reverse=True)
+        self.sinistra = AlberoIntervalli(sinistra) if sinistra else None
+        self.destra = AlberoIntervalli(destra) if destra else None
+
+    def contenenti(self, punto):
+        """Posizioni degli intervalli con inizio <= punto <= fine, in ordine crescente"""
+        if punto != punto:
+            # NaN non è né minore né maggiore del centro: nessun intervallo lo contiene
+            return []
+        risultato = []
+        nodo = self
+        while nodo is not None:
+            if punto < nodo.centro:
+                for inizio, posizione in nodo.per_inizio:
+                    if inizio > punto:
+                        break
+                    risultato.append(posizione)
+                nodo = nodo.sinistra
+            elif punto > nodo.centro:
+                for fine, posizione in nodo.per_fine:
+                    if fine < punto:
+                        break
+                    risultato.append(posizione)
+                nodo = nodo.destra
+            else:
+                risultato.extend(posizione for _, posizione in nodo.per_inizio)
+                break
+        risultato.sort()
+        return risultato
+
+
+class IndiceSpecifiche:
+    """Profili, strip e dimmer compatibili con specifiche qualsiasi, anche di prodotti non a catalogo.
+
+    Applica le stesse regole del grafo di compatibilità (larghezza della
+    strip <= larghezza massima del profilo, voltaggio della strip nel range
+    del dimmer e stessa categoria canali) con indici ordinati per le
+    larghezze e alberi di intervalli per i range dei dimmer, una per
+    categoria canali, invece di scorrere tutti i prodotti. Restituisce liste
+    di prodotti nell'ordine dei fogli; con categoria_canali None vale
+    qualsiasi categoria.
+    """
+
+    def __init__(self, strip_data, profili_data, dimmer_data, strip_larghezze, profilo_larghezze, precedente=None):
+        # Fogli da cui sono costruiti gli indici: quelli invariati si riprendono dall'indice precedente
+        self._fonti = {"strip": strip_data, "profili": profili_data, "dimmer": dimmer_data}
+
+        if self._invariato(precedente, "profili"):
+            self.profili, self._profili_per_larghezza = precedente.profili, precedente._profili_per_larghezza
+        else:
+            self.profili = list(profili_data)
+            self._profili_per_larghezza = IndiceOrdinato([profilo_larghezze.get(p.codice) for p in self.profili])
+
+        if self._invariato(precedente, "strip"):
+            self.strip = precedente.strip
+            self._strip_per_larghezza = precedente._strip_per_larghezza
+            self._strip_per_voltaggio = precedente._strip_per_voltaggio
+        else:
+            self.strip = [s for s in strip_data if s.codice]
+            self._strip_per_larghezza = IndiceOrdinato([strip_larghezze.get(s.codice) for s in self.strip])
+            self._strip_per_voltaggio = {None: IndiceOrdinato([s.voltaggio for s in self.strip])}
+            for categoria in {s.categoria_canali for s in self.strip if s.categoria_canali is not None}:
+                self._strip_per_voltaggio[categoria] = IndiceOrdinato([
+                    s.voltaggio if s.categoria_canali == categoria else None for s in self.strip
+                ])
+
+        if self._invariato(precedente, "dimmer"):
+            self.dimmer, self._dimmer_per_voltaggio = precedente.dimmer, precedente._dimmer_per_voltaggio
+        else:
+            self.dimmer = [d for d in dimmer_data if d.codice]
+            intervalli = {}
+            for posizione, d in enumerate(self.dimmer):
+                if d.voltaggio_min is None or d.voltaggio_max is None or d.voltaggio_min > d.voltaggio_max:
+                    continue
+                voce = (d.voltaggio_min, d.voltaggio_max, posizione)
+                intervalli.setdefault(None, []).append(voce)
+                if d.categoria_canali is not None:
+                    intervalli.setdefault(d.categoria_canali, []).append(voce)
+            self._dimmer_per_voltaggio = {
+                categoria: AlberoIntervalli(voci) for categoria, voci in intervalli.items()
+            }
+
+    def _invariato(self, precedente, foglio):
+        return precedente is not None and precedente._fonti[foglio] is self._fonti[foglio]
+
+    def profili_per_larghezza(self, larghezza_strip):
+        """Profili che accettano una strip larga 'larghezza_strip' mm"""
+        return [self.profili[i] for i in self._profili_per_larghezza.tra(minimo=larghezza_strip).tolist()]
+
+    def dimmer_per_voltaggio(self, voltaggio, categoria_canali=None):
+        """Dimmer il cui range di voltaggio comprende 'voltaggio', della categoria canali indicata"""
+        albero = self._dimmer_per_voltaggio.get(categoria_canali)
+        if albero is None:
+            return []
+        return [self.dimmer[i] for i in albero.contenenti(voltaggio)]
+
+    def strip_compatibili(self, larghezza_profilo=None, voltaggio_min=None, voltaggio_max=None, categoria_canali=None):
+        """Strip che entrano in un profilo largo 'larghezza_profilo' mm e/o con voltaggio nel range di un dimmer.
+
+        Con entrambi i criteri restano le strip che li rispettano tutti e due.
+        """
+        posizioni = None
+        if larghezza_profilo is not None:
+            posizioni = self._strip_per_larghezza.tra(massimo=larghezza_profilo)
+        if voltaggio_min is not None or voltaggio_max is not None or categoria_canali is not None:
+            indice = self._strip_per_voltaggio.get(categoria_canali)
+            per_voltaggio = indice.tra(voltaggio_min, voltaggio_max) if indice is not None else np.empty(0, dtype=np.int64)
+            posizioni = per_voltaggio if posizioni is None else np.intersect1d(posizioni, per_voltaggio, assume_unique=True)
+        if posizioni is None:
+            return list(self.strip)
+        return [self.strip[i] for i in posizioni.tolist()]
@@ -0,0 +1,32 @@
+"""Fixture comuni: l'app costruita sul dump reale dei fogli (dati_prodotti.json)"""
+import contextlib
+import io
+import json
+import os
+import sys
+
+import pytest
+
+RADICE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RADICE)
+
+from catalogo import AggiornatoreCatalogo, Catalogo  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def righe_reali():
+    with open(os.path.join(RADICE, "dati_prodotti.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="session")
+def catalogo_reale(righe_reali):
+    return Catalogo(righe_reali)
+
+
+@pytest.fixture(scope="session")
+def client(righe_reali, catalogo_reale):
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    aggiornatore = AggiornatoreCatalogo(lambda forza: (righe_reali, "sheets"), catalogo_reale, 3600)
+    return app.crea_app(avvia_aggiornamento=False, aggiornatore=aggiornatore).test_client()
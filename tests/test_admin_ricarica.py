@@ -0,0 +1,82 @@
+"""/admin/ricarica: vista sincrona, ricariche contemporanee con un solo download, timeout dell'attesa"""
+import contextlib
+import copy
+import inspect
+import io
+import threading
+import time
+
+import pytest
+
+from catalogo import AggiornatoreCatalogo
+
+
+@pytest.fixture
+def modulo_app(monkeypatch):
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "segreto")
+    return app
+
+
+def client_con_caricatore(modulo_app, catalogo, caricatore):
+    aggiornatore = AggiornatoreCatalogo(caricatore, catalogo, 3600)
+    return modulo_app.crea_app(avvia_aggiornamento=False, aggiornatore=aggiornatore), aggiornatore
+
+
+def test_vista_sincrona(modulo_app):
+    # Una vista async richiederebbe l'extra flask[async] (asgiref)
+    assert not inspect.iscoroutinefunction(modulo_app.admin_ricarica)
+
+
+def test_ricariche_contemporanee_un_solo_download(modulo_app, righe_reali, catalogo_reale):
+    nuove = copy.deepcopy(righe_reali)
+    nuove["profili"][0]["Larghezza Max Strip"] = "21mm"
+    download = []
+
+    def caricatore(forza):
+        download.append(forza)
+        time.sleep(0.3)
+        return nuove, "sheets"
+
+    app, aggiornatore = client_con_caricatore(modulo_app, catalogo_reale, caricatore)
+    esiti = []
+
+    def richiedi():
+        risposta = app.test_client().post("/admin/ricarica?attendi=1", headers={"X-Admin-Token": "segreto"})
+        esiti.append((risposta.status_code, risposta.get_json()["versione_corrente"]))
+
+    thread = [threading.Thread(target=richiedi) for _ in range(4)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for t in thread:
+            t.start()
+        for t in thread:
+            t.join()
+    # Anche il thread di aggiornamento, avviato dalla prima richiesta, si unisce allo stesso download
+    assert len(download) == 1
+    assert esiti == [(200, 1)] * 4
+    assert aggiornatore.catalogo.versione == 1
+
+
+def test_timeout_attesa_202(modulo_app, monkeypatch, catalogo_reale):
+    sblocca = threading.Event()
+
+    def caricatore(forza):
+        sblocca.wait(5)
+        return None, None
+
+    monkeypatch.setattr(modulo_app, "TIMEOUT_ATTESA_RICARICA", 0.05)
+    app, aggiornatore = client_con_caricatore(modulo_app, catalogo_reale, caricatore)
+    try:
+        risposta = app.test_client().post("/admin/ricarica?attendi=1", headers={"X-Admin-Token": "segreto"})
+        assert risposta.status_code == 202
+        assert risposta.get_json()["status"] == "Ricarica ancora in corso"
+    finally:
+        sblocca.set()
+    # La ricarica abbandonata dalla route finisce lo stesso e le successive ne partono una nuova
+    assert aggiornatore.ricarica_in_thread().result(5) is True
+
+
+def test_token_richiesto(modulo_app, catalogo_reale):
+    app, _ = client_con_caricatore(modulo_app, catalogo_reale, lambda forza: (None, None))
+    assert app.test_client().post("/admin/ricarica?attendi=1").status_code == 403
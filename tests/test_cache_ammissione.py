@@ -0,0 +1,114 @@
+"""Cache delle risposte con calcoli condivisi (in_cache) e controllo di ammissione (limita)"""
+import threading
+import time
+
+from flask import Flask, Response, jsonify, request
+
+from ammissione import ControlloAmmissione
+from cache_risposte import CacheRisposte, in_cache
+
+
+def app_di_prova(cache=None, ammissione=None, durata=0.0):
+    """App con una route in cache e una limitata, che contano le esecuzioni della vista"""
+    app = Flask(__name__)
+    app.chiamate = 0
+    app.sblocca = threading.Event()
+    app.entrata = threading.Event()
+    cache = cache or CacheRisposte()
+    ammissione = ammissione or ControlloAmmissione(massimo=1, coda=0, attesa=0.05, riprova_dopo=3)
+    app.ammissione = ammissione
+
+    @app.route("/lenta")
+    @in_cache(cache, lambda: 1, lambda args: tuple(sorted(args.items())))
+    def lenta():
+        app.chiamate += 1
+        time.sleep(durata)
+        stato = int(request.args.get("stato", "200"))
+        return jsonify({"chiamata": app.chiamate}), stato
+
+    @app.route("/limitata")
+    @ammissione.limita()
+    def limitata():
+        app.entrata.set()
+        app.sblocca.wait(5)
+        return jsonify({"ok": True})
+
+    @app.route("/stream")
+    @ammissione.limita()
+    def stream():
+        return Response((riga for riga in ("a\n", "b\n")), mimetype="application/x-ndjson")
+
+    return app
+
+
+def test_richieste_identiche_contemporanee_calcolate_una_volta():
+    app = app_di_prova(durata=0.3)
+    esiti = []
+
+    def richiedi():
+        risposta = app.test_client().get("/lenta?x=1")
+        esiti.append((risposta.status_code, risposta.headers["X-Cache"], risposta.get_json()))
+
+    thread = [threading.Thread(target=richiedi) for _ in range(8)]
+    for t in thread:
+        t.start()
+    for t in thread:
+        t.join()
+
+    assert app.chiamate == 1
+    assert sorted(e[1] for e in esiti) == ["COALESCED"] * 7 + ["MISS"]
+    assert all(e[0] == 200 and e[2] == {"chiamata": 1} for e in esiti)
+    assert app.test_client().get("/lenta?x=1").headers["X-Cache"] == "HIT"
+
+
+def test_risposte_5xx_non_in_cache():
+    app = app_di_prova()
+    client = app.test_client()
+    assert client.get("/lenta?stato=503").status_code == 503
+    seconda = client.get("/lenta?stato=503")
+    assert seconda.status_code == 503 and "X-Cache" not in seconda.headers
+    assert app.chiamate == 2
+    # Le 4xx invece sono riusabili
+    client.get("/lenta?stato=404")
+    assert client.get("/lenta?stato=404").headers["X-Cache"] == "HIT"
+    assert app.chiamate == 3
+
+
+def test_etag_e_304():
+    client = app_di_prova().test_client()
+    prima = client.get("/lenta?y=2")
+    etag = prima.headers["ETag"]
+    assert client.get("/lenta?y=2", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/lenta?y=2", headers={"If-None-Match": '"altro"'}).status_code == 200
+
+
+def test_route_piena_risponde_503_con_retry_after():
+    app = app_di_prova()
+    occupante = threading.Thread(target=lambda: app.test_client().get("/limitata"))
+    occupante.start()
+    try:
+        assert app.entrata.wait(5)
+        risposta = app.test_client().get("/limitata")
+        assert risposta.status_code == 503
+        assert risposta.headers["Retry-After"] == "3"
+        assert app.ammissione.limiti["limitata"].rifiutate == 1
+    finally:
+        app.sblocca.set()
+        occupante.join()
+    assert app.test_client().get("/limitata").status_code == 200
+    assert app.ammissione.limiti["limitata"].in_esecuzione == 0
+
+
+def test_stream_libera_il_posto_alla_chiusura():
+    app = app_di_prova()
+    limite = app.ammissione.limiti["stream"]
+    client = app.test_client()
+    risposta = client.get("/stream", buffered=False)
+    assert risposta.status_code == 200
+    assert limite.in_esecuzione == 1
+    # Mentre lo stream è aperto la route è piena
+    assert client.get("/stream").status_code == 503
+    assert b"".join(risposta.response) == b"a\nb\n"
+    risposta.close()
+    assert limite.in_esecuzione == 0
+    assert client.get("/stream").status_code == 200
@@ -0,0 +1,30 @@
+"""/cerca_multipla: lettura dei codici da JSON e NDJSON"""
+import json
+
+import pytest
+
+
+def test_codici_stringhe_e_numeri(client, catalogo_reale):
+    codice = catalogo_reale.strip_data[0].codice
+    risposta = client.post("/cerca_multipla", json={"codici": [codice, 12345, " " + codice.lower()]})
+    assert risposta.status_code == 200
+    assert [r["codice"] for r in risposta.get_json()["risultati"]] == [codice, "12345"]
+
+
+@pytest.mark.parametrize("voce", [None, True, ["AV0372LU-E"], {"codice": "AV0372LU-E"}])
+def test_codici_non_validi_in_json(client, voce):
+    risposta = client.post("/cerca_multipla", json={"codici": ["AV0372LU-E", voce]})
+    assert risposta.status_code == 400
+    assert "stringa o un numero" in risposta.get_json()["error"]
+
+
+def test_codici_non_validi_in_ndjson(client):
+    corpo = "\n".join(json.dumps(v) for v in ({"codice": "AV0372LU-E"}, {"codice": [1, 2]}))
+    risposta = client.post("/cerca_multipla", data=corpo, content_type="application/x-ndjson")
+    assert risposta.status_code == 400
+
+
+def test_ndjson_non_valido(client):
+    risposta = client.post("/cerca_multipla", data="{non json", content_type="application/x-ndjson")
+    assert risposta.status_code == 400
+    assert "lista di codici" in risposta.get_json()["error"]
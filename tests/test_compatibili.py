@@ -0,0 +1,31 @@
+"""/compatibili: specifiche date a mano, con i numeri non finiti rifiutati"""
+import pytest
+
+
+@pytest.mark.parametrize("query", [
+    "tipo=profili&larghezza=nan",
+    "tipo=profili&larghezza=inf",
+    "tipo=dimmer&voltaggio=nan",
+    "tipo=dimmer&voltaggio=-inf",
+    "tipo=strip&voltaggio_min=nan&voltaggio_max=24",
+    "tipo=strip&larghezza_profilo=NaN",
+])
+def test_numeri_non_finiti(client, query):
+    risposta = client.get(f"/compatibili?{query}")
+    assert risposta.status_code == 400
+    assert "numero valido" in risposta.get_json()["error"]
+
+
+def test_numeri_validi(client):
+    assert client.get("/compatibili?tipo=profili&larghezza=10").status_code == 200
+    assert client.get("/compatibili?tipo=dimmer&voltaggio=24").status_code == 200
+
+
+@pytest.mark.parametrize("query", ["voltaggio=nan", "voltaggio_min=nan", "voltaggio_max=inf"])
+def test_filtra_rifiuta_numeri_non_finiti(client, query):
+    assert client.get(f"/filtra?categoria=stripled&{query}").status_code == 400
+
+
+def test_albero_intervalli_con_nan(catalogo_reale):
+    for albero in catalogo_reale.specifiche._dimmer_per_voltaggio.values():
+        assert albero.contenenti(float("nan")) == []
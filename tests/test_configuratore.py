@@ -0,0 +1,83 @@
+"""ConfiguratoreKit: le classi e le classifiche memorizzate danno gli stessi kit di un calcolo da zero"""
+import pytest
+
+from configuratore import ConfiguratoreKit
+
+
+def nuovo_configuratore(catalogo):
+    return ConfiguratoreKit(catalogo.grafo, catalogo.pianificatore, catalogo.strip_larghezze, catalogo.profilo_larghezze)
+
+
+def in_chiaro(kit):
+    return [
+        (v["strip"].codice, v["profilo"].codice, v["dimmer"].codice if v["dimmer"] else None, v["scarto_larghezza"])
+        for v in kit
+    ]
+
+
+@pytest.mark.parametrize("metri,obiettivo,con_dimmer,k", [
+    (5, "numero", True, 5), (5, "costo", True, 5), (12.3, "numero", False, 3), (30, "costo", True, 10)
+])
+def test_memoria_uguale_a_calcolo_da_zero(catalogo_reale, metri, obiettivo, con_dimmer, k):
+    strip = catalogo_reale.strip_data
+    configuratore = nuovo_configuratore(catalogo_reale)
+    # Riempie la memoria con altre lunghezze e obiettivi, poi la riusa
+    for altri_metri in (1, metri, 50):
+        configuratore.configura(strip, altri_metri, "numero", True, 5)
+    riusato = configuratore.configura(strip, metri, obiettivo, con_dimmer, k)
+    da_zero = nuovo_configuratore(catalogo_reale).configura(strip, metri, obiettivo, con_dimmer, k)
+    assert riusato[0] and in_chiaro(riusato[0]) == in_chiaro(da_zero[0])
+    assert riusato[1] == da_zero[1]
+
+
+def test_classifica_calcolata_una_volta_per_classe(catalogo_reale):
+    configuratore = nuovo_configuratore(catalogo_reale)
+    pianificatore = configuratore.pianificatore
+    chiamate = []
+
+    class Conta:
+        def pianifica(self, *args):
+            chiamate.append(args)
+            return pianificatore.pianifica(*args)
+
+    configuratore.pianificatore = Conta()
+    strip = catalogo_reale.strip_data
+    _, classi = configuratore.configura(strip, 5)
+    assert len(chiamate) == classi < len(strip)
+    configuratore.configura(strip, 5)
+    configuratore.configura(list(reversed(strip)), 5)
+    assert len(chiamate) == classi
+    configuratore.configura(strip, 5, "costo")
+    assert len(chiamate) == 2 * classi
+
+
+def test_classe_memorizzata_per_riga(catalogo_reale):
+    configuratore = nuovo_configuratore(catalogo_reale)
+    for strip in catalogo_reale.strip_data:
+        assert configuratore.classe(strip) == configuratore.classe(strip)
+    classi = {c for c in configuratore._classi.values() if c is not None}
+    assert len(configuratore._classi) == len({s.riga for s in catalogo_reale.strip_data})
+    # Strip della stessa classe hanno gli stessi profili e dimmer compatibili
+    per_classe = {}
+    for strip in catalogo_reale.strip_data:
+        classe = configuratore.classe(strip)
+        if classe is not None:
+            compatibili = (
+                sorted(p.codice for p in catalogo_reale.grafo.profili_per_strip.get(strip.codice, ())),
+                sorted(d.codice for d in catalogo_reale.grafo.dimmer_per_strip.get(strip.codice, ()))
+            )
+            assert per_classe.setdefault(classe, compatibili) == compatibili
+    assert len(per_classe) == len(classi)
+
+
+def test_kit_indipendenti_dall_ordine_delle_candidate(catalogo_reale):
+    # AV7076WIAA è duplicato con canali diversi (1-2CH e 3-5CH): il grafo usa i dimmer della prima riga,
+    # quindi la seconda riga non può stare nella classe di AV5880NIAA (3-5CH)
+    duplicata = [s for s in catalogo_reale.strip_data if s.codice == "AV7076WIAA"][1]
+    altra = next(s for s in catalogo_reale.strip_data if s.codice == "AV5880NIAA")
+    avanti = nuovo_configuratore(catalogo_reale).configura([duplicata, altra], 5, k=20)
+    indietro = nuovo_configuratore(catalogo_reale).configura([altra, duplicata], 5, k=20)
+    assert in_chiaro(avanti[0]) == in_chiaro(indietro[0])
+    for voce in avanti[0]:
+        compatibili = catalogo_reale.grafo.dimmer_per_strip[voce["strip"].codice]
+        assert any(d is voce["dimmer"] for d in compatibili)
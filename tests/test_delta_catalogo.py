@@ -0,0 +1,97 @@
+"""Delta del catalogo: il client che applica /catalogo/delta deve ottenere l'esportazione completa"""
+import copy
+import json
+
+from catalogo import MAX_VERSIONI_STORICO, Catalogo
+
+
+def completo(catalogo):
+    return json.loads(catalogo.esportazione.corpo())
+
+
+def applica_delta(esportato, delta):
+    """Come applicaDelta in index.html: righe nuove dal delta, le altre dalla copia, seguendo "ordine" """
+    fogli = dict(esportato["fogli"])
+    for nome, foglio in delta["fogli"].items():
+        def per_codice(righe):
+            mappa = {}
+            for riga in righe:
+                mappa.setdefault(riga[0], []).append(riga)
+            return mappa
+        nuove = per_codice(foglio["righe"])
+        vecchie = per_codice(fogli[nome]["righe"] if nome in fogli else [])
+        fogli[nome] = {
+            "attributi": foglio["attributi"],
+            "righe": [(nuove if codice in nuove else vecchie)[codice].pop(0) for codice in foglio["ordine"]]
+        }
+    return {"versione": delta["versione"], "fogli": fogli}
+
+
+def verifica_delta(vecchio, nuovo):
+    delta, stato = nuovo.esportazione.delta(vecchio.etag)
+    assert stato == 200
+    assert applica_delta(completo(vecchio), delta) == completo(nuovo)
+    return delta
+
+
+def test_solo_riordino(righe_reali, catalogo_reale):
+    righe = copy.deepcopy(righe_reali)
+    righe["stripled"][0], righe["stripled"][7] = righe["stripled"][7], righe["stripled"][0]
+    nuovo = Catalogo(righe, precedente=catalogo_reale)
+
+    voce = nuovo.modifiche["stripled"]
+    assert not (voce["aggiunti"] or voce["rimossi"] or voce["modificati"])
+    assert voce["spostati"] == {righe["stripled"][0]["Codice"], righe["stripled"][7]["Codice"]}
+
+    delta = verifica_delta(catalogo_reale, nuovo)
+    assert list(delta["fogli"]) == ["stripled"]
+    assert delta["fogli"]["stripled"]["righe"] == []
+
+
+def test_riordino_tra_duplicati():
+    riga = {"Codice": "AV-A", "Potenza": "9,6W/m", "Input Volt": "24VDC"}
+    prima = {"stripled": [riga, dict(riga, Codice="AV-B"), dict(riga)]}
+    dopo = {"stripled": [riga, dict(riga), dict(riga, Codice="AV-B")]}
+    vecchio = Catalogo(prima)
+    verifica_delta(vecchio, Catalogo(dopo, precedente=vecchio))
+
+
+def test_riordino_con_modifiche_su_piu_versioni(righe_reali, catalogo_reale):
+    righe = copy.deepcopy(righe_reali)
+    righe["Dimmer"].reverse()
+    intermedio = Catalogo(righe, precedente=catalogo_reale)
+    righe = copy.deepcopy(righe)
+    righe["profili"][2]["Larghezza Max Strip"] = "20mm"
+    del righe["stripled"][-1]
+    nuovo = Catalogo(righe, precedente=intermedio)
+
+    delta = verifica_delta(catalogo_reale, nuovo)
+    assert set(delta["fogli"]) == {"Dimmer", "profili", "stripled"}
+    verifica_delta(intermedio, nuovo)
+
+
+def test_versione_uguale_senza_fogli(catalogo_reale):
+    delta, stato = catalogo_reale.esportazione.delta(catalogo_reale.etag)
+    assert stato == 200 and delta["fogli"] == {}
+
+
+def test_versione_sconosciuta_409(catalogo_reale):
+    risposta, stato = catalogo_reale.esportazione.delta("sconosciuta")
+    assert stato == 409
+    assert risposta["versione"] == catalogo_reale.etag
+
+
+def test_versione_uscita_dallo_storico_409(righe_reali, catalogo_reale):
+    catalogo, righe = catalogo_reale, copy.deepcopy(righe_reali)
+    for i in range(MAX_VERSIONI_STORICO + 1):
+        righe = copy.deepcopy(righe)
+        righe["profili"][0]["Larghezza Max Strip"] = f"{20 + i}mm"
+        catalogo = Catalogo(righe, precedente=catalogo)
+    assert catalogo.esportazione.delta(catalogo_reale.etag)[1] == 409
+
+
+def test_route_delta(client, catalogo_reale):
+    risposta = client.get("/catalogo/delta?da=sconosciuta")
+    assert risposta.status_code == 409
+    risposta = client.get("/catalogo/delta?da=" + catalogo_reale.etag)
+    assert risposta.status_code == 200 and risposta.get_json()["fogli"] == {}
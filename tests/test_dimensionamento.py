@@ -0,0 +1,80 @@
+"""Dimensionamento degli alimentatori sulle colonne reali del foglio ('corrente_A', 'tensione_V')"""
+
+
+def test_alimentatori_letti_da_corrente_A(catalogo_reale, righe_reali):
+    motore = catalogo_reale.dimensionamento
+    assert "corrente_A" in righe_reali["alimentatori"][0]
+    assert len(motore.alimentatori) > 0
+    for a in motore.alimentatori:
+        assert a.corrente_nominale > 0
+        assert a.tensione_min == a.tensione_max
+
+
+def test_calcola_alimentatori_alla_tensione_della_strip(client, catalogo_reale):
+    con_alimentatori = 0
+    for strip in catalogo_reale.strip_data:
+        if not strip.codice:
+            continue
+        risposta = client.get(f"/calcola_alimentatori?codice={strip.codice}&metri=1")
+        if risposta.status_code != 200:
+            continue
+        dati = risposta.get_json()
+        ampere = dati["calcoli"]["ampere_necessari"]
+        for alimentatore in dati["alimentatori_compatibili"]:
+            assert alimentatore["corrente_A"] >= ampere * 1.2
+            assert float(alimentatore["tensione_V"]) == strip.voltaggio_nominale
+        con_alimentatori += bool(dati["alimentatori_compatibili"])
+    assert con_alimentatori > 0
+
+
+def test_tabella_alimentatori(client):
+    dati = client.get("/tabella_alimentatori?metri=1,5").get_json()
+    assert dati["alimentatori"]
+    for riga in dati["strip"]:
+        for primo, num in zip(riga["primo_alimentatore"], riga["num_compatibili"]):
+            assert primo + num == riga["fine_alimentatori"]
+            for i in range(primo, riga["fine_alimentatori"]):
+                assert dati["tensioni"][i] == dati["tensioni"][primo]
+    assert any(n > 0 for riga in dati["strip"] for n in riga["num_compatibili"])
+
+
+def test_tabella_alimentatori_rifiuta_metri_non_finiti(client):
+    for metri in ("nan", "inf", "1,-inf", "0"):
+        assert client.get(f"/tabella_alimentatori?metri={metri}").status_code == 400
+
+
+def test_calcola_alimentatori_rifiuta_metri_non_finiti(client):
+    for metri in ("nan", "inf", "-inf", "NaN"):
+        prima = client.get(f"/calcola_alimentatori?codice=AV0372LU-E&metri={metri}")
+        assert prima.status_code == 400
+        # La chiave in cache è il testo: la seconda richiesta trova la prima
+        seconda = client.get(f"/calcola_alimentatori?codice=AV0372LU-E&metri={metri}")
+        assert seconda.status_code == 400
+        assert seconda.headers["X-Cache"] == "HIT"
+
+
+# Alimentatori a 24 V del foglio per corrente crescente (a parità, nell'ordine del foglio)
+ALIMENTATORI_24V = [
+    ("SNP12-24VF-1", 0.5), ("GPV-18-24", 0.75), ("SE20-24VF", 0.83), ("LS-30-24 LI EXC", 1.25),
+    ("SNP30-24VF-2", 1.25), ("SS30-24VF", 1.25), ("SS60-24VF", 2.5), ("SSL60-24VF", 2.5),
+    ("SSL60-24VF", 3.0), ("XLG-75-24-A", 3.1), ("LM-75-24-G1D2", 3.13), ("LS-75-24 LI EXC", 3.13),
+    ("SL75-24VF", 3.13), ("XLG-100-24-A", 4.0), ("ELG-100-24B-3Y", 4.17), ("LM-100-24-G1D2", 4.17),
+    ("SL100-24VF", 4.17), ("SNP100-24VF-2", 4.17), ("LPV-100-24", 4.2), ("LS-120-24 LI EXC", 5.0),
+    ("HLG-150H-24A", 6.25), ("LM-150-24-G2D2", 6.25), ("LS-150-24 LI EXC", 6.25), ("SL150-24VF-1", 6.25),
+    ("SNP150-24VF-2", 6.25), ("XLG-150-24-A", 6.25), ("XLG-200-24-A", 8.3), ("SNP200-24VL-1", 8.33),
+    ("ELG-240-24-3Y", 10.0), ("ELG-240-24B-3Y", 10.0), ("LM-240-24-G1D2", 10.0), ("XLG-320-V-A", 13.0),
+]
+
+
+def test_alimentatori_di_AV0372LU_E(client):
+    # 4,8 W/m a 24 V: 0,2 A/m, e col margine 1,2 servono almeno 0,24 A per metro
+    dati = client.get("/calcola_alimentatori?codice=AV0372LU-E&metri=1").get_json()
+    assert dati["calcoli"]["ampere_necessari"] == 0.2
+    assert [(a["codice"], a["corrente_A"]) for a in dati["alimentatori_compatibili"]] == ALIMENTATORI_24V
+
+    # 20 m: 4 A, quindi almeno 4,8 A
+    dati = client.get("/calcola_alimentatori?codice=AV0372LU-E&metri=20").get_json()
+    assert dati["calcoli"]["ampere_necessari"] == 4.0
+    attesi = [(codice, corrente) for codice, corrente in ALIMENTATORI_24V if corrente >= 4.8]
+    assert [(a["codice"], a["corrente_A"]) for a in dati["alimentatori_compatibili"]] == attesi
+    assert attesi[0] == ("LS-120-24 LI EXC", 5.0)
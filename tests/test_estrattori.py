@@ -0,0 +1,88 @@
+"""Estrattori dei campi tecnici: potenza per metro, temperatura colore e memoria per valore"""
+import pytest
+
+from estrattori import (
+    FUNZIONI_MEMORIZZATE, RE_POTENZA_STRIP, _temperature_testo, estrai_potenza_strip, estrai_temperatura_colore,
+    statistiche_memoria
+)
+from modelli import Strip
+
+
+@pytest.mark.parametrize("testo,atteso", [
+    ("4,8W/m", 4.8),
+    ("14.4 W/m", 14.4),
+    ("19,2W/M", 19.2),
+    ("10w/m", 10.0),
+    ("Potenza 12W/m 24V", 12.0),
+])
+def test_potenza_per_metro(testo, atteso):
+    assert estrai_potenza_strip(testo) == pytest.approx(atteso)
+
+
+@pytest.mark.parametrize("testo", ["", None, "10W", "W/m", "12V"])
+def test_potenza_assente(testo):
+    assert estrai_potenza_strip(testo) is None
+
+
+def test_espressione_su_testo_maiuscolo():
+    # Il testo viene portato in maiuscolo prima della ricerca: l'espressione deve cercare 'W/M'
+    assert RE_POTENZA_STRIP.search("4,8W/m".upper())
+
+
+def test_potenza_di_tutte_le_strip_reali(righe_reali, catalogo_reale):
+    assert len(righe_reali["stripled"]) == len(catalogo_reale.strip_data)
+    for riga, strip in zip(righe_reali["stripled"], catalogo_reale.strip_data):
+        if "W/M" in str(riga.get("Potenza") or "").upper():
+            assert strip.potenza_per_metro is not None, riga["Potenza"]
+
+
+@pytest.mark.parametrize("testo,atteso", [
+    ("3000K", ((3000,), None)),
+    ("rgb+4000k", ((4000,), 1)),
+    ("CCT 2700K~6000K", ((2700, 6000), 0)),
+    ("2700 Kelvin", ((2700,), 0)),
+    ("6500°K", ((6500,), 2)),
+    ("bianco caldo 2800", ((), 0)),
+    ("RGB", ((), None)),
+    ("", ((), None)),
+])
+def test_temperature_testo(testo, atteso):
+    assert _temperature_testo(testo) == atteso
+
+
+def test_temperatura_colore_da_piu_campi():
+    # La più bassa tra tutti i campi; le parole chiave solo se nessun campo ha una temperatura
+    assert estrai_temperatura_colore({"Colore Luce": "4000K", "Descrizione": "anche 3000K"}) == 3000
+    assert estrai_temperatura_colore({"Colore Luce": "naturale", "Codice": "AV-4000-6500"}) == 4000
+    assert estrai_temperatura_colore({"Colore Luce": "RGB"}) is None
+    assert estrai_temperatura_colore({}) is None
+
+
+def test_memoria_uguale_al_calcolo_diretto(righe_reali):
+    # Ogni valore dei fogli reali, letto dalla memoria, è uguale a quello calcolato senza
+    for funzione in FUNZIONI_MEMORIZZATE:
+        funzione.cache_clear()
+    testi = {str(v) for righe in righe_reali.values() for riga in righe for v in riga.values() if v not in (None, "")}
+    for funzione in FUNZIONI_MEMORIZZATE:
+        for testo in testi:
+            calcolato = funzione.__wrapped__(testo)
+            # Prima lettura interpretata, seconda dalla memoria
+            assert funzione(testo) == calcolato and funzione(testo) == calcolato, (funzione.__name__, testo)
+        assert funzione.cache_info().hits >= len(testi)
+
+
+def test_righe_ripetute_interpretate_una_volta(righe_reali):
+    for funzione in FUNZIONI_MEMORIZZATE:
+        funzione.cache_clear()
+    for riga in righe_reali["stripled"]:
+        Strip.analizza(riga)
+    prima = statistiche_memoria()
+    for riga in righe_reali["stripled"]:
+        Strip.analizza(riga)
+    dopo = statistiche_memoria()
+    assert set(dopo) == {f.__name__.lstrip("_") for f in FUNZIONI_MEMORIZZATE}
+    for nome, (_, interpretati, in_memoria) in dopo.items():
+        # Alla seconda lettura nessun valore viene interpretato di nuovo
+        assert (interpretati, in_memoria) == prima[nome][1:], nome
+    assert dopo["estrai_potenza_strip"][1] <= len({r.get("Potenza") for r in righe_reali["stripled"]})
+    assert dopo["estrai_potenza_strip"][0] > prima["estrai_potenza_strip"][0]
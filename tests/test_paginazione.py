@@ -0,0 +1,44 @@
+"""Cursori degli elenchi: validi tra processi con lo stesso catalogo, 409 quando il catalogo cambia"""
+import contextlib
+import copy
+import io
+
+from catalogo import AggiornatoreCatalogo, Catalogo
+
+
+def nuovo_client(righe, versione=0):
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    aggiornatore = AggiornatoreCatalogo(lambda forza: (righe, "sheets"), Catalogo(righe, versione), 3600)
+    return app.crea_app(avvia_aggiornamento=False, aggiornatore=aggiornatore).test_client()
+
+
+def prima_pagina(client, catalogo_reale):
+    for strip in catalogo_reale.strip_data:
+        dati = client.get(f"/cerca?codice={strip.codice}&limite=1").get_json()
+        cursore = (dati or {}).get("paginazione", {}).get("cursore_successivo")
+        if cursore:
+            return strip.codice, cursore
+    raise AssertionError("Nessuna strip con più di una pagina di compatibili")
+
+
+def test_cursore_valido_in_un_altro_processo(client, catalogo_reale, righe_reali):
+    codice, cursore = prima_pagina(client, catalogo_reale)
+    # Un altro worker con lo stesso contenuto può essere a un numero di versione diverso
+    altro = nuovo_client(righe_reali, versione=catalogo_reale.versione + 3)
+    risposta = altro.get(f"/cerca?codice={codice}&limite=1&cursore={cursore}")
+    assert risposta.status_code == 200
+    assert risposta.get_json()["paginazione"]["inizio"] == 1
+
+
+def test_cursore_di_un_catalogo_diverso(client, catalogo_reale, righe_reali):
+    codice, cursore = prima_pagina(client, catalogo_reale)
+    righe = copy.deepcopy(righe_reali)
+    righe["profili"][0]["Codice"] = "MODIFICATO"
+    risposta = nuovo_client(righe).get(f"/cerca?codice={codice}&limite=1&cursore={cursore}")
+    assert risposta.status_code == 409
+
+
+def test_cursore_non_valido(client):
+    for cursore in ("xyz", "OjE", "YWJjOi0x"):
+        assert client.get(f"/cerca?codice=X&cursore={cursore}").status_code == 400
@@ -0,0 +1,64 @@
+"""/pianifica_alimentatori: validazione di metri e metri_max_tratta, limite dei metri per richiesta"""
+import threading
+
+import pytest
+
+from pianificazione import PianificatoreAlimentazione
+
+
+def strip_con_piano(client, catalogo_reale):
+    for strip in catalogo_reale.strip_data:
+        if client.get(f"/pianifica_alimentatori?codice={strip.codice}&metri=5").status_code == 200:
+            return strip.codice
+    raise AssertionError("Nessuna strip con un piano di alimentazione")
+
+
+@pytest.mark.parametrize("metri_max_tratta", ["nan", "inf", "-1", "0", "abc"])
+def test_metri_max_tratta_non_valido(client, catalogo_reale, metri_max_tratta):
+    codice = strip_con_piano(client, catalogo_reale)
+    risposta = client.get(f"/pianifica_alimentatori?codice={codice}&metri=5&metri_max_tratta={metri_max_tratta}")
+    assert risposta.status_code == 400
+
+
+def test_metri_max_tratta_non_valido_in_post(client, catalogo_reale):
+    codice = strip_con_piano(client, catalogo_reale)
+    risposta = client.post("/pianifica_alimentatori", json={
+        "tratte": [{"codice": codice, "metri": 5}], "metri_max_tratta": "NaN"
+    })
+    assert risposta.status_code == 400
+
+
+def test_metri_max_tratta_valido(client, catalogo_reale):
+    codice = strip_con_piano(client, catalogo_reale)
+    risposta = client.get(f"/pianifica_alimentatori?codice={codice}&metri=5&metri_max_tratta=2")
+    assert risposta.status_code == 200
+    assert all(segmento["metri"] <= 2 for segmento in risposta.get_json()["segmenti"])
+
+
+def test_metri_totali_oltre_il_limite(client, catalogo_reale, monkeypatch):
+    import app  # già importato dalla fixture client
+    codice = strip_con_piano(client, catalogo_reale)
+    monkeypatch.setattr(app, "MAX_METRI_TOTALI_PIANO", 100)
+    tratte = [{"codice": codice, "metri": 30}] * 4
+    risposta = client.post("/pianifica_alimentatori", json={"tratte": tratte})
+    assert risposta.status_code == 400
+    assert "100 metri" in risposta.get_json()["error"]
+    # Al limite esatto la richiesta passa; le tratte non valide non contano nel totale
+    tratte = [{"codice": codice, "metri": 25}] * 4 + [{"codice": codice, "metri": 5000}, {"codice": codice}]
+    risposta = client.post("/pianifica_alimentatori", json={"tratte": tratte})
+    assert risposta.status_code == 200
+    assert [t["stato"] for t in risposta.get_json()["tratte"]] == [200] * 4 + [400, 400]
+
+
+def test_tabelle_diverse_non_si_bloccano(catalogo_reale):
+    pianificatore = PianificatoreAlimentazione(catalogo_reale.alimentatori_data)
+    assert pianificatore.pianifica(0.5, 24.0, 5) is not None
+    tabella = pianificatore._tabelle[(0.5, 24.0, "numero", None)][1]
+    esiti = []
+    with tabella._lock:
+        # Con la tabella occupata un'altra tratta si pianifica lo stesso
+        altra = threading.Thread(target=lambda: esiti.append(pianificatore.pianifica(1.0, 24.0, 50)))
+        altra.start()
+        altra.join(5)
+        assert not altra.is_alive()
+    assert esiti and esiti[0] is not None
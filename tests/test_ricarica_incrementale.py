@@ -0,0 +1,93 @@
+"""Ricarica incrementale: Catalogo(nuove, precedente=vecchio) deve coincidere con Catalogo(nuove)"""
+import copy
+import random
+
+import pytest
+
+from catalogo import Catalogo
+from modelli import materializza
+
+RICERCHE = ("AV", "AV03", "AV0372LU-E", "PR", "XLG", "24VF", "AV372", "MODIFICATO", "NUOVO")
+
+
+def firma(catalogo):
+    """Tutto ciò che le route leggono dagli indici ricostruiti a pezzi, in forma confrontabile"""
+    grafo = catalogo.grafo
+    return {
+        "suggerimenti": {q: catalogo.indice_ricerca.suggerisci(q, 20) for q in RICERCHE},
+        "indice_codici": {
+            codice: (categoria, prodotto.dati) for codice, (categoria, prodotto) in catalogo.indice_codici.items()
+        },
+        "faccette": {
+            nome: (indice.filtra({})[1], indice.estremi(), materializza(indice.prodotti))
+            for nome, indice in catalogo.filtri.items()
+        },
+        "grafo": {
+            nome: {codice: materializza(elenco) for codice, elenco in getattr(grafo, nome).items()}
+            for nome in ("profili_per_strip", "dimmer_per_strip", "strip_per_profilo", "strip_per_dimmer")
+        },
+        "alimentatori": {
+            codice: (indici.tolist(), metri.tolist()) for codice, (indici, metri) in grafo.strip_per_alimentatore.items()
+        },
+    }
+
+
+def rinomina(righe):
+    righe["stripled"][3]["Codice"] = "MODIFICATO-1"
+    righe["profili"][0]["Codice"] = "MODIFICATO-2"
+
+
+def inserisci(righe):
+    nuova = dict(righe["stripled"][0], Codice="NUOVO-1", Potenza="14,4W/m")
+    righe["stripled"].insert(5, nuova)
+    righe["Dimmer"].insert(0, dict(righe["Dimmer"][-1], Codice="NUOVO-2"))
+
+
+def cancella(righe):
+    del righe["profili"][10]
+    del righe["alimentatori"][0]
+    del righe["stripled"][-1]
+
+
+def riordina(righe):
+    righe["Dimmer"].reverse()
+    righe["stripled"][0], righe["stripled"][7] = righe["stripled"][7], righe["stripled"][0]
+
+
+def modifica_valori(righe):
+    righe["profili"][2]["Larghezza Max Strip"] = "20mm"
+    righe["stripled"][1]["Input Volt"] = "12VDC"
+    righe["alimentatori"][4]["corrente_A"] = 40
+
+
+def duplica(righe):
+    righe["stripled"].insert(2, dict(righe["stripled"][9]))
+    righe["profili"][5] = dict(righe["profili"][5], Codice="")
+
+
+@pytest.mark.parametrize("modifica", [rinomina, inserisci, cancella, riordina, modifica_valori, duplica])
+def test_modifica_singola(righe_reali, catalogo_reale, modifica):
+    nuove = copy.deepcopy(righe_reali)
+    modifica(nuove)
+    assert firma(Catalogo(nuove, precedente=catalogo_reale)) == firma(Catalogo(nuove))
+
+
+def test_ricariche_in_sequenza(righe_reali, catalogo_reale):
+    """Ogni snapshot parte dal precedente incrementale, come nell'aggiornatore"""
+    rng = random.Random(7)
+    righe = copy.deepcopy(righe_reali)
+    catalogo = catalogo_reale
+    modifiche = [rinomina, inserisci, cancella, riordina, modifica_valori, duplica]
+    for _ in range(6):
+        for modifica in rng.sample(modifiche, 2):
+            modifica(righe)
+        rng.shuffle(righe["profili"])
+        incrementale = Catalogo(copy.deepcopy(righe), precedente=catalogo)
+        assert firma(incrementale) == firma(Catalogo(copy.deepcopy(righe)))
+        catalogo = incrementale
+
+
+def test_nessuna_modifica_riusa_tutto(righe_reali, catalogo_reale):
+    catalogo = Catalogo(copy.deepcopy(righe_reali), precedente=catalogo_reale)
+    assert catalogo.etag == catalogo_reale.etag
+    assert firma(catalogo) == firma(catalogo_reale)
@@ -0,0 +1,10 @@
+"""Entry point WSGI di produzione: gunicorn -c gunicorn.conf.py wsgi:app
+
+Il catalogo viene caricato qui, una volta sola. Con preload_app (vedi
+gunicorn.conf.py) succede nel master prima del fork e i worker condividono
+la memoria copy-on-write; il thread di aggiornamento parte in ogni worker
+alla prima richiesta.
+"""
+from app import crea_app
+
+app = crea_app(avvia_aggiornamento=False)